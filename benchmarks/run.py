@@ -0,0 +1,330 @@
+"""
+Benchmarks APIResource and the spook views against a local stand-in upstream.
+
+    python -m benchmarks.run --concurrency 1 8 32 --output results.json
+    python -m benchmarks.run --compare results.json --tolerance 0.1
+
+Every scenario reports its throughput (req/s), p50/p99 latency and the peak
+memory allocated while running it. The upstream runs in a subprocess, so the
+measures only cover the client. With --compare, the run fails when a
+scenario is slower than the baseline results beyond the tolerance.
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import django
+from django.conf import settings
+
+from benchmarks.upstream import Upstream
+
+ACTIONS = ("list", "retrieve", "create", "update", "delete")
+MODES = ("direct", "view")
+TRANSPORTS = {
+    "requests": "spook.transports.RequestsTransport",
+    "urllib3": "spook.transports.Urllib3Transport",
+}
+
+
+def setup_django(transport: str = "requests"):
+    if not settings.configured:
+        settings.configure(
+            SPOOK_TRANSPORT=TRANSPORTS[transport],
+            INSTALLED_APPS=("spook",),
+            SECRET_KEY="spook benchmarks",
+            ALLOWED_HOSTS=["*"],
+            REST_FRAMEWORK={"UNAUTHENTICATED_USER": None},
+        )
+        django.setup()
+
+
+def build_calls(url: str) -> Dict[str, Dict[str, Callable[[], int]]]:
+    """
+    Returns the calls of every mode and action, each returning the response status
+    """
+    from rest_framework import serializers
+    from rest_framework.test import APIRequestFactory
+
+    from spook.resources import APIResource
+    from spook.validators import get_validator_class
+    from spook.views import (
+        APIResourceListCreateView,
+        APIResourceRetrieveUpdateDestroyView,
+    )
+
+    class ProductSerializer(serializers.Serializer):
+        id = serializers.IntegerField(read_only=True)
+        name = serializers.CharField()
+
+    class ProductResource(APIResource):
+        api_url = url
+        validator = get_validator_class(ProductSerializer)
+
+    class ViewMixin(object):
+        resource = ProductResource
+        serializer_class = ProductSerializer
+        authentication_classes = []
+        permission_classes = []
+
+        def get_token(self, request):
+            return ""
+
+    class ListCreateView(ViewMixin, APIResourceListCreateView):
+        pass
+
+    class DetailView(ViewMixin, APIResourceRetrieveUpdateDestroyView):
+        pass
+
+    factory = APIRequestFactory()
+    list_view = ListCreateView.as_view()
+    detail_view = DetailView.as_view()
+    payload = {"name": "Benchmark"}
+
+    def render(response) -> int:
+        response.render()
+        return response.status_code
+
+    return {
+        "direct": {
+            "list": lambda: ProductResource().list().status,
+            "retrieve": lambda: ProductResource().retrieve(1).status,
+            "create": lambda: ProductResource().create(payload).status,
+            "update": lambda: ProductResource().update(1, payload).status,
+            "delete": lambda: ProductResource().delete(1).status,
+        },
+        "view": {
+            "list": lambda: render(list_view(factory.get("/products/"))),
+            "retrieve": lambda: render(detail_view(factory.get("/products/1/"), pk=1)),
+            "create": lambda: render(
+                list_view(factory.post("/products/", payload, format="json"))
+            ),
+            "update": lambda: render(
+                detail_view(factory.put("/products/1/", payload, format="json"), pk=1)
+            ),
+            "delete": lambda: render(detail_view(factory.delete("/products/1/"), pk=1)),
+        },
+    }
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0
+
+    index = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return sorted(values)[index]
+
+
+def run_calls(call: Callable[[], int], requests: int, concurrency: int) -> tuple:
+    """
+    Runs the call the given number of times from concurrency threads
+    :return: The latencies in seconds, the number of errors and the elapsed time
+    """
+
+    def timed_call(_):
+        started = time.perf_counter()
+        try:
+            status = call()
+        except Exception:
+            status = None
+        return time.perf_counter() - started, status is None or status >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed_call, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, failed in outcomes if failed)
+    return latencies, errors, elapsed
+
+
+def measure_peak_memory(call: Callable[[], int], requests: int, concurrency: int):
+    """
+    Returns the peak memory, in KiB, allocated by Python while running the call
+    """
+    tracemalloc.start()
+    try:
+        run_calls(call, requests, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return round(peak / 1024, 1)
+
+
+def run_scenario(
+    mode: str,
+    action: str,
+    call: Callable[[], int],
+    requests: int,
+    concurrency: int,
+    warm_up: int = 10,
+    memory_requests: int = 100,
+) -> dict:
+    run_calls(call, warm_up, concurrency)
+    latencies, errors, elapsed = run_calls(call, requests, concurrency)
+    peak_memory = None
+    if memory_requests:
+        peak_memory = measure_peak_memory(
+            call, min(memory_requests, requests), concurrency
+        )
+
+    return {
+        "name": f"{mode}.{action}.c{concurrency}",
+        "mode": mode,
+        "action": action,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_memory_kb": peak_memory,
+    }
+
+
+def run(options) -> dict:
+    setup_django(options.transport)
+    upstream = Upstream(
+        latency=options.latency,
+        payload_items=options.payload_items,
+        page_size=options.page_size,
+        error_rate=options.error_rate,
+    )
+    results = []
+    with upstream:
+        calls = build_calls(upstream.url)
+        for mode in options.modes:
+            for action in options.actions:
+                for concurrency in options.concurrency:
+                    result = run_scenario(
+                        mode,
+                        action,
+                        calls[mode][action],
+                        options.requests,
+                        concurrency,
+                        memory_requests=options.memory_requests,
+                    )
+                    print_result(result)
+                    results.append(result)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "platform": platform.platform(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "options": {
+                "requests": options.requests,
+                "latency": options.latency,
+                "payload_items": options.payload_items,
+                "page_size": options.page_size,
+                "error_rate": options.error_rate,
+                "transport": options.transport,
+            },
+        },
+        "results": results,
+    }
+
+
+def print_result(result: dict):
+    memory = result["peak_memory_kb"]
+    print(
+        f"{result['name']:<24} {result['rps']:>10.1f} req/s "
+        f"p50 {result['p50_ms']:>9.3f}ms p99 {result['p99_ms']:>9.3f}ms "
+        f"errors {result['errors']:>5} "
+        f"peak {'-' if memory is None else memory}KiB"
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Returns the regressions of the results against the baseline: scenarios whose
+    throughput dropped or whose p99 latency grew beyond the tolerance
+    """
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        previous = baseline_results.get(result["name"])
+        if previous is None:
+            continue
+
+        if result["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{result['name']}: {result['rps']} req/s < {previous['rps']} req/s"
+            )
+        if result["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{result['name']}: p99 {result['p99_ms']}ms > {previous['p99_ms']}ms"
+            )
+
+    return regressions
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--actions", nargs="+", choices=ACTIONS, default=list(ACTIONS))
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Upstream latency in seconds"
+    )
+    parser.add_argument(
+        "--payload-items", type=int, default=10, help="Items in the list payload"
+    )
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--transport",
+        choices=tuple(TRANSPORTS),
+        default="requests",
+        help="Transport of the resources",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="Ratio of 503 upstream answers"
+    )
+    parser.add_argument(
+        "--memory-requests",
+        type=int,
+        default=100,
+        help="Requests traced to measure the peak memory, 0 to skip it",
+    )
+    parser.add_argument("--output", help="JSON file to store the results")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed throughput and p99 regression ratio",
+    )
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    options = get_parser().parse_args(argv)
+    results = run(options)
+    if options.output:
+        with open(options.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if options.compare:
+        with open(options.compare) as baseline:
+            regressions = compare(results, json.load(baseline), options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
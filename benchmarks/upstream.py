@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qs, urlsplit
+
+LIST_URL = re.compile(r"^/products/?$")
+ITEM_URL = re.compile(r"^/products/+(?P<pk>\d+)/?$")
+
+
+class UpstreamServer(object):
+    """
+    Local stand-in for an upstream DRF API serving /products/, with a
+    configurable latency, payload size and error rate, served from threads of
+    the current process
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        payload_items: int = 10,
+        page_size: int = 100,
+        error_rate: float = 0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.payload_items = payload_items
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.get_handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/products/"
+
+    def make_item(self, pk: int) -> dict:
+        return {
+            "id": pk,
+            "name": f"Product {pk}",
+            "description": "Lorem ipsum dolor sit amet " * 4,
+            "price": pk * 1.5,
+            "tags": ["benchmark", "spook"],
+        }
+
+    def make_page(self, page: int) -> dict:
+        start = (page - 1) * self.page_size
+        end = min(start + self.page_size, self.payload_items)
+        next_url = f"{self.url}?page={page + 1}" if end < self.payload_items else None
+        return {
+            "count": self.payload_items,
+            "next": next_url,
+            "previous": None,
+            "results": [self.make_item(pk) for pk in range(start + 1, end + 1)],
+        }
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+
+        with self.random_lock:
+            return self.random.random() < self.error_rate
+
+    def get_handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status: int, data=None):
+                body = json.dumps(data).encode() if data is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"null")
+
+            def handle_request(self, method: str):
+                body = self.read_body() if method in ("POST", "PUT", "PATCH") else None
+                if upstream.latency:
+                    time.sleep(upstream.latency)
+                if upstream.should_fail():
+                    return self.send_json(503, {"detail": "Unavailable"})
+
+                url = urlsplit(self.path)
+                match = ITEM_URL.match(url.path)
+                if LIST_URL.match(url.path):
+                    if method == "GET":
+                        page = int(parse_qs(url.query).get("page", ["1"])[0])
+                        return self.send_json(200, upstream.make_page(page))
+                    if method == "POST":
+                        return self.send_json(201, {"id": 1, **body})
+                elif match is not None:
+                    pk = int(match.group("pk"))
+                    if method == "GET":
+                        return self.send_json(200, upstream.make_item(pk))
+                    if method in ("PUT", "PATCH"):
+                        return self.send_json(200, {**upstream.make_item(pk), **body})
+                    if method == "DELETE":
+                        return self.send_json(204)
+
+                self.send_json(404, {"detail": "Not found."})
+
+            def do_GET(self):
+                self.handle_request("GET")
+
+            def do_POST(self):
+                self.handle_request("POST")
+
+            def do_PUT(self):
+                self.handle_request("PUT")
+
+            def do_PATCH(self):
+                self.handle_request("PATCH")
+
+            def do_DELETE(self):
+                self.handle_request("DELETE")
+
+        return Handler
+
+    def start(self) -> "UpstreamServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "UpstreamServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Upstream(object):
+    """
+    Runs the stand-in upstream in a subprocess, so the measures of the client
+    don't include the server threads contending for the GIL, nor the memory
+    they allocate
+    """
+
+    def __init__(
+        self,
+        latency: float = 0,
+        payload_items: int = 10,
+        page_size: int = 100,
+        error_rate: float = 0,
+        seed: int = 0,
+    ):
+        self.options = {
+            "latency": latency,
+            "payload-items": payload_items,
+            "page-size": page_size,
+            "error-rate": error_rate,
+            "seed": seed,
+        }
+        self.process = None
+        self.url = None
+
+    def get_command(self) -> List[str]:
+        command = [sys.executable, "-m", "benchmarks.upstream"]
+        for name, value in self.options.items():
+            command += [f"--{name}", str(value)]
+
+        return command
+
+    def start(self) -> "Upstream":
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            self.get_command(), cwd=root, stdout=subprocess.PIPE, text=True
+        )
+        self.url = self.process.stdout.readline().strip()
+        if not self.url:
+            self.stop()
+            raise RuntimeError("The upstream could not be started")
+
+        return self
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+    def __enter__(self) -> "Upstream":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv: List[str] = None):
+    """
+    Serves the stand-in upstream until terminated, printing its url first
+    """
+    parser = argparse.ArgumentParser(description="Stand-in upstream")
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--payload-items", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(argv)
+
+    server = UpstreamServer(
+        latency=options.latency,
+        payload_items=options.payload_items,
+        page_size=options.page_size,
+        error_rate=options.error_rate,
+        seed=options.seed,
+    )
+    print(server.url, flush=True)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
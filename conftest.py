@@ -14,6 +14,7 @@ SETTINGS_DICT = {
         "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
     },
     "DEFAULT_AUTO_FIELD": "django.db.models.AutoField",
+    "REST_FRAMEWORK": {"UNAUTHENTICATED_USER": None},
 }
 
 
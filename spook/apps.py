@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SpookConfig(AppConfig):
     name = "spook"
     verbose_name = "Spook"
+
+    def ready(self):
+        from spook import settings
+        from spook.transports import get_default_transport
+
+        get_default_transport().warm_up_all(settings.POOL_WARM_UP_URLS)
@@ -0,0 +1,145 @@
+import threading
+import time
+from typing import Dict, Hashable
+
+from spook.exceptions import APIResourceCircuitOpenException
+
+
+class CircuitBreaker(object):
+    """
+    Thread safe circuit breaker. It opens after `failure_threshold` consecutive
+    failures, rejecting the calls for `recovery_timeout` seconds. Then it turns
+    half-open and lets `half_open_max_calls` probes through: a successful probe
+    closes it again, a failed one opens it for another `recovery_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str = "",
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._failures = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._total_failures = 0
+        self._rejected = 0
+        self._opened = 0
+
+    def _update_state(self):
+        if self._state == self.OPEN:
+            if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._state = self.HALF_OPEN
+                self._probes = 0
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._opened += 1
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._update_state()
+            return self._state
+
+    def before_call(self):
+        """
+        Raises APIResourceCircuitOpenException when the call can't go through
+        """
+        with self._lock:
+            self._update_state()
+            if self._state == self.HALF_OPEN:
+                rejected = self._probes >= self.half_open_max_calls
+            else:
+                rejected = self._state == self.OPEN
+            if rejected:
+                self._rejected += 1
+                raise APIResourceCircuitOpenException(self.name)
+
+            if self._state == self.HALF_OPEN:
+                self._probes += 1
+            self._calls += 1
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != self.OPEN:
+                self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._total_failures += 1
+            if self._state == self.HALF_OPEN:
+                self._open()
+            elif self._state == self.CLOSED:
+                if self._failures >= self.failure_threshold:
+                    self._open()
+
+    def release(self):
+        """
+        Gives back the probe of a call cancelled before its outcome was known
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._update_state()
+            return {
+                "state": self._state,
+                "calls": self._calls,
+                "failures": self._total_failures,
+                "consecutive_failures": self._failures,
+                "rejected": self._rejected,
+                "opened": self._opened,
+            }
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(key: Hashable, **options) -> CircuitBreaker:
+    """
+    Returns the circuit breaker shared by every resource calling the same upstream
+    """
+    breaker = _circuit_breakers.get(key)
+    if breaker is None:
+        with _circuit_breakers_lock:
+            breaker = _circuit_breakers.get(key)
+            if breaker is None:
+                breaker = _circuit_breakers[key] = CircuitBreaker(
+                    name=str(key), **options
+                )
+
+    return breaker
+
+
+def get_circuit_breakers() -> Dict[Hashable, CircuitBreaker]:
+    """
+    Returns the circuit breakers created in this process, for monitoring
+    """
+    with _circuit_breakers_lock:
+        return dict(_circuit_breakers)
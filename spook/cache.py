@@ -0,0 +1,484 @@
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Type
+
+
+class CacheEntry(object):
+    """
+    Decoded upstream response stored in a response cache
+    """
+
+    __slots__ = (
+        "data",
+        "status",
+        "size",
+        "expires",
+        "etag",
+        "last_modified",
+        "stale_timeout",
+    )
+
+    def __init__(
+        self,
+        data: Any,
+        status: int,
+        size: int = 0,
+        expires: float = None,
+        etag: str = None,
+        last_modified: str = None,
+        stale_timeout: float = 0,
+    ):
+        self.data = data
+        self.status = status
+        self.size = size
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stale_timeout = stale_timeout
+
+    @property
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def is_fresh(self, now: float = None) -> bool:
+        if self.expires is None:
+            return True
+
+        return (time.monotonic() if now is None else now) < self.expires
+
+    def is_stale_within(self, seconds: float, now: float = None) -> bool:
+        """
+        Returns whether the entry expired less than the given seconds ago
+        """
+        if self.expires is None or not seconds:
+            return False
+
+        return (time.monotonic() if now is None else now) < self.expires + seconds
+
+    @property
+    def is_retained(self) -> bool:
+        """
+        Returns whether an expired entry is kept, to be revalidated or served stale
+        """
+        return self.has_validators or self.is_stale_within(self.stale_timeout)
+
+
+class BaseResponseCache(object):
+    """
+    Base class for the response caches of the resources. Entries are grouped by
+    url, so all the entries of an url can be invalidated at once.
+    """
+
+    # Whether the calls to the cache block on I/O, so async resources run them
+    # in a worker thread
+    blocking = False
+
+    def __init__(self, **options):
+        self.options = options
+
+    def get(self, key: str, stale: bool = False) -> Optional[CacheEntry]:
+        """
+        Returns the entry of the key. Expired entries with validators, or within
+        their stale timeout, are only returned when stale is True, so they can be
+        revalidated or served stale.
+        """
+        raise NotImplementedError
+
+    def set(
+        self,
+        key: str,
+        url: str,
+        entry: CacheEntry,
+        timeout: float,
+        stale_timeout: float = 0,
+    ):
+        """
+        Stores an entry for timeout seconds, kept stale_timeout seconds longer
+        """
+        raise NotImplementedError
+
+    def touch(self, key: str, timeout: float):
+        """
+        Renews an entry after the upstream confirmed it has not been modified
+        """
+        raise NotImplementedError
+
+    def invalidate(self, url: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class LocMemResponseCache(BaseResponseCache):
+    """
+    Thread safe in-process cache with TTL and LRU eviction, bounded by the number
+    of entries and, optionally, by the size of the upstream bodies.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, **options):
+        super().__init__(**options)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._urls = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._revalidations = 0
+
+    def get(self, key: str, stale: bool = False) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+
+            url, entry = item
+            if not entry.is_fresh():
+                self._misses += 1
+                if stale and entry.is_retained:
+                    self._entries.move_to_end(key)
+                    return entry
+
+                self._remove(key)
+                self._expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(
+        self,
+        key: str,
+        url: str,
+        entry: CacheEntry,
+        timeout: float,
+        stale_timeout: float = 0,
+    ):
+        entry.expires = time.monotonic() + timeout
+        entry.stale_timeout = stale_timeout
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (url, entry)
+            self._urls.setdefault(url, set()).add(key)
+            self._size += entry.size
+            self._evict()
+
+    def touch(self, key: str, timeout: float):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                item[1].expires = time.monotonic() + timeout
+                self._revalidations += 1
+
+    def invalidate(self, url: str):
+        with self._lock:
+            for key in self._urls.get(url, set()).copy():
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._urls.clear()
+            self._size = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "revalidations": self._revalidations,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+
+    def _remove(self, key: str):
+        url, entry = self._entries.pop(key)
+        self._size -= entry.size
+        keys = self._urls[url]
+        keys.discard(key)
+        if not keys:
+            del self._urls[url]
+
+    def _is_full(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+
+        return self.max_bytes is not None and self._size > self.max_bytes
+
+    def _evict(self):
+        while self._entries and self._is_full():
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+
+class DjangoResponseCache(BaseResponseCache):
+    """
+    Cache stored in a Django cache backend, so every worker and node shares the
+    entries. They are pickled as plain tuples, compressed past
+    `compress_min_size` bytes. Invalidating an url or clearing the cache bumps a
+    version key instead of deleting the entries, which the backends can't list.
+    Expired entries with validators are kept `validators_timeout` seconds.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        alias: str = "default",
+        key_prefix: str = "spook",
+        compress_min_size: int = 1024,
+        validators_timeout: float = 24 * 60 * 60,
+        **options,
+    ):
+        super().__init__(**options)
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self.compress_min_size = compress_min_size
+        self.validators_timeout = validators_timeout
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._revalidations = 0
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def make_key(self, *parts: str) -> str:
+        return ":".join((self.key_prefix, *parts))
+
+    def get_version_keys(self, url: str) -> tuple:
+        return self.make_key("generation"), self.make_key("url", url)
+
+    def get_versions(self, url: str, create: bool = False) -> Optional[dict]:
+        """
+        Returns the version keys of an url, creating the missing ones when asked.
+        None when any of them is missing, as entries stored before it was evicted
+        could have been invalidated meanwhile
+        """
+        keys = self.get_version_keys(url)
+        versions = self.cache.get_many(keys)
+        if len(versions) == len(keys):
+            return versions
+        if not create:
+            return None
+
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid.uuid4().hex, None)
+        versions = self.cache.get_many(keys)
+
+        return versions if len(versions) == len(keys) else None
+
+    def dumps(self, url: str, entry: CacheEntry, versions: tuple) -> bytes:
+        expires_at = time.time() + entry.expires - time.monotonic()
+        value = pickle.dumps(
+            (
+                url,
+                versions,
+                entry.data,
+                entry.status,
+                entry.size,
+                expires_at,
+                entry.stale_timeout,
+                entry.etag,
+                entry.last_modified,
+            ),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        if len(value) >= self.compress_min_size:
+            return b"z" + zlib.compress(value)
+
+        return b"p" + value
+
+    def loads(self, value: bytes) -> tuple:
+        if value[:1] == b"z":
+            value = zlib.decompress(value[1:])
+        else:
+            value = value[1:]
+
+        (
+            url,
+            versions,
+            data,
+            status,
+            size,
+            expires_at,
+            stale_timeout,
+            etag,
+            last_modified,
+        ) = pickle.loads(value)
+        entry = CacheEntry(
+            data=data,
+            status=status,
+            size=size,
+            expires=time.monotonic() + expires_at - time.time(),
+            etag=etag,
+            last_modified=last_modified,
+            stale_timeout=stale_timeout,
+        )
+        return url, versions, entry
+
+    def get_backend_timeout(self, entry: CacheEntry) -> float:
+        timeout = max(entry.expires - time.monotonic(), 0) + entry.stale_timeout
+        if entry.has_validators:
+            timeout = max(timeout, self.validators_timeout)
+
+        return timeout
+
+    def load(self, key: str) -> Optional[tuple]:
+        """
+        Returns the url and entry of the key, None when it is missing or was
+        invalidated
+        """
+        entry_key = self.make_key("entry", key)
+        value = self.cache.get(entry_key)
+        if value is None:
+            return None
+
+        url, versions, entry = self.loads(value)
+        current = self.get_versions(url)
+        if current is None or current != versions:
+            return None
+
+        return url, entry
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key: str, stale: bool = False) -> Optional[CacheEntry]:
+        loaded = self.load(key)
+        if loaded is None:
+            self._count("_misses")
+            return None
+
+        url, entry = loaded
+        if not entry.is_fresh():
+            self._count("_misses")
+            if stale and entry.is_retained:
+                return entry
+
+            self._count("_expirations")
+            return None
+
+        self._count("_hits")
+        return entry
+
+    def set(
+        self,
+        key: str,
+        url: str,
+        entry: CacheEntry,
+        timeout: float,
+        stale_timeout: float = 0,
+    ):
+        entry.expires = time.monotonic() + timeout
+        entry.stale_timeout = stale_timeout
+        versions = self.get_versions(url, create=True)
+        if versions is None:
+            return
+
+        self.cache.set(
+            self.make_key("entry", key),
+            self.dumps(url, entry, versions),
+            self.get_backend_timeout(entry),
+        )
+
+    def touch(self, key: str, timeout: float):
+        entry_key = self.make_key("entry", key)
+        value = self.cache.get(entry_key)
+        if value is None:
+            return
+
+        url, versions, entry = self.loads(value)
+        entry.expires = time.monotonic() + timeout
+        self.cache.set(
+            entry_key,
+            self.dumps(url, entry, versions),
+            self.get_backend_timeout(entry),
+        )
+        self._count("_revalidations")
+
+    def invalidate(self, url: str):
+        self.cache.set(self.make_key("url", url), uuid.uuid4().hex, None)
+
+    def clear(self):
+        self.cache.set(self.make_key("generation"), uuid.uuid4().hex, None)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the counters of this process
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "expirations": self._expirations,
+                "revalidations": self._revalidations,
+            }
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def start_refresh(key: Hashable) -> bool:
+    """
+    Marks an entry as being refreshed in the background
+    :return: False when it is already being refreshed
+    """
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+
+        _refreshing.add(key)
+        return True
+
+
+def finish_refresh(key: Hashable):
+    with _refreshing_lock:
+        _refreshing.discard(key)
+
+
+_resource_caches = {}
+_resource_caches_lock = threading.Lock()
+
+
+def get_resource_cache(
+    resource_class: Type, cache_class: Type[BaseResponseCache], **options
+) -> BaseResponseCache:
+    """
+    Returns the cache shared by all the instances of a resource class
+    """
+    cache = _resource_caches.get(resource_class)
+    if cache is None:
+        with _resource_caches_lock:
+            cache = _resource_caches.get(resource_class)
+            if cache is None:
+                cache = _resource_caches[resource_class] = cache_class(**options)
+
+    return cache
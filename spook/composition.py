@@ -0,0 +1,202 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple, Type
+
+from spook.deadlines import submit_in_context
+
+
+class Relation(object):
+    """
+    Declares that a key of the results references the items of another resource,
+    which are embedded in the field the relation is declared with:
+
+        relations = {"customer": Relation(CustomerResource, key="customer_id")}
+
+    With `many`, the key holds a list of references. Items that could not be
+    retrieved are embedded as None, or skipped in `many` relations.
+    """
+
+    def __init__(
+        self,
+        resource: Type,
+        key: str,
+        many: bool = False,
+        params: dict = None,
+    ):
+        self.resource = resource
+        self.key = key
+        self.many = many
+        self.params = params or {}
+
+    def get_pks(self, item: dict) -> List[Any]:
+        value = item.get(self.key)
+        if value is None:
+            return []
+
+        return list(value) if self.many else [value]
+
+    def get_value(self, item: dict, items: Dict[Any, Any]):
+        value = item.get(self.key)
+        if not self.many:
+            return items.get(value) if value is not None else None
+
+        return [items[pk] for pk in value or () if pk in items]
+
+    def is_async(self) -> bool:
+        return asyncio.iscoroutinefunction(self.resource.retrieve_many)
+
+    def get_items(self, responses: dict) -> dict:
+        return {
+            pk: response.data
+            for pk, response in responses.items()
+            if response.error is None and response.status < 400
+        }
+
+    def load(self, pks: List[Any], token: str = None, context: dict = None) -> dict:
+        """
+        Retrieves the referenced items, keyed by their pk. The items of a related
+        resource that declares relations are composed too
+        """
+        if self.is_async():
+            raise TypeError(
+                f"{self.resource.__name__} is async, compose it with an async resource"
+            )
+
+        resource = self.resource(token=token, context=context)
+        items = self.get_items(resource.retrieve_many(pks, **self.params))
+        if items and resource.get_relations():
+            items = dict(zip(items, resource.compose(list(items.values()))))
+
+        return items
+
+    async def load_async(
+        self, pks: List[Any], token: str = None, context: dict = None
+    ) -> dict:
+        """
+        Retrieves the referenced items from an async resource. Sync resources are
+        loaded in the default executor
+        """
+        if not self.is_async():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, contextvars.copy_context().run, self.load, pks, token, context
+            )
+
+        resource = self.resource(token=token, context=context)
+        items = self.get_items(await resource.retrieve_many(pks, **self.params))
+        if items and resource.get_relations():
+            composed = await resource.compose(list(items.values()))
+            items = dict(zip(items, composed))
+
+        return items
+
+
+class Composer(object):
+    """
+    Embeds the related items of the results, dataloader style: the references of
+    every relation are collected from all the results and deduplicated, so each
+    relation is loaded with a single `retrieve_many` (concurrent requests, or
+    batches when the related resource declares `batch_retrieve_param`). The
+    relations are loaded concurrently.
+    """
+
+    def __init__(
+        self, relations: Dict[str, Relation], token: str = None, context: dict = None
+    ):
+        self.relations = relations
+        self.token = token
+        self.context = context
+
+    def get_pks(self, items: List[dict]) -> Dict[str, List[Any]]:
+        pks = {}
+        for field, relation in self.relations.items():
+            field_pks = dict.fromkeys(
+                pk
+                for item in items
+                if isinstance(item, dict)
+                for pk in relation.get_pks(item)
+            )
+            if field_pks:
+                pks[field] = list(field_pks)
+
+        return pks
+
+    def load(self, items: List[dict]) -> Dict[str, dict]:
+        """
+        Returns the related items of every relation, keyed by their pk
+        """
+        pks = self.get_pks(items)
+        if not pks:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=len(pks)) as executor:
+            futures = {
+                field: submit_in_context(
+                    executor,
+                    self.relations[field].load,
+                    field_pks,
+                    self.token,
+                    self.context,
+                )
+                for field, field_pks in pks.items()
+            }
+
+        return {field: future.result() for field, future in futures.items()}
+
+    async def load_async(self, items: List[dict]) -> Dict[str, dict]:
+        pks = self.get_pks(items)
+        loaded = await asyncio.gather(
+            *[
+                self.relations[field].load_async(field_pks, self.token, self.context)
+                for field, field_pks in pks.items()
+            ]
+        )
+
+        return dict(zip(pks, loaded))
+
+    def compose_item(self, item, loaded: Dict[str, dict]):
+        if not isinstance(item, dict):
+            return item
+
+        composed = dict(item)
+        for field, relation in self.relations.items():
+            composed[field] = relation.get_value(item, loaded.get(field, {}))
+
+        return composed
+
+    def get_items(self, data) -> Tuple[List[dict], bool]:
+        """
+        Returns the items of the data, and whether it is a paginated response
+        """
+        paginated = isinstance(data, dict) and isinstance(data.get("results"), list)
+        if paginated:
+            return data["results"], True
+        if isinstance(data, list):
+            return data, False
+
+        return [data], False
+
+    def build(self, data, items: List[dict], paginated: bool, loaded: Dict[str, dict]):
+        composed = [self.compose_item(item, loaded) for item in items]
+
+        if paginated:
+            return {**data, "results": composed}
+        if isinstance(data, list):
+            return composed
+
+        return composed[0]
+
+    def compose(self, data):
+        """
+        Returns a copy of the data with the related items embedded. The data can
+        be a list of results, a paginated response or a single item
+        """
+        items, paginated = self.get_items(data)
+
+        return self.build(data, items, paginated, self.load(items))
+
+    async def compose_async(self, data):
+        items, paginated = self.get_items(data)
+
+        return self.build(data, items, paginated, await self.load_async(items))
@@ -0,0 +1,115 @@
+import gzip
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+def _get_brotli():
+    try:
+        import brotli
+    except ImportError:
+        try:
+            import brotlicffi as brotli
+        except ImportError:
+            return None
+
+    return brotli
+
+
+def _get_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+
+    return zstandard
+
+
+# Looked up once, as Python does not cache failed imports and retrying them
+# searches the import path again
+brotli = _get_brotli()
+zstandard = _get_zstandard()
+
+
+def get_compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    """
+    Returns the functions compressing a request body, by content encoding.
+    Brotli and zstd are only available when their packages are installed
+    """
+    compressors = {
+        "gzip": lambda body: gzip.compress(body, compresslevel=6),
+        "deflate": zlib.compress,
+    }
+    if brotli is not None:
+        compressors["br"] = brotli.compress
+    if zstandard is not None:
+        compressors["zstd"] = zstandard.ZstdCompressor().compress
+
+    return compressors
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    compressors = get_compressors()
+    if encoding not in compressors:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    return compressors[encoding](body)
+
+
+def get_decodable_encodings() -> Iterable[str]:
+    """
+    Returns the content encodings the http clients can decode in this environment
+    """
+    encodings = ["gzip", "deflate"]
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+
+    return encodings
+
+
+@lru_cache(maxsize=64)
+def _get_accept_encoding(encodings: Tuple[str, ...]) -> str:
+    decodable = get_decodable_encodings()
+    accepted = [
+        encoding
+        for encoding in encodings
+        if encoding in decodable or encoding == "identity"
+    ]
+
+    return ", ".join(accepted) or "identity"
+
+
+def get_accept_encoding(encodings: Iterable[str]) -> str:
+    """
+    Returns the Accept-Encoding header negotiating the given encodings, skipping
+    the ones that could not be decoded. The values are built once
+    """
+    return _get_accept_encoding(tuple(encodings))
+
+
+def get_wire_size(response, size: int) -> Optional[int]:
+    """
+    Returns the bytes of a response body as transferred, before decoding it
+    :param response: A requests or httpx response whose body has been read
+    :param size: The size of the decoded body
+    :return: The size, None when it is unknown
+    """
+    downloaded = getattr(response, "num_bytes_downloaded", None)
+    if isinstance(downloaded, int):
+        return downloaded
+
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("Content-Encoding", "identity") == "identity":
+        return size
+
+    tell = getattr(getattr(response, "raw", None), "tell", None)
+    if callable(tell):
+        try:
+            return tell()
+        except Exception:
+            pass
+
+    length = headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
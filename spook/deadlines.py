@@ -0,0 +1,63 @@
+import contextvars
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from spook.exceptions import APIResourceDeadlineException
+
+_deadline = contextvars.ContextVar("spook_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    Limits the upstream requests performed inside the block, including retries and
+    the ones sent from the resource thread pools, to a total budget of seconds.
+    Nested deadlines can only shorten the budget.
+    """
+    if seconds is None:
+        yield
+        return
+
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires = min(expires, current)
+
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_time() -> Optional[float]:
+    """
+    Returns the seconds left before the current deadline, None without deadline
+    """
+    expires = _deadline.get()
+    if expires is None:
+        return None
+
+    return expires - time.monotonic()
+
+
+def check_deadline() -> Optional[float]:
+    """
+    Returns the seconds left before the current deadline, raising
+    APIResourceDeadlineException when it has been exceeded
+    """
+    remaining = get_remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise APIResourceDeadlineException()
+
+    return remaining
+
+
+def submit_in_context(executor: Executor, fn: Callable, *args, **kwargs) -> Future:
+    """
+    Submits a call to an executor in a copy of the current context, so the
+    worker thread keeps the deadline of the caller
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
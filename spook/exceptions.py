@@ -4,3 +4,36 @@ class APIResourceException(Exception):
 
 class APIResourceInputValidationException(Exception):
     pass
+
+
+class APIResourcePageException(APIResourceException):
+    def __init__(self, url: str, status: int, data=None):
+        super().__init__(f"Could not fetch the page {url} ({status})")
+        self.url = url
+        self.status = status
+        self.data = data
+
+
+class APIResourceDeadlineException(APIResourceException):
+    def __init__(self, message: str = "The request deadline has been exceeded"):
+        super().__init__(message)
+
+
+class APIResourceCircuitOpenException(APIResourceException):
+    def __init__(self, name: str):
+        super().__init__(f"The circuit breaker of {name} is open")
+        self.name = name
+
+
+class APIResourceLimitException(APIResourceException):
+    def __init__(self, name: str, reason: str = "rate limit"):
+        super().__init__(f"The {reason} of {name} has been exceeded")
+        self.name = name
+        self.reason = reason
+
+
+class APIResourceTokenException(APIResourceException):
+    def __init__(self, url: str, status: int = None):
+        super().__init__(f"Could not obtain a token from {url} ({status})")
+        self.url = url
+        self.status = status
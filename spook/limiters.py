@@ -0,0 +1,262 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Hashable, Iterator, AsyncIterator
+
+from spook.exceptions import APIResourceLimitException
+
+
+def _set_result(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class UpstreamLimiter(object):
+    """
+    Thread safe rate limiter and bulkhead of an upstream. A token bucket lets
+    `rate` requests per second through, with bursts of up to `burst` requests,
+    and at most `max_in_flight` requests are sent at the same time. Callers
+    over the limits wait in a FIFO queue, threads and coroutines alike, for up
+    to the timeout they give, and get APIResourceLimitException past it.
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        rate: float = None,
+        burst: int = None,
+        max_in_flight: int = None,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.max_in_flight = max_in_flight
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._in_flight = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._acquired = 0
+        self._rejected = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def _reject(self, reason: str):
+        with self._lock:
+            self._rejected += 1
+        raise APIResourceLimitException(self.name, reason)
+
+    def reserve(self, timeout: float = None) -> float:
+        """
+        Takes a token from the bucket, ahead of time when it is empty
+        :return: The seconds to wait before using the token
+        """
+        if not self.rate:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated_at
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is None or wait <= timeout:
+                self._tokens -= 1
+                return wait
+
+        self._reject("rate limit")
+
+    def refund(self):
+        """
+        Gives back the token of a caller that didn't get an in flight slot
+        """
+        if not self.rate:
+            return
+
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def _try_acquire_slot(self) -> bool:
+        if self.max_in_flight is None:
+            return True
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return True
+
+        return False
+
+    def _cancel_waiter(self, wake) -> bool:
+        """
+        Removes a waiter from the queue
+        :return: False when the slot was handed to it meanwhile
+        """
+        with self._lock:
+            try:
+                self._waiters.remove(wake)
+            except ValueError:
+                return False
+
+        return True
+
+    def acquire_slot(self, timeout: float = None):
+        with self._lock:
+            if self._try_acquire_slot():
+                return
+            if timeout is not None and timeout <= 0:
+                rejected = True
+            else:
+                rejected = False
+                event = threading.Event()
+                wake = event.set
+                self._waiters.append(wake)
+        if rejected:
+            self._reject("max in flight")
+
+        if not event.wait(timeout) and self._cancel_waiter(wake):
+            self._reject("max in flight")
+
+    async def acquire_slot_async(self, timeout: float = None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire_slot():
+                return
+            if timeout is not None and timeout <= 0:
+                rejected = True
+            else:
+                rejected = False
+                future = loop.create_future()
+
+                def wake():
+                    loop.call_soon_threadsafe(_set_result, future)
+
+                self._waiters.append(wake)
+        if rejected:
+            self._reject("max in flight")
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if self._cancel_waiter(wake):
+                self._reject("max in flight")
+        except asyncio.CancelledError:
+            if not self._cancel_waiter(wake):
+                self.release()
+            raise
+
+    def release(self):
+        """
+        Frees an in flight slot, handing it to the first caller waiting for one
+        """
+        if self.max_in_flight is None:
+            return
+
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft()()
+            else:
+                self._in_flight -= 1
+
+    def _record_wait(self, seconds: float):
+        with self._lock:
+            self._acquired += 1
+            self._wait_time += seconds
+            self._max_wait_time = max(self._max_wait_time, seconds)
+
+    def _queue(self, delta: int):
+        with self._lock:
+            self._queued += delta
+
+    @contextmanager
+    def limit(self, timeout: float = None) -> Iterator[float]:
+        """
+        Waits for a token and an in flight slot, held until the block exits
+        :param timeout: Maximum seconds to wait, None waits as long as needed
+        :return: The seconds waited
+        """
+        started = time.monotonic()
+        self._queue(1)
+        try:
+            wait = self.reserve(timeout)
+            try:
+                if wait:
+                    time.sleep(wait)
+                self.acquire_slot(None if timeout is None else timeout - wait)
+            except BaseException:
+                self.refund()
+                raise
+        finally:
+            self._queue(-1)
+
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def limit_async(self, timeout: float = None) -> AsyncIterator[float]:
+        started = time.monotonic()
+        self._queue(1)
+        try:
+            wait = self.reserve(timeout)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                await self.acquire_slot_async(
+                    None if timeout is None else timeout - wait
+                )
+            except BaseException:
+                self.refund()
+                raise
+        finally:
+            self._queue(-1)
+
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "acquired": self._acquired,
+                "rejected": self._rejected,
+                "wait_seconds": self._wait_time,
+                "max_wait_seconds": self._max_wait_time,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: Hashable, **options) -> UpstreamLimiter:
+    """
+    Returns the limiter shared by every resource calling the same upstream. The
+    options of the first resource creating it apply
+    """
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limiter = _limiters[key] = UpstreamLimiter(name=str(key), **options)
+
+    return limiter
+
+
+def get_limiters() -> Dict[Hashable, UpstreamLimiter]:
+    """
+    Returns the limiters created in this process, for monitoring
+    """
+    with _limiters_lock:
+        return dict(_limiters)
@@ -0,0 +1,300 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.utils.module_loading import import_string
+
+from spook import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Counter(object):
+    """
+    Thread safe counter, keyed by the tuple of its label values
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple, value: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, labels: Tuple) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(object):
+    """
+    Thread safe histogram with fixed buckets, keyed by the tuple of its label
+    values. Every label set keeps its bucket counts, sum and count.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...],
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            values[0][index] += 1
+            values[1] += value
+            values[2] += 1
+
+    def get_count(self, labels: Tuple) -> int:
+        values = self._values.get(labels)
+        return values[2] if values else 0
+
+    def get_sum(self, labels: Tuple) -> float:
+        values = self._values.get(labels)
+        return values[1] if values else 0
+
+    def collect(self) -> Dict[Tuple, Tuple[List[int], float, int]]:
+        """
+        Returns the cumulative bucket counts, the sum and the count of every
+        label set
+        """
+        with self._lock:
+            values = {labels: list(value) for labels, value in self._values.items()}
+
+        result = {}
+        for labels, (counts, total, count) in values.items():
+            cumulative, accumulated = [], 0
+            for bucket_count in counts:
+                accumulated += bucket_count
+                cumulative.append(accumulated)
+            result[labels] = (cumulative, total, count)
+
+        return result
+
+
+class BaseMetricsExporter(object):
+    """
+    Receives the measures of the resources
+    """
+
+    def record_request(
+        self,
+        resource: str,
+        action: str,
+        status: str,
+        seconds: float,
+    ):
+        """
+        Records an upstream request, including its retries. The status is "error"
+        when no response was received
+        """
+        raise NotImplementedError
+
+    def record_response_size(self, resource: str, action: str, size: int):
+        raise NotImplementedError
+
+    def record_stage(self, resource: str, action: str, stage: str, seconds: float):
+        """
+        Records the time spent in a stage of the response processing, like
+        "decode", "map" or "paginate"
+        """
+        raise NotImplementedError
+
+    def record_transfer(
+        self,
+        resource: str,
+        action: str,
+        direction: str,
+        size: int,
+        wire_size: int,
+    ):
+        """
+        Records the size of a request body ("sent") or response body
+        ("received"), decoded and as transferred, compressed or not. Optional
+        """
+
+
+class InMemoryMetricsExporter(BaseMetricsExporter):
+    """
+    Aggregates the measures in counters and histograms kept in memory
+    """
+
+    def __init__(self, prefix: str = "spook"):
+        self.requests = Counter(
+            f"{prefix}_upstream_requests_total",
+            "Upstream requests.",
+            ("resource", "action", "status"),
+        )
+        self.request_seconds = Histogram(
+            f"{prefix}_upstream_request_duration_seconds",
+            "Upstream request latency, including retries.",
+            ("resource", "action", "status"),
+        )
+        self.response_bytes = Histogram(
+            f"{prefix}_upstream_response_size_bytes",
+            "Upstream response body size.",
+            ("resource", "action"),
+            buckets=SIZE_BUCKETS,
+        )
+        self.stage_seconds = Histogram(
+            f"{prefix}_stage_duration_seconds",
+            "Time spent processing the upstream responses, per stage.",
+            ("resource", "action", "stage"),
+        )
+        self.body_bytes = Counter(
+            f"{prefix}_upstream_body_bytes_total",
+            "Upstream request and response body bytes, decoded.",
+            ("resource", "action", "direction"),
+        )
+        self.wire_bytes = Counter(
+            f"{prefix}_upstream_wire_bytes_total",
+            "Upstream request and response body bytes, as transferred.",
+            ("resource", "action", "direction"),
+        )
+
+    @property
+    def metrics(self) -> list:
+        return [
+            self.requests,
+            self.request_seconds,
+            self.response_bytes,
+            self.stage_seconds,
+            self.body_bytes,
+            self.wire_bytes,
+        ]
+
+    def record_request(
+        self,
+        resource: str,
+        action: str,
+        status: str,
+        seconds: float,
+    ):
+        labels = (resource, action, status)
+        self.requests.inc(labels)
+        self.request_seconds.observe(labels, seconds)
+
+    def record_response_size(self, resource: str, action: str, size: int):
+        self.response_bytes.observe((resource, action), size)
+
+    def record_stage(self, resource: str, action: str, stage: str, seconds: float):
+        self.stage_seconds.observe((resource, action, stage), seconds)
+
+    def record_transfer(
+        self,
+        resource: str,
+        action: str,
+        direction: str,
+        size: int,
+        wire_size: int,
+    ):
+        labels = (resource, action, direction)
+        self.body_bytes.inc(labels, size)
+        self.wire_bytes.inc(labels, wire_size)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def format_labels(labelnames: Tuple[str, ...], labels: Tuple, **extra) -> str:
+    pairs = list(zip(labelnames, labels)) + list(extra.items())
+    if not pairs:
+        return ""
+
+    return "{%s}" % ",".join(f'{k}="{escape_label_value(v)}"' for k, v in pairs)
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusMetricsExporter(InMemoryMetricsExporter):
+    """
+    In memory exporter that renders its metrics in the Prometheus text format
+    """
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            if metric.type == "counter":
+                for labels, value in metric.collect().items():
+                    lines.append(
+                        f"{metric.name}{format_labels(metric.labelnames, labels)} "
+                        f"{format_value(value)}"
+                    )
+                continue
+
+            bounds = metric.buckets + (float("inf"),)
+            for labels, (counts, total, count) in metric.collect().items():
+                for bound, bucket_count in zip(bounds, counts):
+                    bucket_labels = format_labels(
+                        metric.labelnames, labels, le=format_value(bound)
+                    )
+                    lines.append(f"{metric.name}_bucket{bucket_labels} {bucket_count}")
+                formatted_labels = format_labels(metric.labelnames, labels)
+                lines.append(f"{metric.name}_sum{formatted_labels} {total!r}")
+                lines.append(f"{metric.name}_count{formatted_labels} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+_exporters = None
+_exporters_lock = threading.Lock()
+
+
+def get_metrics_exporters() -> List[BaseMetricsExporter]:
+    """
+    Returns the exporters declared in SPOOK_METRICS_EXPORTERS, built once
+    """
+    global _exporters
+
+    if _exporters is None:
+        with _exporters_lock:
+            if _exporters is None:
+                _exporters = [
+                    import_string(path)() for path in settings.METRICS_EXPORTERS
+                ]
+
+    return _exporters
+
+
+def get_metrics_exporter(
+    exporter_class: type = PrometheusMetricsExporter,
+) -> Optional[BaseMetricsExporter]:
+    """
+    Returns the first configured exporter of the given class
+    """
+    for exporter in get_metrics_exporters():
+        if isinstance(exporter, exporter_class):
+            return exporter
+
+    return None
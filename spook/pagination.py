@@ -1,3 +1,16 @@
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from math import ceil
+from typing import Dict, Generator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from spook.exceptions import APIResourcePageException
+
+LINK_RE = re.compile(r"<([^>]*)>([^,<]*)")
+REL_RE = re.compile(r'rel="?([^";]+)"?')
+
+
 class BasePagination(object):
     def __init__(self, data: dict, context: dict = None):
         self.data = data
@@ -15,6 +28,13 @@ class BasePagination(object):
     def get_results(self) -> list:
         raise NotImplementedError
 
+    def get_remaining_page_urls(self) -> Optional[List[str]]:
+        """
+        Returns the urls of all the pages after this one, so they can be fetched
+        concurrently, or None when they can't be known in advance
+        """
+        return None
+
     def get_paginated_response(self) -> dict:
         return {
             "next": self.get_next(),
@@ -25,6 +45,10 @@ class BasePagination(object):
 
 
 class DefaultPagination(BasePagination):
+    page_query_param = "page"
+    limit_query_param = "limit"
+    offset_query_param = "offset"
+
     def get_next(self) -> str:
         return self.data.get("next", "")
 
@@ -36,3 +60,452 @@ class DefaultPagination(BasePagination):
 
     def get_results(self) -> list:
         return self.data.get("results", [])
+
+    def get_remaining_page_urls(self) -> Optional[List[str]]:
+        next_url = self.get_next()
+        if not next_url:
+            return []
+
+        count = self.get_count()
+        parts = urlsplit(next_url)
+        pairs = parse_qsl(parts.query, keep_blank_values=True)
+        query = dict(pairs)
+
+        if self.page_query_param in query:
+            page_size = len(self.get_results())
+            if not page_size or not count:
+                return None
+
+            param = self.page_query_param
+            next_page = int(query[param])
+            positions = range(next_page, ceil(count / page_size) + 1)
+        elif self.limit_query_param in query and self.offset_query_param in query:
+            limit = int(query[self.limit_query_param])
+            offset = int(query[self.offset_query_param])
+            if not limit or not count:
+                return None
+
+            param = self.offset_query_param
+            positions = range(offset, count, limit)
+        else:
+            return None
+
+        return [self.get_page_url(parts, pairs, param, value) for value in positions]
+
+    def get_page_url(self, parts, pairs: List[Tuple[str, str]], param: str, value):
+        """
+        Returns the url of another page, replacing a query param and keeping the
+        repeated ones, such as filters by many values
+        """
+        query = [(key, value if key == param else item) for key, item in pairs]
+
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class RechunkedPagination(DefaultPagination):
+    """
+    Pagination serving pages of the size the client asks for, whatever the page
+    size of the upstream. It parses the upstream pages as DefaultPagination, and
+    plans the upstream requests covering a client page with `paginate`.
+    The upstream pages partially consumed by a client page are kept in a small
+    buffer, so the next client page starts from their leftover items.
+    """
+
+    page_size_query_param = "page_size"
+    default_page_size = 100
+    max_page_size = 1000
+    upstream_page_size = 100
+    buffer_size = 128
+    buffer_timeout = 30
+    uses_headers = False
+
+    def __init__(self, data: dict = None, context: dict = None, headers: dict = None):
+        super().__init__(data, context)
+        self.headers = headers or {}
+        self.leftovers = []
+
+    def get_count(self) -> Optional[int]:
+        return self.data.get("count")
+
+    def get_client_query_params(self) -> List[str]:
+        """
+        Returns the query params of the client page, not sent upstream
+        """
+        return [self.page_size_query_param]
+
+    def get_filters(self, params: dict) -> dict:
+        client_params = self.get_client_query_params()
+
+        return {key: value for key, value in params.items() if key not in client_params}
+
+    def get_int(self, params: dict, name: str, default: int, minimum: int) -> int:
+        """
+        Returns a numeric query param of the client, raising a 400 page error
+        when it is invalid
+        """
+        try:
+            value = int(params.get(name, default))
+        except (TypeError, ValueError):
+            value = minimum - 1
+        if value < minimum:
+            raise APIResourcePageException(
+                url=self.get_link(params),
+                status=400,
+                data={"detail": f"Invalid {name}."},
+            )
+
+        return value
+
+    def get_page_size(self, params: dict) -> int:
+        page_size = self.get_int(
+            params, self.page_size_query_param, self.default_page_size, 1
+        )
+
+        return min(page_size, self.max_page_size)
+
+    def get_link(self, params: dict, **changes) -> str:
+        """
+        Returns the url of another client page, with the given query params changed
+        """
+        query = urlencode({**params, **changes})
+        request = (self.context or {}).get("request")
+        if request is None:
+            return f"?{query}"
+
+        return request.build_absolute_uri(f"{request.path}?{query}")
+
+    def paginate(
+        self, url: str, params: dict
+    ) -> Generator[List[Tuple[str, dict]], List["RechunkedPagination"], dict]:
+        """
+            Plans the upstream requests of a client page. It yields the (url, params)
+            of the upstream pages to fetch, which can be fetched concurrently, and is
+            sent back their pagination instances, in the same order.
+        :param url: The url of the upstream list
+        :param params: The query params of the client
+        :return: The client page, with its count, next, previous and results
+        """
+        raise NotImplementedError
+
+
+class RangePagination(RechunkedPagination):
+    """
+    Base of the paginations of upstreams whose pages can be requested at any
+    position, so all the pages of a client page are fetched concurrently. When
+    the upstream doesn't send the count, they are fetched one after the other
+    until the client page is full or there is no next page.
+    """
+
+    def get_range(self, params: dict) -> Tuple[int, int]:
+        """
+        Returns the index of the first item of the client page and its size
+        """
+        raise NotImplementedError
+
+    def get_position_query(self, start: int, size: int) -> dict:
+        """
+        Returns the query params of the client page starting at an item
+        """
+        raise NotImplementedError
+
+    def get_upstream_queries(self, start: int, end: int) -> Tuple[List[dict], int]:
+        """
+        Returns the query params of the upstream pages holding the items from
+        start to end, and the index of the first one in those pages
+        """
+        raise NotImplementedError
+
+    def paginate(self, url: str, params: dict):
+        start, size = self.get_range(params)
+        filters = self.get_filters(params)
+        queries, skip = self.get_upstream_queries(start, start + size)
+        requests = [(url, {**filters, **queries[0]})]
+        pages = yield requests
+
+        count = pages[0].get_count()
+        if count is None:
+            for query in queries[1:]:
+                if not pages[-1].get_next():
+                    break
+                requests.append((url, {**filters, **query}))
+                pages += yield requests[-1:]
+        elif start < count:
+            queries, skip = self.get_upstream_queries(start, min(start + size, count))
+            requests += [(url, {**filters, **query}) for query in queries[1:]]
+            if len(requests) > 1:
+                pages += yield requests[1:]
+
+        results = [item for page in pages for item in page.get_results()]
+        end = skip + size
+        if end < len(results):
+            self.leftovers.append((requests[-1], pages[-1]))
+
+        has_next = end < len(results) or bool(pages[-1].get_next())
+        next_query = self.get_position_query(start + size, size)
+        previous_query = self.get_position_query(max(start - size, 0), size)
+
+        return {
+            "count": count,
+            "next": self.get_link(params, **next_query) if has_next else None,
+            "previous": self.get_link(params, **previous_query) if start else None,
+            "results": results[skip:end],
+        }
+
+
+class PageNumberPagination(RangePagination):
+    """
+    Re-chunks the pages of an upstream paginated by page number. The upstream
+    pages have `upstream_page_size` items, which is sent as the
+    `upstream_page_size_query_param` when the upstream lets it be chosen
+    """
+
+    upstream_page_size_query_param = None
+
+    def get_client_query_params(self) -> List[str]:
+        return [self.page_query_param, self.page_size_query_param]
+
+    def get_range(self, params: dict) -> Tuple[int, int]:
+        page = self.get_int(params, self.page_query_param, 1, 1)
+        size = self.get_page_size(params)
+
+        return (page - 1) * size, size
+
+    def get_position_query(self, start: int, size: int) -> dict:
+        return {
+            self.page_query_param: start // size + 1,
+            self.page_size_query_param: size,
+        }
+
+    def get_upstream_queries(self, start: int, end: int) -> Tuple[List[dict], int]:
+        size = self.upstream_page_size
+        first_page = start // size + 1
+        last_page = max(end - 1, start) // size + 1
+        query = {}
+        if self.upstream_page_size_query_param:
+            query[self.upstream_page_size_query_param] = size
+
+        queries = [
+            {**query, self.page_query_param: page}
+            for page in range(first_page, last_page + 1)
+        ]
+        return queries, start - (first_page - 1) * size
+
+
+class OffsetLimitPagination(RangePagination):
+    """
+    Re-chunks the pages of an upstream paginated by offset and limit, asking it
+    for at most `upstream_page_size` items per request
+    """
+
+    page_size_query_param = "limit"
+
+    def get_client_query_params(self) -> List[str]:
+        return [self.offset_query_param, self.limit_query_param]
+
+    def get_range(self, params: dict) -> Tuple[int, int]:
+        offset = self.get_int(params, self.offset_query_param, 0, 0)
+
+        return offset, self.get_page_size(params)
+
+    def get_position_query(self, start: int, size: int) -> dict:
+        return {self.offset_query_param: start, self.limit_query_param: size}
+
+    def get_upstream_queries(self, start: int, end: int) -> Tuple[List[dict], int]:
+        step = self.upstream_page_size
+        queries = [
+            {
+                self.offset_query_param: offset,
+                self.limit_query_param: min(step, end - offset),
+            }
+            for offset in range(start, max(end, start + 1), step)
+        ]
+        return queries, 0
+
+
+class CursorPagination(RechunkedPagination):
+    """
+    Re-chunks the pages of an upstream paginated by cursor, which are fetched one
+    after the other following their next and previous links. The cursor of the
+    client points to an item of an upstream page, by the url of the page and the
+    position of the item in it.
+    """
+
+    cursor_query_param = "cursor"
+
+    def get_client_query_params(self) -> List[str]:
+        return [self.cursor_query_param, self.page_size_query_param]
+
+    def encode_cursor(self, page_url: Optional[str], offset: int, reverse: bool) -> str:
+        position = {"o": offset, "r": int(reverse)}
+        if page_url:
+            parts = urlsplit(page_url)
+            position["p"] = urlunsplit(("", "", parts.path, parts.query, ""))
+
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor: str, url: str) -> Tuple[Optional[str], int, bool]:
+        """
+        Returns the upstream page url, the item offset and the direction of a
+        client cursor. The page is always requested to the host of the upstream.
+        """
+        try:
+            position = json.loads(urlsafe_b64decode(cursor.encode()))
+            offset, reverse = int(position["o"]), bool(position["r"])
+            page_url = position.get("p")
+            if offset < 0 or not isinstance(page_url, (str, type(None))):
+                raise ValueError(cursor)
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise APIResourcePageException(
+                url=url, status=400, data={"detail": "Invalid cursor"}
+            )
+
+        if page_url:
+            parts = urlsplit(page_url)
+            page_url = urlunsplit(urlsplit(url)[:2] + (parts.path, parts.query, ""))
+
+        return page_url, offset, reverse
+
+    def get_cursor_link(self, params: dict, *position) -> str:
+        cursor = self.encode_cursor(*position)
+
+        return self.get_link(params, **{self.cursor_query_param: cursor})
+
+    def get_request(
+        self, url: str, params: dict, page_url: Optional[str]
+    ) -> Tuple[str, dict]:
+        """
+        Returns the request of an upstream page, the first one when there is no url
+        """
+        if page_url:
+            return page_url, {}
+
+        return url, self.get_filters(params)
+
+    def paginate(self, url: str, params: dict):
+        size = self.get_page_size(params)
+        page_url, offset, reverse = None, 0, False
+        if params.get(self.cursor_query_param):
+            page_url, offset, reverse = self.decode_cursor(
+                params[self.cursor_query_param], url
+            )
+
+        if reverse:
+            data = yield from self.paginate_backwards(
+                url, params, page_url, offset, size
+            )
+        else:
+            data = yield from self.paginate_forwards(
+                url, params, page_url, offset, size
+            )
+
+        return data
+
+    def paginate_forwards(
+        self, url: str, params: dict, page_url: Optional[str], offset: int, size: int
+    ):
+        request = self.get_request(url, params, page_url)
+        page = (yield [request])[0]
+        first_url, first_offset = page_url, offset
+        has_previous = offset > 0 or bool(page.get_previous())
+        count = page.get_count()
+        items = []
+        while True:
+            results = page.get_results()
+            end = offset + size - len(items)
+            items += results[offset:end]
+            next_url = page.get_next() and urljoin(url, page.get_next())
+            if len(items) >= size or not next_url:
+                break
+
+            page_url, offset = next_url, 0
+            request = (page_url, {})
+            page = (yield [request])[0]
+
+        if end < len(results):
+            self.leftovers.append((request, page))
+            next_link = self.get_cursor_link(params, page_url, end, False)
+        elif next_url:
+            next_link = self.get_cursor_link(params, next_url, 0, False)
+        else:
+            next_link = None
+
+        previous_link = None
+        if has_previous:
+            previous_link = self.get_cursor_link(params, first_url, first_offset, True)
+
+        return {
+            "count": count,
+            "next": next_link,
+            "previous": previous_link,
+            "results": items,
+        }
+
+    def paginate_backwards(
+        self, url: str, params: dict, page_url: Optional[str], offset: int, size: int
+    ):
+        page = (yield [self.get_request(url, params, page_url)])[0]
+        next_link = self.get_cursor_link(params, page_url, offset, False)
+        count = page.get_count()
+        start = max(offset - size, 0)
+        items = page.get_results()[start:offset]
+        while len(items) < size:
+            previous_url = page.get_previous() and urljoin(url, page.get_previous())
+            if not previous_url:
+                break
+
+            page_url = previous_url
+            page = (yield [(page_url, {})])[0]
+            results = page.get_results()
+            start = max(len(results) - (size - len(items)), 0)
+            items = results[start:] + items
+
+        previous_link = None
+        if start > 0 or page.get_previous():
+            previous_link = self.get_cursor_link(params, page_url, start, True)
+
+        return {
+            "count": count,
+            "next": next_link,
+            "previous": previous_link,
+            "results": items,
+        }
+
+
+class LinkHeaderPagination(CursorPagination):
+    """
+    Re-chunks the pages of an upstream linking its next and previous pages in the
+    Link response header, as the GitHub API does. The total count is read from
+    the `count_header`, when the upstream sends it.
+    """
+
+    count_header = "X-Total-Count"
+    uses_headers = True
+
+    def get_links(self) -> Dict[str, str]:
+        links = {}
+        for match in LINK_RE.finditer(self.headers.get("link", "")):
+            url, attributes = match.groups()
+            rel = REL_RE.search(attributes)
+            for name in rel.group(1).split() if rel else ():
+                links[name] = url
+
+        return links
+
+    def get_next(self) -> Optional[str]:
+        return self.get_links().get("next")
+
+    def get_previous(self) -> Optional[str]:
+        links = self.get_links()
+
+        return links.get("prev", links.get("previous"))
+
+    def get_count(self) -> Optional[int]:
+        count = self.headers.get(self.count_header.lower(), "")
+
+        return int(count) if count.isdigit() else None
+
+    def get_results(self) -> list:
+        if isinstance(self.data, list):
+            return self.data
+
+        return super().get_results()
@@ -0,0 +1,100 @@
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_profile = contextvars.ContextVar("spook_profile", default=None)
+
+
+class RequestProfile(object):
+    """
+    Accumulates the time spent in every stage while serving a request: "headers",
+    "queue", "network", "decode", "map", "paginate" and "render". The network
+    stage starts once the upstream limiter lets the request through
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.finished = None
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self) -> float:
+        finished = self.finished if self.finished is not None else perf_counter()
+        return finished - self.started
+
+    def add(self, stage: str, seconds: float):
+        """
+        Adds time to a stage. Stages of concurrent calls are summed
+        """
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0) + seconds
+
+    @contextmanager
+    def measure(self, stage: str):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, perf_counter() - started)
+
+    def get_server_timing(self) -> str:
+        """
+        Returns the stages as a Server-Timing header value, in milliseconds
+        """
+        metrics = [
+            f"{stage};dur={seconds * 1000:.1f}"
+            for stage, seconds in self.stages.items()
+        ]
+        metrics.append(f"total;dur={self.duration * 1000:.1f}")
+
+        return ", ".join(metrics)
+
+
+def log_slow_request(profile: RequestProfile):
+    logger.warning(
+        "Slow request (%.1fms): %s",
+        profile.duration * 1000,
+        ", ".join(
+            f"{stage}={seconds * 1000:.1f}ms"
+            for stage, seconds in profile.stages.items()
+        ),
+    )
+
+
+@contextmanager
+def profile_request(
+    threshold: float = None,
+    callback: Callable[[RequestProfile], None] = log_slow_request,
+):
+    """
+    Profiles the stages of the resource calls made inside the block. When the
+    block takes threshold seconds or more, the callback receives the profile
+    """
+    profile = RequestProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+        profile.finished = perf_counter()
+        if threshold is not None and profile.duration >= threshold:
+            callback(profile)
+
+
+def get_current_profile() -> Optional[RequestProfile]:
+    return _profile.get()
+
+
+def record_stage(stage: str, seconds: float):
+    """
+    Adds the time spent in a stage to the profile of the current request, if any
+    """
+    profile = _profile.get()
+    if profile is not None:
+        profile.add(stage, seconds)
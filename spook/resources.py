@@ -1,14 +1,68 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from itertools import count, islice
+from time import perf_counter
 from json import JSONDecodeError
 
-import requests
-from typing import Union, Any, Type
+from typing import (
+    Union,
+    Any,
+    Type,
+    Dict,
+    Optional,
+    Iterator,
+    AsyncIterator,
+    List,
+    Iterable,
+    Tuple,
+    Callable,
+)
+from urllib.parse import urljoin, urlsplit
 
-from spook import settings
+from rest_framework.exceptions import ValidationError
+
+from spook import profiling, settings
+from spook.breakers import CircuitBreaker, get_circuit_breaker
+from spook.cache import (
+    BaseResponseCache,
+    CacheEntry,
+    LocMemResponseCache,
+    finish_refresh,
+    get_resource_cache,
+    start_refresh,
+)
+from spook.composition import Composer, Relation
+from spook.compression import compress, get_accept_encoding, get_wire_size
+from spook.deadlines import check_deadline, get_remaining_time, submit_in_context
 from spook.exceptions import *
-from spook.pagination import BasePagination, DefaultPagination
+from spook.exceptions import (
+    APIResourceDeadlineException,
+    APIResourceException,
+    APIResourcePageException,
+)
+from spook.limiters import UpstreamLimiter, get_limiter
+from spook.metrics import BaseMetricsExporter, get_metrics_exporters
+from spook.pagination import BasePagination, DefaultPagination, RechunkedPagination
 from spook.responses import APIResourceResponse
+from spook.retries import Retry, get_transport_exceptions
+from spook.sessions import default_async_pool
+from spook.singleflight import single_flight, async_single_flight
+from spook.tokens import BaseTokenProvider
+from spook.transports import get_default_transport
 from spook.validators import InputValidator
 
+logger = logging.getLogger(__name__)
+
+_background_tasks = set()
+
 
 class APIResource(object):
     """
@@ -20,11 +74,51 @@ class APIResource(object):
     authorization_header_name: str = settings.AUTHORIZATION_HEADER_NAME
     pagination_class: Type[BasePagination] = DefaultPagination
     validator: Type[InputValidator] = None
+    cache_class: Type[BaseResponseCache] = LocMemResponseCache
+    cache_timeouts: Dict[str, float] = {}
+    cache_max_entries: int = settings.CACHE_MAX_ENTRIES
+    cache_max_bytes: int = settings.CACHE_MAX_BYTES
+    cache_alias: str = settings.CACHE_ALIAS
+    cache_stale_while_revalidate: Dict[str, float] = {}
+    cache_stale_if_error: Dict[str, float] = {}
+    conditional_requests: bool = True
+    coalesced_actions: Tuple[str, ...] = ()
+    prefetch_concurrency: int = settings.PREFETCH_CONCURRENCY
+    retrieve_concurrency: int = settings.RETRIEVE_CONCURRENCY
+    batch_retrieve_param: str = None
+    batch_retrieve_key: str = "id"
+    batch_retrieve_size: int = 100
+    write_concurrency: int = settings.WRITE_CONCURRENCY
+    bulk_create_path: str = None
+    bulk_update_path: str = None
+    bulk_update_key: str = "id"
+    bulk_size: int = 100
+    stream_chunk_size: int = settings.STREAM_CHUNK_SIZE
+    connect_timeout: float = settings.CONNECT_TIMEOUT
+    read_timeout: float = settings.READ_TIMEOUT
+    timeouts: Dict[str, Union[float, Tuple[float, float]]] = {}
+    metrics_exporters: List[BaseMetricsExporter] = None
+    max_retries: int = settings.RETRY_MAX_RETRIES
+    retry_backoff_factor: float = settings.RETRY_BACKOFF_FACTOR
+    retry_backoff_max: float = settings.RETRY_BACKOFF_MAX
+    retry_statuses: Tuple[int, ...] = (429, 502, 503, 504)
+    retry_actions: Tuple[str, ...] = ("get", "list", "update", "delete")
+    circuit_breaker_threshold: int = settings.CIRCUIT_BREAKER_THRESHOLD
+    circuit_breaker_timeout: float = settings.CIRCUIT_BREAKER_TIMEOUT
+    rate_limit: float = settings.RATE_LIMIT
+    rate_limit_burst: int = settings.RATE_LIMIT_BURST
+    max_in_flight: int = settings.MAX_IN_FLIGHT
+    limit_max_wait: float = settings.LIMIT_MAX_WAIT
+    request_compression: str = settings.REQUEST_COMPRESSION
+    request_compression_threshold: int = settings.REQUEST_COMPRESSION_THRESHOLD
+    accept_encoding: Tuple[str, ...] = settings.ACCEPT_ENCODING
+    relations: Dict[str, Relation] = {}
+    token_provider: BaseTokenProvider = None
 
     def __init__(
         self,
         token: str = None,
-        http=requests,
+        http=None,
         validator: Type[InputValidator] = None,
         context: dict = None,
     ):
@@ -33,15 +127,26 @@ class APIResource(object):
 
         self.token = token
         self.headers = {}
-        self.http = http
+        self.http = http if http is not None else get_default_transport()
         self.context = context
 
         if validator is not None:
             self.validator = validator
 
     def get_token(self) -> str:
+        """
+        Returns the token sent upstream, given by the token provider when there
+        is one, which receives the token of the user
+        """
+        provider = self.get_token_provider()
+        if provider is not None:
+            return provider.get_token(self.token)
+
         return self.token
 
+    def get_token_provider(self) -> Optional[BaseTokenProvider]:
+        return self.token_provider
+
     def get_api_url(self) -> str:
         if not self.api_url:
             raise Exception("You need to specify an api_url or override .get_api_url()")
@@ -75,6 +180,47 @@ class APIResource(object):
             return headers
         return self.headers
 
+    def get_request_headers(self, action: str = None) -> dict:
+        """
+        Returns the headers of a request, recording the time spent building them
+        """
+        started = perf_counter()
+        headers = self.get_headers()
+        if self.accept_encoding is not None:
+            accept_encoding = get_accept_encoding(self.accept_encoding)
+            headers = {**headers, "Accept-Encoding": accept_encoding}
+        self.record_stage(action, "headers", perf_counter() - started)
+
+        return headers
+
+    def encode_body(self, data, action: str) -> dict:
+        """
+            Returns the body and headers arguments of a write request. Bodies of
+            request_compression_threshold bytes or more are compressed with the
+            request_compression content encoding
+        :param data: The validated data
+        :param action: The action performed
+        :return: Keyword arguments for the http object
+        """
+        headers = self.get_request_headers(action)
+        if not self.request_compression:
+            return {"json": data, "headers": headers}
+
+        body = json.dumps(data).encode("utf-8")
+        sent = body
+        if len(body) >= self.request_compression_threshold:
+            sent = compress(body, self.request_compression)
+            headers = {
+                **headers,
+                "Content-Type": "application/json",
+                "Content-Encoding": self.request_compression,
+            }
+        else:
+            headers = {**headers, "Content-Type": "application/json"}
+        self.record_transfer(action, "sent", len(body), len(sent))
+
+        return {"data": sent, "headers": headers}
+
     def get_response_data(self, response) -> Union[dict, str]:
         try:
             response_data = response.json()
@@ -100,6 +246,23 @@ class APIResource(object):
 
         return data
 
+    def can_passthrough(self, action: str) -> bool:
+        """
+        Returns whether the upstream response of an action can be forwarded as is,
+        because no hook needs its decoded data
+        """
+        resource_class = type(self)
+        if resource_class.map_response is not APIResource.map_response:
+            return False
+
+        if resource_class.get_response_data is not APIResource.get_response_data:
+            return False
+
+        if action == "list" and self.get_pagination_class():
+            return False
+
+        return self.get_cache_timeout(action) is None
+
     def get_paginated_response(
         self, data: Union[str, dict, list]
     ) -> Union[str, dict, list]:
@@ -112,143 +275,1968 @@ class APIResource(object):
             data=data, context=self.context
         ).get_paginated_response()
 
+    def get_page(self, response: APIResourceResponse, url: str) -> BasePagination:
+        """
+        Returns the pagination instance of a page, raising if it can't be paginated
+        """
+        pagination_class = self.get_pagination_class()
+        if not pagination_class:
+            raise APIResourceException("Iterating over pages needs a pagination_class")
+
+        if response.status >= 400 or isinstance(response.data, (str, bytes)):
+            raise APIResourcePageException(
+                url=url, status=response.status, data=response.data
+            )
+
+        return pagination_class(data=response.data, context=self.context)
+
+    def is_rechunked(self) -> bool:
+        """
+        Returns whether the list pages are re-chunked to the size the client asks for
+        """
+        pagination_class = self.get_pagination_class()
+
+        return bool(pagination_class) and issubclass(
+            pagination_class, RechunkedPagination
+        )
+
+    def get_page_headers(self, response) -> dict:
+        """
+        Returns the headers of an upstream page, lowercased
+        """
+        return {key.lower(): value for key, value in response.headers.items()}
+
+    def get_pagination_buffer(self) -> BaseResponseCache:
+        """
+        Returns the buffer of the upstream pages with leftover items, shared by the
+        resources using the same pagination class
+        """
+        pagination_class = self.get_pagination_class()
+
+        return get_resource_cache(
+            pagination_class,
+            LocMemResponseCache,
+            max_entries=pagination_class.buffer_size,
+        )
+
+    def buffer_leftovers(self, pagination: RechunkedPagination):
+        buffer = self.get_pagination_buffer()
+        for (url, params), page in pagination.leftovers:
+            buffer.set(
+                self.get_cache_key(url, params),
+                self.get_url(),
+                CacheEntry(data=(page.data, page.headers), status=200),
+                pagination.buffer_timeout,
+            )
+
+    def get_next_page_url(self, page: BasePagination, url: str) -> Optional[str]:
+        next_url = page.get_next()
+
+        return urljoin(url, next_url) if next_url else None
+
+    def get_remaining_page_urls(
+        self, page: BasePagination, url: str, max_pages: int = None
+    ) -> Optional[List[str]]:
+        """
+        Returns the urls of the pages left to fetch after the first one, or None
+        when the pagination class can't compute them
+        """
+        urls = page.get_remaining_page_urls()
+        if urls is None:
+            return None
+
+        if max_pages is not None:
+            urls = urls[: max(max_pages - 1, 0)]
+
+        return [urljoin(url, next_url) for next_url in urls]
+
+    def get_batch_chunks(self, pks: List[Any]) -> Iterator[List[Any]]:
+        for start in range(0, len(pks), self.batch_retrieve_size):
+            end = start + self.batch_retrieve_size
+            yield pks[start:end]
+
+    def get_batch_params(self, pks: List[Any], params: dict) -> dict:
+        """
+        Returns the query params to retrieve a batch of pks from the list endpoint
+        """
+        return {
+            **params,
+            self.batch_retrieve_param: ",".join(str(pk) for pk in pks),
+        }
+
+    def get_batch_results(
+        self, pks: List[Any], items: List[Any]
+    ) -> Dict[Any, APIResourceResponse]:
+        """
+        Matches the items of a batch with their pks. Missing items are not found.
+        """
+        found = {str(item.get(self.batch_retrieve_key)): item for item in items}
+        results = {}
+        for pk in pks:
+            item = found.get(str(pk))
+            if item is None:
+                results[pk] = APIResourceResponse(data=None, status=404)
+            else:
+                results[pk] = APIResourceResponse(data=item, status=200)
+
+        return results
+
+    def get_batch_errors(
+        self, pks: List[Any], error: Exception
+    ) -> Dict[Any, APIResourceResponse]:
+        status = getattr(error, "status", None)
+
+        return {
+            pk: APIResourceResponse(data=None, status=status, error=error) for pk in pks
+        }
+
+    def validate_bulk(
+        self, data: List[dict], action: str
+    ) -> List[Optional[APIResourceResponse]]:
+        """
+        Validates a batch of payloads at once
+        :return: A 400 response with the errors of every invalid payload, None for
+            the valid ones
+        """
+        validator_action = "create" if action == "create" else "update"
+        try:
+            self.validate_many(data, action=validator_action)
+        except ValidationError as e:
+            detail = e.detail
+            if isinstance(detail, dict) and all(isinstance(i, int) for i in detail):
+                # Recent DRF versions key the errors of a list by item index
+                detail = [detail.get(index, {}) for index in range(len(data))]
+            if not isinstance(detail, list) or len(detail) != len(data):
+                raise
+
+            results = []
+            for errors in detail:
+                if errors:
+                    error = ValidationError(errors)
+                    results.append(
+                        APIResourceResponse(data=errors, status=400, error=error)
+                    )
+                else:
+                    results.append(None)
+            return results
+
+        return [None] * len(data)
+
+    def get_missing_key_error(
+        self, action: str, data: dict
+    ) -> Optional[APIResourceResponse]:
+        """
+        Returns a 400 response for an update payload without its
+        `bulk_update_key`, which can't be sent one by one
+        """
+        if action == "create" or data.get(self.bulk_update_key) is not None:
+            return None
+
+        errors = {self.bulk_update_key: ["This field is required."]}
+        return APIResourceResponse(
+            data=errors, status=400, error=ValidationError(errors)
+        )
+
+    def get_bulk_url(self, action: str) -> Optional[str]:
+        """
+        Returns the url of the bulk endpoint of a write action, None without it
+        """
+        if action == "create":
+            path = self.bulk_create_path
+        else:
+            path = self.bulk_update_path
+        if path is None:
+            return None
+
+        return self.get_url(path) if path else self.get_url()
+
+    def get_bulk_chunks(self, items: List[Any]) -> Iterator[List[Any]]:
+        for start in range(0, len(items), self.bulk_size):
+            end = start + self.bulk_size
+            yield items[start:end]
+
+    def get_bulk_results(
+        self, data: List[dict], result: APIResourceResponse
+    ) -> List[APIResourceResponse]:
+        """
+        Splits the response of the bulk endpoint into the results of its items. A
+        list of as many items as sent is matched in order, any other body is
+        shared by every item
+        """
+        if isinstance(result.data, list) and len(result.data) == len(data):
+            return [
+                APIResourceResponse(data=item, status=result.status)
+                for item in result.data
+            ]
+
+        return [
+            APIResourceResponse(data=result.data, status=result.status) for _ in data
+        ]
+
+    def is_failed_write(self, result: Optional[APIResourceResponse]) -> bool:
+        if result is None:
+            return False
+
+        return result.error is not None or result.status >= 400
+
+    def invalidate_bulk_cache(self, action: str, data: List[dict]):
+        if action == "create":
+            self.invalidate_cache()
+            return
+
+        for item in data:
+            self.invalidate_cache(item.get(self.bulk_update_key))
+
+    def get_relations(self) -> Dict[str, Relation]:
+        return self.relations
+
+    def compose(self, data):
+        """
+            Embeds the items of the related resources into the data
+        :param data: A list of results, a paginated response or a single item
+        :return: A copy of the data with the related items
+        """
+        relations = self.get_relations()
+        if not relations:
+            return data
+
+        composer = Composer(relations, token=self.token, context=self.context)
+        return composer.compose(data)
+
     def validate(self, data: dict, action: str = None) -> dict:
         """
         Performs input validation
         """
         return self.get_validator(action=action).validate(data)
 
+    def validate_many(self, data: List[dict], action: str = None) -> List[dict]:
+        """
+        Performs input validation of a list of payloads at once
+        """
+        return self.get_validator(action=action).validate_many(data)
+
     def handle_server_errors(self, response, data: dict = None):
         """
         Error handling
         """
         pass
 
-    def get(self, url: str, **params) -> APIResourceResponse:
+    def get_timeout(self, action: str = None) -> Tuple[float, float]:
         """
-            Performs a GET request to a server URL
-        :param url: The URL
-        :param params: Additional query params
-        :return: JSON response as a dict
+        Returns the (connect, read) timeouts of an action, in seconds
         """
-        response = self.http.get(url, headers=self.get_headers(), params=params)
-        self.handle_server_errors(response)
-        data = self.get_response_data(response)
-        data = self.map_response(data, action="get", status=response.status_code)
+        timeout = self.timeouts.get(action)
+        if timeout is None:
+            return self.connect_timeout, self.read_timeout
 
-        return APIResourceResponse(data=data, status=response.status_code)
+        if isinstance(timeout, (int, float)):
+            return timeout, timeout
 
-    def list(self, **params) -> APIResourceResponse:
+        return tuple(timeout)
+
+    def get_request_timeout(self, action: str = None) -> Optional[Tuple[float, float]]:
         """
-            Retrieves a list of items
-        :param params: Query params for the url
-        :return: JSON response as a dict
+        Returns the timeouts of an action bounded by the time left before the
+        request deadline, raising APIResourceDeadlineException once it is exceeded
         """
-        url = self.get_url()
+        connect, read = self.get_timeout(action)
+        remaining = check_deadline()
+        if remaining is not None:
+            connect = remaining if connect is None else min(connect, remaining)
+            read = remaining if read is None else min(read, remaining)
 
-        response = self.http.get(url, headers=self.get_headers(), params=params)
-        self.handle_server_errors(response)
-        data = self.get_response_data(response)
-        data = self.map_response(data, action="list", status=response.status_code)
+        if connect is None and read is None:
+            return None
 
-        data = self.get_paginated_response(data)
-        return APIResourceResponse(data=data, status=response.status_code)
+        return connect, read
 
-    def retrieve(self, pk: Any, **params) -> APIResourceResponse:
+    def get_retry(self, action: str = None) -> Optional[Retry]:
         """
-            Retrieves an item given its pk or uid
-        :param pk: Unique ID of the item
-        :param params: Extra query params
-        :return: JSON response as a dict
+        Returns the retry policy of an action, None when it is not retried
         """
-        url = self.get_url(pk)
+        if not self.max_retries or action not in self.retry_actions:
+            return None
 
-        return self.get(url, **params)
+        return Retry(
+            max_retries=self.max_retries,
+            backoff_factor=self.retry_backoff_factor,
+            backoff_max=self.retry_backoff_max,
+            statuses=self.retry_statuses,
+        )
 
-    def post(self, data: dict, query: dict = None) -> APIResourceResponse:
+    def get_circuit_breaker(self) -> Optional[CircuitBreaker]:
         """
-            Performs a POST request to the server
-        :param data: Data attached
-        :param query: Extra querystring as a dict
-        :return: JSON response as a dict
+        Returns the circuit breaker shared by the resources of the same api_url,
+        None when it is disabled
         """
-        validated_data = self.validate(data, action="create")
-        response = self.http.post(
-            self.get_url(),
-            json=validated_data,
-            headers=self.get_headers(),
-            params=query,
+        if not self.circuit_breaker_threshold:
+            return None
+
+        return get_circuit_breaker(
+            self.get_api_url(),
+            failure_threshold=self.circuit_breaker_threshold,
+            recovery_timeout=self.circuit_breaker_timeout,
         )
-        self.handle_server_errors(response, data=validated_data)
-        data = self.get_response_data(response)
-        data = self.map_response(data, action="create", status=response.status_code)
 
-        return APIResourceResponse(data=data, status=response.status_code)
+    def get_limiter_key(self) -> str:
+        """
+        Returns the key of the upstream limiter, the host of the api_url by default
+        """
+        api_url = self.get_api_url()
+        return urlsplit(api_url).netloc or api_url
 
-    def create(self, data: dict, query: dict = None) -> APIResourceResponse:
-        return self.post(data=data, query=query)
+    def get_limiter(self) -> Optional[UpstreamLimiter]:
+        """
+        Returns the rate limiter and bulkhead shared by the resources of the same
+        upstream, None when they are disabled
+        """
+        if not self.rate_limit and not self.max_in_flight:
+            return None
 
-    def put(self, pk: Any, data: dict, query: dict = None) -> APIResourceResponse:
+        return get_limiter(
+            self.get_limiter_key(),
+            rate=self.rate_limit,
+            burst=self.rate_limit_burst,
+            max_in_flight=self.max_in_flight,
+        )
+
+    def get_limit_timeout(self) -> Optional[float]:
         """
-            Performs a PUT request to the server
-        :param pk: Primary key of the object to update
-        :param data: Updated data
-        :param query: Query params
-        :return: JSON response as a dict
+        Returns the seconds a request can wait for the limiter: limit_max_wait,
+        bounded by the request deadline. 0 fails fast
         """
-        validated_data = self.validate(data, action="update")
-        response = self.http.put(
-            self.get_url(pk), json=validated_data, headers=self.get_headers(), params=query
+        remaining = check_deadline()
+        if remaining is None:
+            return self.limit_max_wait
+        if self.limit_max_wait is None:
+            return remaining
+
+        return min(remaining, self.limit_max_wait)
+
+    @contextmanager
+    def limit(self, action: str = None):
+        """
+        Holds a token and an in flight slot of the upstream limiter while the
+        block sends a request. The time waited is recorded as the queue stage
+        """
+        limiter = self.get_limiter()
+        if limiter is None:
+            yield
+            return
+
+        with limiter.limit(self.get_limit_timeout()) as waited:
+            self.record_stage(action, "queue", waited)
+            yield
+
+    def is_server_failure(self, response) -> bool:
+        """
+        Returns whether a response counts as a failure of the upstream
+        """
+        return response.status_code >= 500
+
+    def record_attempt(
+        self,
+        attempt: int,
+        retry: Optional[Retry],
+        breaker: Optional[CircuitBreaker],
+        response=None,
+        exception: Exception = None,
+    ) -> Optional[float]:
+        """
+        Records the outcome of a request attempt in the circuit breaker
+        :return: The seconds to wait before retrying it, None when it is final
+        """
+        if breaker is not None:
+            if exception is not None or self.is_server_failure(response):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+        if retry is None or not retry.should_retry(attempt, response, exception):
+            return None
+
+        delay = retry.get_delay(attempt, response)
+        remaining = get_remaining_time()
+        if remaining is not None and delay >= remaining:
+            return None
+
+        return delay
+
+    def get_metrics_exporters(self) -> List[BaseMetricsExporter]:
+        """
+        Returns the exporters receiving the measures of the resource,
+        SPOOK_METRICS_EXPORTERS by default
+        """
+        if self.metrics_exporters is not None:
+            return self.metrics_exporters
+
+        return get_metrics_exporters()
+
+    def get_metrics_name(self) -> str:
+        """
+        Returns the resource label of the measures
+        """
+        return type(self).__name__
+
+    def record_request(self, action: str, status: str, seconds: float):
+        name = self.get_metrics_name()
+        for exporter in self.get_metrics_exporters():
+            exporter.record_request(name, action, status, seconds)
+
+    def record_response_size(self, action: str, response):
+        content = getattr(response, "content", None)
+        if not isinstance(content, (bytes, str)):
+            return
+
+        name = self.get_metrics_name()
+        for exporter in self.get_metrics_exporters():
+            exporter.record_response_size(name, action, len(content))
+        self.record_transfer(
+            action, "received", len(content), get_wire_size(response, len(content))
         )
-        self.handle_server_errors(response, data=validated_data)
-        data = self.get_response_data(response)
-        data = self.map_response(data, action="update", status=response.status_code)
 
-        return APIResourceResponse(data=data, status=response.status_code)
+    def record_transfer(
+        self, action: str, direction: str, size: int, wire_size: Optional[int]
+    ):
+        if wire_size is None:
+            return
 
-    def patch(self, pk: Any, data: dict, query: dict = None) -> APIResourceResponse:
+        name = self.get_metrics_name()
+        for exporter in self.get_metrics_exporters():
+            exporter.record_transfer(name, action, direction, size, wire_size)
+
+    def record_stage(self, action: str, stage: str, seconds: float):
+        profiling.record_stage(stage, seconds)
+        name = self.get_metrics_name()
+        for exporter in self.get_metrics_exporters():
+            exporter.record_stage(name, action, stage, seconds)
+
+    @contextmanager
+    def measure_stage(self, action: str, stage: str):
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(action, stage, perf_counter() - started)
+
+    def send(self, method: str, url: str, **kwargs):
+        return getattr(self.http, method)(url, **kwargs)
+
+    def request(self, method: str, url: str, action: str = None, **kwargs):
         """
-            Performs a PATCH request to the server
-        :param pk: Primary key of the object to update
-        :param data: Updated data
-        :param query: Query params
-        :return: JSON response as a dict
+            Performs a request through the circuit breaker of the upstream, with
+            the timeouts of the action, retrying it when the action is idempotent.
+            Its latency and status are recorded in the metrics exporters
+        :param method: The lowercase HTTP method
+        :param url: The URL
+        :param action: The action performed
+        :param kwargs: Arguments of the http object
+        :return: The upstream response
         """
-        validated_data = self.validate(data, action="update")
-        response = self.http.patch(
-            self.get_url(pk), json=validated_data, headers=self.get_headers(), params=query
+        started = perf_counter()
+        status = "error"
+        try:
+            response = self.send_with_retries(method, url, action, **kwargs)
+            headers = self.get_renewed_headers(response, kwargs.get("headers"))
+            if headers is not None:
+                response.close()
+                kwargs["headers"] = headers
+                response = self.send_with_retries(method, url, action, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            self.record_request(action, status, perf_counter() - started)
+
+    def get_renewed_headers(self, response, headers: Optional[dict]) -> Optional[dict]:
+        """
+        Returns the headers to retry a request whose token was rejected with a
+        401 with, once the token provider renewed it. None when it can't be retried
+        """
+        provider = self.get_token_provider()
+        if provider is None or response.status_code != 401 or not headers:
+            return None
+
+        authorization = headers.get(self.authorization_header_name)
+        prefix = f"{self.authorization_header} "
+        if not authorization or not authorization.startswith(prefix):
+            return None
+
+        start = len(prefix)
+        token = provider.renew(self.token, rejected=authorization[start:])
+        if token is None:
+            return None
+
+        return {**headers, self.authorization_header_name: f"{prefix}{token}"}
+
+    def is_deadline_timeout(self, exception: Exception) -> bool:
+        """
+        Returns whether a transport error was caused by the timeouts bounded by
+        the deadline, once its budget has been spent
+        """
+        remaining = get_remaining_time()
+        if remaining is None or remaining > 0:
+            return False
+
+        return isinstance(exception, get_transport_exceptions())
+
+    def send_with_retries(self, method: str, url: str, action: str, **kwargs):
+        retry = self.get_retry(action)
+        breaker = self.get_circuit_breaker()
+        for attempt in count():
+            timeout = self.get_request_timeout(action)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            with self.limit(action):
+                if breaker is not None:
+                    breaker.before_call()
+
+                try:
+                    with self.measure_stage(action, "network"):
+                        response = self.send(method, url, **kwargs)
+                except Exception as e:
+                    delay = self.record_attempt(attempt, retry, breaker, exception=e)
+                    if delay is None and self.is_deadline_timeout(e):
+                        raise APIResourceDeadlineException() from e
+                    if delay is None:
+                        raise
+                else:
+                    delay = self.record_attempt(
+                        attempt, retry, breaker, response=response
+                    )
+                    if delay is None:
+                        return response
+                    response.close()
+
+            time.sleep(delay)
+
+    def get_cache(self) -> BaseResponseCache:
+        """
+        Returns the response cache shared by the instances of the resource class
+        """
+        resource_class = type(self)
+        return get_resource_cache(
+            resource_class,
+            self.cache_class,
+            max_entries=self.cache_max_entries,
+            max_bytes=self.cache_max_bytes,
+            alias=self.cache_alias,
+            key_prefix=f"spook:{resource_class.__module__}.{resource_class.__qualname__}",
         )
-        self.handle_server_errors(response, data=validated_data)
-        data = self.get_response_data(response)
-        data = self.map_response(
-            data, action="partial_update", status=response.status_code
+
+    def get_cache_timeout(self, action: str) -> Optional[float]:
+        """
+        Returns the seconds the responses of an action are cached, or None
+        """
+        return self.cache_timeouts.get(action)
+
+    def get_stale_while_revalidate(self, action: str) -> float:
+        """
+        Returns the seconds an expired response of an action is served while it
+        is refreshed in the background
+        """
+        return self.cache_stale_while_revalidate.get(action, 0)
+
+    def get_stale_if_error(self, action: str) -> float:
+        """
+        Returns the seconds an expired response of an action is served when the
+        upstream fails
+        """
+        return self.cache_stale_if_error.get(action, 0)
+
+    def get_stale_timeout(self, action: str) -> float:
+        return max(
+            self.get_stale_while_revalidate(action), self.get_stale_if_error(action)
         )
 
-        return APIResourceResponse(data=data, status=response.status_code)
+    def get_cache_identity(self) -> str:
+        """
+        Returns the identity responses are cached for. Override it to share cached
+        responses between the users of a tenant
+        """
+        provider = self.get_token_provider()
+        if provider is not None:
+            return provider.get_identity(self.token)
 
-    def update(
-        self, pk: Any, data: dict, query: dict = None, partial: bool = False
-    ) -> APIResourceResponse:
-        if partial:
-            return self.patch(pk=pk, data=data, query=query)
+        return self.get_token() or ""
 
-        return self.put(pk=pk, data=data, query=query)
+    def get_cache_key(self, url: str, params: dict) -> str:
+        """
+        Returns the cache key of a request, based on the url, the normalized query
+        params and the cache identity
+        """
+        normalized_params = sorted(
+            (str(key), str(value))
+            for key, values in (params or {}).items()
+            for value in (values if isinstance(values, (list, tuple)) else [values])
+        )
+        key = repr((url, normalized_params, self.get_cache_identity()))
 
-    def delete(self, pk: Any, query: dict = None) -> APIResourceResponse:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get_cached_entry(
+        self, url: str, action: str, params: dict
+    ) -> Optional[CacheEntry]:
+        if self.get_cache_timeout(action) is None:
+            return None
+
+        stale = self.conditional_requests or self.get_stale_timeout(action) > 0
+        return self.get_cache().get(self.get_cache_key(url, params), stale=stale)
+
+    def get_conditional_headers(self, entry: Optional[CacheEntry]) -> dict:
         """
-            Performs a DELETE request to the server
-        :param pk: Primary key of the object to update
-        :param query: Query params
-        :return: JSON response as a dict
+        Returns the headers to revalidate a stale cache entry with the upstream
+        """
+        headers = {}
+        if entry is None:
+            return headers
+
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        return headers
+
+    def get_cache_group(self, url: str, action: str) -> str:
+        """
+        Returns the url a cache entry is invalidated by. Every page of the list,
+        whatever its url, is grouped under the url of the list
+        """
+        if action == "list":
+            return self.get_url()
+
+        return url
+
+    def cache_response(self, url: str, action: str, params: dict, response, data):
+        timeout = self.get_cache_timeout(action)
+        if timeout is None or not 200 <= response.status_code < 300:
+            return
+
+        content = response.content
+        size = len(content) if isinstance(content, (bytes, str)) else 0
+        entry = CacheEntry(data=data, status=response.status_code, size=size)
+        if self.conditional_requests:
+            entry.etag = response.headers.get("ETag")
+            entry.last_modified = response.headers.get("Last-Modified")
+
+        self.get_cache().set(
+            self.get_cache_key(url, params),
+            self.get_cache_group(url, action),
+            entry,
+            timeout,
+            stale_timeout=self.get_stale_timeout(action),
+        )
+
+    def revalidate_cached_response(self, url: str, action: str, params: dict):
         """
-        response = self.http.delete(
-            self.get_url(pk), headers=self.get_headers(), params=query
+        Renews a cache entry after the upstream answered 304 Not Modified
+        """
+        self.get_cache().touch(
+            self.get_cache_key(url, params), self.get_cache_timeout(action)
         )
-        self.handle_server_errors(response)
-        data = self.get_response_data(response)
-        data = self.map_response(data, action="delete", status=response.status_code)
 
-        return APIResourceResponse(data=data, status=response.status_code)
+    def invalidate_cache(self, pk: Any = None):
+        """
+        Invalidates the cached list responses and, given a pk, its cached item
+        """
+        if self.is_rechunked():
+            self.get_pagination_buffer().invalidate(self.get_url())
+        if not self.cache_timeouts:
+            return
+
+        cache = self.get_cache()
+        cache.invalidate(self.get_url())
+        if pk is not None:
+            cache.invalidate(self.get_url(pk))
 
-    def destroy(self, pk: Any, query: dict = None) -> APIResourceResponse:
-        return self.delete(pk=pk, query=query)
+    def get_flight_key(self, url: str, params: dict) -> str:
+        """
+        Returns the key identical in-flight reads are coalesced by
+        """
+        resource_class = type(self)
+        return ":".join(
+            (
+                resource_class.__module__,
+                resource_class.__qualname__,
+                self.get_cache_key(url, params),
+            )
+        )
+
+    def make_response(
+        self, data, status: int, action: str, paginate: bool = False
+    ) -> APIResourceResponse:
+        started = perf_counter()
+        data = self.map_response(data, action=action, status=status)
+        if paginate:
+            mapped = perf_counter()
+            self.record_stage(action, "map", mapped - started)
+            data = self.get_paginated_response(data)
+            self.record_stage(action, "paginate", perf_counter() - mapped)
+        else:
+            self.record_stage(action, "map", perf_counter() - started)
+
+        return APIResourceResponse(data=data, status=status)
+
+    def decode_response(self, response, action: str) -> Union[dict, str]:
+        """
+        Decodes the body of an upstream response, recording its size and the
+        time it took
+        """
+        started = perf_counter()
+        data = self.get_response_data(response)
+        self.record_stage(action, "decode", perf_counter() - started)
+        self.record_response_size(action, response)
+
+        return data
+
+    def build_response(
+        self, response, action: str, data: dict = None, paginate: bool = False
+    ) -> APIResourceResponse:
+        """
+            Builds the resource response from the upstream response
+        :param response: The upstream response
+        :param action: The action performed
+        :param data: The validated data sent to the server, if any
+        :param paginate: Whether the data has to be paginated
+        :return: The resource response
+        """
+        self.handle_server_errors(response, data=data)
+        response_data = self.decode_response(response, action)
+
+        return self.make_response(
+            response_data, response.status_code, action=action, paginate=paginate
+        )
+
+    def read(
+        self, url: str, action: str, params: dict, paginate: bool = False
+    ) -> APIResourceResponse:
+        """
+            Performs a GET request, going through the response cache when the
+            action is cached
+        :param url: The URL
+        :param action: The action performed
+        :param params: Query params
+        :param paginate: Whether the data has to be paginated
+        :return: The resource response
+        """
+        entry = self.get_cached_entry(url, action, params)
+        if entry is not None:
+            if entry.is_fresh():
+                return self.make_response(entry.data, entry.status, action, paginate)
+            if entry.is_stale_within(self.get_stale_while_revalidate(action)):
+                self.refresh_in_background(url, action, params, entry)
+                return self.make_response(entry.data, entry.status, action, paginate)
+
+        try:
+            if action in self.coalesced_actions:
+                key = self.get_flight_key(url, params)
+                data, status = single_flight.do(
+                    key, self.fetch, url, action, params, entry
+                )
+            else:
+                data, status = self.fetch(url, action, params, entry)
+        except Exception:
+            if not self.can_serve_stale_if_error(entry, action):
+                raise
+            data, status = entry.data, entry.status
+        else:
+            if status >= 500 and self.can_serve_stale_if_error(entry, action):
+                data, status = entry.data, entry.status
+
+        return self.make_response(data, status, action, paginate)
+
+    def can_serve_stale_if_error(self, entry: Optional[CacheEntry], action: str):
+        return entry is not None and entry.is_stale_within(
+            self.get_stale_if_error(action)
+        )
+
+    def refresh_in_background(
+        self, url: str, action: str, params: dict, entry: CacheEntry
+    ):
+        """
+        Refreshes a stale cache entry in a background thread, once at a time. The
+        thread does not inherit the deadline of the request
+        """
+        key = self.get_flight_key(url, params)
+        if not start_refresh(key):
+            return
+
+        def refresh():
+            try:
+                self.fetch(url, action, params, entry)
+            except Exception as e:
+                logger.warning("Could not refresh %s: %s", url, e)
+            finally:
+                finish_refresh(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def fetch(
+        self, url: str, action: str, params: dict, entry: CacheEntry = None
+    ) -> Tuple[Any, int]:
+        """
+            Performs the GET request of a read, revalidating the stale cache
+            entry if any
+        :return: The decoded data and the status of the response
+        """
+        headers = {
+            **self.get_request_headers(action),
+            **self.get_conditional_headers(entry),
+        }
+        response = self.request("get", url, action, headers=headers, params=params)
+        if entry is not None and response.status_code == 304:
+            self.revalidate_cached_response(url, action, params)
+            return entry.data, entry.status
+
+        self.handle_server_errors(response)
+        data = self.decode_response(response, action)
+        self.cache_response(url, action, params, response, data)
+
+        return data, response.status_code
+
+    def get_raw(self, url: str, **params):
+        """
+            Performs a GET request to a server URL without decoding the response
+        :param url: The URL
+        :param params: Additional query params
+        :return: The upstream response
+        """
+        response = self.request(
+            "get", url, "get", headers=self.get_request_headers("get"), params=params
+        )
+        self.handle_server_errors(response)
+
+        return response
+
+    def get_stream(self, url: str, **params):
+        """
+            Performs a GET request to a server URL without reading the response body
+        :param url: The URL
+        :param params: Additional query params
+        :return: The upstream response, to be consumed with iter_stream()
+        """
+        response = self.request(
+            "get",
+            url,
+            "get",
+            headers=self.get_request_headers("get"),
+            params=params,
+            stream=True,
+        )
+        try:
+            self.handle_server_errors(response)
+        except BaseException:
+            response.close()
+            raise
+
+        return response
+
+    def iter_stream(self, response) -> Iterator[bytes]:
+        """
+        Yields the body of a streamed response in chunks, closing the upstream
+        connection once it is exhausted or the iterator is closed
+        """
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=self.stream_chunk_size):
+                size += len(chunk)
+                yield chunk
+        finally:
+            response.close()
+            self.record_transfer("get", "received", size, get_wire_size(response, size))
+
+    def get(self, url: str, **params) -> APIResourceResponse:
+        """
+            Performs a GET request to a server URL
+        :param url: The URL
+        :param params: Additional query params
+        :return: JSON response as a dict
+        """
+        return self.read(url, action="get", params=params)
+
+    def list(self, **params) -> APIResourceResponse:
+        """
+            Retrieves a list of items
+        :param params: Query params for the url
+        :return: JSON response as a dict
+        """
+        if self.is_rechunked():
+            return self.list_rechunked(**params)
+
+        return self.read(self.get_url(), action="list", params=params, paginate=True)
+
+    def list_rechunked(self, **params) -> APIResourceResponse:
+        """
+            Retrieves a page of the size asked by the client, stitched together from
+            the upstream pages covering it, as planned by the pagination class
+        :param params: Query params of the client page
+        :return: The client page, or the error of the upstream page that failed
+        """
+        pagination = self.get_pagination_class()(context=self.context)
+        steps = pagination.paginate(self.get_url(), params)
+        try:
+            requests = next(steps)
+            while True:
+                requests = steps.send(self.fetch_rechunked_pages(pagination, requests))
+        except StopIteration as stop:
+            data = stop.value
+        except APIResourcePageException as e:
+            if e.status is None:
+                raise
+            return APIResourceResponse(data=e.data, status=e.status)
+
+        self.buffer_leftovers(pagination)
+        return APIResourceResponse(data=data, status=200)
+
+    def fetch_rechunked_pages(
+        self, pagination: RechunkedPagination, requests: List[Tuple[str, dict]]
+    ) -> List[RechunkedPagination]:
+        """
+        Fetches upstream pages concurrently, up to prefetch_concurrency at a time,
+        returning them in order
+        """
+        if len(requests) == 1:
+            return [self.fetch_rechunked_page(pagination, *requests[0])]
+
+        workers = min(len(requests), self.prefetch_concurrency)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                submit_in_context(
+                    executor, self.fetch_rechunked_page, pagination, url, params
+                )
+                for url, params in requests
+            ]
+            try:
+                return [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def fetch_rechunked_page(
+        self, pagination: RechunkedPagination, url: str, params: dict
+    ) -> RechunkedPagination:
+        entry = self.get_pagination_buffer().get(self.get_cache_key(url, params))
+        if entry is not None:
+            data, headers = entry.data
+        else:
+            try:
+                if pagination.uses_headers:
+                    raw = self.get_raw(url, **params)
+                    response = self.build_response(raw, "list")
+                    headers = self.get_page_headers(raw)
+                else:
+                    response = self.read(url, action="list", params=params)
+                    headers = {}
+            except APIResourceException:
+                raise
+            except Exception as e:
+                raise APIResourcePageException(url=url, status=None) from e
+            data = self.get_page(response, url).data
+
+        return type(pagination)(data=data, context=self.context, headers=headers)
+
+    def iter_pages(
+        self, max_pages: int = None, concurrency: int = None, **params
+    ) -> Iterator[BasePagination]:
+        """
+            Iterates lazily over the pages of the list, following the next page
+            given by the pagination class. With a concurrency greater than one, the
+            pages after the first one are prefetched concurrently when the
+            pagination class can compute their urls, and yielded in order.
+        :param max_pages: Maximum number of pages fetched
+        :param concurrency: Maximum number of pages fetched at the same time
+        :param params: Query params for the first page
+        :return: The pagination instance of every page
+        """
+        url = self.get_url()
+        pages = 0
+        while url and (max_pages is None or pages < max_pages):
+            response = self.read(url, action="list", params=params)
+            page = self.get_page(response, url)
+            yield page
+
+            if pages == 0 and concurrency and concurrency > 1:
+                urls = self.get_remaining_page_urls(page, url, max_pages=max_pages)
+                if urls is not None:
+                    yield from self.prefetch_pages(urls, concurrency)
+                    return
+
+            pages += 1
+            url = self.get_next_page_url(page, url)
+            params = {}
+
+    def fetch_page(self, url: str) -> BasePagination:
+        try:
+            response = self.read(url, action="list", params={})
+        except APIResourceException:
+            raise
+        except Exception as e:
+            raise APIResourcePageException(url=url, status=None) from e
+
+        return self.get_page(response, url)
+
+    def prefetch_pages(
+        self, urls: List[str], concurrency: int
+    ) -> Iterator[BasePagination]:
+        """
+        Fetches the pages concurrently, keeping at most `concurrency` requests
+        in flight, and yields them in order. Pending requests are cancelled
+        when a page fails or the iteration stops.
+        """
+        urls = iter(urls)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = deque(
+                submit_in_context(executor, self.fetch_page, url)
+                for url in islice(urls, concurrency)
+            )
+            try:
+                while pending:
+                    page = pending.popleft().result()
+                    for url in islice(urls, 1):
+                        pending.append(
+                            submit_in_context(executor, self.fetch_page, url)
+                        )
+
+                    yield page
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def iter_all(
+        self,
+        max_items: int = None,
+        max_pages: int = None,
+        concurrency: int = None,
+        **params,
+    ) -> Iterator[Any]:
+        """
+            Iterates lazily over every item of the list, one page in memory at a time
+        :param max_items: Maximum number of items yielded
+        :param max_pages: Maximum number of pages fetched
+        :param concurrency: Maximum number of pages fetched at the same time
+        :param params: Query params for the first page
+        :return: The items of every page
+        """
+        if max_items is not None and max_items <= 0:
+            return
+
+        items = 0
+        pages = self.iter_pages(max_pages=max_pages, concurrency=concurrency, **params)
+        for page in pages:
+            for item in page.get_results():
+                yield item
+
+                items += 1
+                if max_items is not None and items >= max_items:
+                    return
+
+    def fetch_all(
+        self,
+        max_items: int = None,
+        max_pages: int = None,
+        concurrency: int = None,
+        **params,
+    ) -> List[Any]:
+        """
+            Returns every item of the list, fetching the pages concurrently
+        :param max_items: Maximum number of items returned
+        :param max_pages: Maximum number of pages fetched
+        :param concurrency: Maximum number of pages fetched at the same time,
+            prefetch_concurrency by default
+        :param params: Query params for the first page
+        :return: The items of every page
+        """
+        return list(
+            self.iter_all(
+                max_items=max_items,
+                max_pages=max_pages,
+                concurrency=concurrency or self.prefetch_concurrency,
+                **params,
+            )
+        )
+
+    def retrieve(self, pk: Any, **params) -> APIResourceResponse:
+        """
+            Retrieves an item given its pk or uid
+        :param pk: Unique ID of the item
+        :param params: Extra query params
+        :return: JSON response as a dict
+        """
+        url = self.get_url(pk)
+
+        return self.get(url, **params)
+
+    def retrieve_or_error(self, pk: Any, **params) -> APIResourceResponse:
+        try:
+            return self.retrieve(pk, **params)
+        except Exception as e:
+            return APIResourceResponse(data=None, status=None, error=e)
+
+    def retrieve_batch(
+        self, pks: List[Any], **params
+    ) -> Dict[Any, APIResourceResponse]:
+        try:
+            items = list(self.iter_all(**self.get_batch_params(pks, params)))
+        except Exception as e:
+            return self.get_batch_errors(pks, e)
+
+        return self.get_batch_results(pks, items)
+
+    def retrieve_many(
+        self, pks: Iterable[Any], concurrency: int = None, **params
+    ) -> Dict[Any, APIResourceResponse]:
+        """
+            Retrieves many items concurrently, or in batches from the list endpoint
+            when batch_retrieve_param is declared (e.g. "id__in")
+        :param pks: Unique IDs of the items, duplicates are retrieved once
+        :param concurrency: Maximum number of items retrieved at the same time,
+            retrieve_concurrency by default
+        :param params: Extra query params
+        :return: The response of every item keyed by its pk. Failed requests keep
+            their exception in the error attribute
+        """
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return {}
+
+        if self.batch_retrieve_param:
+            results = {}
+            for chunk in self.get_batch_chunks(pks):
+                results.update(self.retrieve_batch(chunk, **params))
+            return results
+
+        max_workers = min(concurrency or self.retrieve_concurrency, len(pks))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                submit_in_context(executor, self.retrieve_or_error, pk, **params)
+                for pk in pks
+            ]
+
+        return {pk: future.result() for pk, future in zip(pks, futures)}
+
+    def write(
+        self, method: str, action: str, data, pk: Any = None, query: dict = None
+    ) -> APIResourceResponse:
+        """
+            Sends validated data to the server
+        :param method: The lowercase HTTP method
+        :param action: The action performed
+        :param data: The validated data
+        :param pk: Primary key of the object written, None to write to the list
+        :param query: Query params
+        :return: The resource response
+        """
+        url = self.get_url() if pk is None else self.get_url(pk)
+        response = self.request(
+            method,
+            url,
+            action=action,
+            **self.encode_body(data, action),
+            params=query,
+        )
+        self.invalidate_cache(pk)
+
+        return self.build_response(response, action=action, data=data)
+
+    def write_or_error(
+        self, method: str, action: str, data: dict, query: dict = None
+    ) -> APIResourceResponse:
+        error = self.get_missing_key_error(action, data)
+        if error is not None:
+            return error
+
+        pk = None if action == "create" else data[self.bulk_update_key]
+        try:
+            return self.write(method, action, data, pk=pk, query=query)
+        except Exception as e:
+            return APIResourceResponse(data=None, status=None, error=e)
+
+    def write_bulk(
+        self, method: str, action: str, url: str, data: List[dict], query: dict = None
+    ) -> List[APIResourceResponse]:
+        """
+        Sends a chunk of validated payloads to the bulk endpoint in one request
+        """
+        try:
+            response = self.request(
+                method,
+                url,
+                action=action,
+                **self.encode_body(data, action),
+                params=query,
+            )
+            self.invalidate_bulk_cache(action, data)
+            result = self.build_response(response, action=action, data=data)
+        except Exception as e:
+            return [APIResourceResponse(data=None, status=None, error=e) for _ in data]
+
+        return self.get_bulk_results(data, result)
+
+    def post(self, data: dict, query: dict = None) -> APIResourceResponse:
+        """
+            Performs a POST request to the server
+        :param data: Data attached
+        :param query: Extra querystring as a dict
+        :return: JSON response as a dict
+        """
+        validated_data = self.validate(data, action="create")
+
+        return self.write("post", "create", validated_data, query=query)
+
+    def create(self, data: dict, query: dict = None) -> APIResourceResponse:
+        return self.post(data=data, query=query)
+
+    def put(self, pk: Any, data: dict, query: dict = None) -> APIResourceResponse:
+        """
+            Performs a PUT request to the server
+        :param pk: Primary key of the object to update
+        :param data: Updated data
+        :param query: Query params
+        :return: JSON response as a dict
+        """
+        validated_data = self.validate(data, action="update")
+
+        return self.write("put", "update", validated_data, pk=pk, query=query)
+
+    def patch(self, pk: Any, data: dict, query: dict = None) -> APIResourceResponse:
+        """
+            Performs a PATCH request to the server
+        :param pk: Primary key of the object to update
+        :param data: Updated data
+        :param query: Query params
+        :return: JSON response as a dict
+        """
+        validated_data = self.validate(data, action="update")
+
+        return self.write("patch", "partial_update", validated_data, pk=pk, query=query)
+
+    def update(
+        self, pk: Any, data: dict, query: dict = None, partial: bool = False
+    ) -> APIResourceResponse:
+        if partial:
+            return self.patch(pk=pk, data=data, query=query)
+
+        return self.put(pk=pk, data=data, query=query)
+
+    def delete(self, pk: Any, query: dict = None) -> APIResourceResponse:
+        """
+            Performs a DELETE request to the server
+        :param pk: Primary key of the object to update
+        :param query: Query params
+        :return: JSON response as a dict
+        """
+        response = self.request(
+            "delete",
+            self.get_url(pk),
+            action="delete",
+            headers=self.get_request_headers("delete"),
+            params=query,
+        )
+        self.invalidate_cache(pk)
+
+        return self.build_response(response, action="delete")
+
+    def destroy(self, pk: Any, query: dict = None) -> APIResourceResponse:
+        return self.delete(pk=pk, query=query)
+
+    def create_many(
+        self,
+        data: Iterable[dict],
+        concurrency: int = None,
+        stop_on_error: bool = False,
+        query: dict = None,
+    ) -> List[Optional[APIResourceResponse]]:
+        """
+            Creates many items, validating them at once. They are sent in chunks
+            to the bulk endpoint when bulk_create_path is declared, or
+            concurrently one by one otherwise
+        :param data: The payloads
+        :param concurrency: Maximum number of items sent at the same time,
+            write_concurrency by default
+        :param stop_on_error: Whether to stop sending items after the first failure
+        :param query: Query params
+        :return: The response of every item, in order. Invalid items get a 400
+            response with their errors, failed requests keep their exception in
+            the error attribute and the items not sent are None
+        """
+        return self.write_many(
+            "post", "create", data, concurrency, stop_on_error, query
+        )
+
+    def update_many(
+        self,
+        data: Iterable[dict],
+        partial: bool = False,
+        concurrency: int = None,
+        stop_on_error: bool = False,
+        query: dict = None,
+    ) -> List[Optional[APIResourceResponse]]:
+        """
+        Updates many items, like create_many. Every payload holds the pk of its
+        item in the bulk_update_key field
+        """
+        method, action = ("patch", "partial_update") if partial else ("put", "update")
+        return self.write_many(method, action, data, concurrency, stop_on_error, query)
+
+    def write_many(
+        self,
+        method: str,
+        action: str,
+        data: Iterable[dict],
+        concurrency: int = None,
+        stop_on_error: bool = False,
+        query: dict = None,
+    ) -> List[Optional[APIResourceResponse]]:
+        data = list(data)
+        results = self.validate_bulk(data, action)
+        if stop_on_error and any(results):
+            return results
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        url = self.get_bulk_url(action)
+        if url is not None:
+            for chunk in self.get_bulk_chunks(pending):
+                responses = self.write_bulk(
+                    method, action, url, [data[index] for index in chunk], query
+                )
+                for index, response in zip(chunk, responses):
+                    results[index] = response
+                if stop_on_error and any(map(self.is_failed_write, responses)):
+                    break
+            return results
+
+        failed = threading.Event()
+
+        def write(index: int) -> Optional[APIResourceResponse]:
+            if failed.is_set():
+                return None
+
+            result = self.write_or_error(method, action, data[index], query)
+            if stop_on_error and self.is_failed_write(result):
+                failed.set()
+            return result
+
+        max_workers = min(concurrency or self.write_concurrency, len(pending))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [submit_in_context(executor, write, index) for index in pending]
+
+        for index, future in zip(pending, futures):
+            results[index] = future.result()
+
+        return results
+
+
+class AsyncAPIResource(APIResource):
+    """
+    API resource class to perform non blocking requests to an external API.
+
+    It shares every hook with ``APIResource`` (``get_url``, ``get_headers``,
+    ``map_response``, pagination...), but its request methods are coroutines.
+    """
+
+    def __init__(
+        self,
+        token: str = None,
+        http=None,
+        validator: Type[InputValidator] = None,
+        context: dict = None,
+    ):
+        super().__init__(
+            token=token,
+            http=http if http is not None else default_async_pool,
+            validator=validator,
+            context=context,
+        )
+
+    async def send(self, method: str, url: str, **kwargs):
+        if kwargs.pop("stream", False):
+            return await self.http.stream(method.upper(), url, **kwargs)
+
+        return await getattr(self.http, method)(url, **kwargs)
+
+    @asynccontextmanager
+    async def limit(self, action: str = None):
+        limiter = self.get_limiter()
+        if limiter is None:
+            yield
+            return
+
+        async with limiter.limit_async(self.get_limit_timeout()) as waited:
+            self.record_stage(action, "queue", waited)
+            yield
+
+    async def load_token(self):
+        """
+        Obtains a missing or expired token of the token provider in the default
+        executor, so building the headers of the request doesn't block the loop
+        """
+        provider = self.get_token_provider()
+        if provider is None or provider.get_cached_token(self.token) is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, provider.get_token, self.token)
+
+    async def send_before_deadline(self, method: str, url: str, **kwargs):
+        """
+        Sends a request, cancelling it when the request deadline is exceeded
+        """
+        remaining = get_remaining_time()
+        if remaining is None:
+            return await self.send(method, url, **kwargs)
+
+        try:
+            return await asyncio.wait_for(self.send(method, url, **kwargs), remaining)
+        except asyncio.TimeoutError:
+            raise APIResourceDeadlineException() from None
+
+    async def request(self, method: str, url: str, action: str = None, **kwargs):
+        started = perf_counter()
+        status = "error"
+        try:
+            response = await self.send_with_retries(method, url, action, **kwargs)
+            if response.status_code == 401 and self.get_token_provider() is not None:
+                loop = asyncio.get_running_loop()
+                headers = await loop.run_in_executor(
+                    None, self.get_renewed_headers, response, kwargs.get("headers")
+                )
+                if headers is not None:
+                    await response.aclose()
+                    kwargs["headers"] = headers
+                    response = await self.send_with_retries(
+                        method, url, action, **kwargs
+                    )
+            status = str(response.status_code)
+            return response
+        finally:
+            self.record_request(action, status, perf_counter() - started)
+
+    async def send_with_retries(self, method: str, url: str, action: str, **kwargs):
+        retry = self.get_retry(action)
+        breaker = self.get_circuit_breaker()
+        for attempt in count():
+            timeout = self.get_request_timeout(action)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            async with self.limit(action):
+                if breaker is not None:
+                    breaker.before_call()
+
+                try:
+                    with self.measure_stage(action, "network"):
+                        response = await self.send_before_deadline(
+                            method, url, **kwargs
+                        )
+                except APIResourceDeadlineException:
+                    if breaker is not None:
+                        breaker.record_failure()
+                    raise
+                except asyncio.CancelledError:
+                    if breaker is not None:
+                        breaker.release()
+                    raise
+                except Exception as e:
+                    delay = self.record_attempt(attempt, retry, breaker, exception=e)
+                    if delay is None:
+                        raise
+                else:
+                    delay = self.record_attempt(
+                        attempt, retry, breaker, response=response
+                    )
+                    if delay is None:
+                        return response
+                    await response.aclose()
+
+            await asyncio.sleep(delay)
+
+    async def compose(self, data):
+        relations = self.get_relations()
+        if not relations:
+            return data
+
+        composer = Composer(relations, token=self.token, context=self.context)
+        return await composer.compose_async(data)
+
+    async def call_cache(self, fn: Callable, *args):
+        """
+        Calls a method of the response cache, in a worker thread when the cache
+        blocks on I/O, as the Django cache backends do
+        """
+        if not self.cache_timeouts or not self.get_cache().blocking:
+            return fn(*args)
+
+        from asgiref.sync import sync_to_async
+
+        return await sync_to_async(fn, thread_sensitive=False)(*args)
+
+    async def read(
+        self, url: str, action: str, params: dict, paginate: bool = False
+    ) -> APIResourceResponse:
+        entry = await self.call_cache(self.get_cached_entry, url, action, params)
+        if entry is not None:
+            if entry.is_fresh():
+                return self.make_response(entry.data, entry.status, action, paginate)
+            if entry.is_stale_within(self.get_stale_while_revalidate(action)):
+                self.refresh_in_background(url, action, params, entry)
+                return self.make_response(entry.data, entry.status, action, paginate)
+
+        try:
+            if action in self.coalesced_actions:
+                key = self.get_flight_key(url, params)
+                data, status = await async_single_flight.do(
+                    key, lambda: self.fetch(url, action, params, entry)
+                )
+            else:
+                data, status = await self.fetch(url, action, params, entry)
+        except Exception:
+            if not self.can_serve_stale_if_error(entry, action):
+                raise
+            data, status = entry.data, entry.status
+        else:
+            if status >= 500 and self.can_serve_stale_if_error(entry, action):
+                data, status = entry.data, entry.status
+
+        return self.make_response(data, status, action, paginate)
+
+    def refresh_in_background(
+        self, url: str, action: str, params: dict, entry: CacheEntry
+    ):
+        """
+        Refreshes a stale cache entry in a background task, once at a time. The
+        task runs in an empty context, without the deadline of the request
+        """
+        key = self.get_flight_key(url, params)
+        if not start_refresh(key):
+            return
+
+        async def refresh():
+            try:
+                await self.fetch(url, action, params, entry)
+            except Exception as e:
+                logger.warning("Could not refresh %s: %s", url, e)
+            finally:
+                finish_refresh(key)
+
+        loop = asyncio.get_running_loop()
+        task = contextvars.Context().run(loop.create_task, refresh())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def fetch(
+        self, url: str, action: str, params: dict, entry: CacheEntry = None
+    ) -> Tuple[Any, int]:
+        await self.load_token()
+        headers = {
+            **self.get_request_headers(action),
+            **self.get_conditional_headers(entry),
+        }
+        response = await self.request(
+            "get", url, action, headers=headers, params=params
+        )
+        if entry is not None and response.status_code == 304:
+            await self.call_cache(self.revalidate_cached_response, url, action, params)
+            return entry.data, entry.status
+
+        self.handle_server_errors(response)
+        data = self.decode_response(response, action)
+        await self.call_cache(self.cache_response, url, action, params, response, data)
+
+        return data, response.status_code
+
+    async def get_raw(self, url: str, **params):
+        await self.load_token()
+        response = await self.request(
+            "get", url, "get", headers=self.get_request_headers("get"), params=params
+        )
+        self.handle_server_errors(response)
+
+        return response
+
+    async def get_stream(self, url: str, **params):
+        await self.load_token()
+        response = await self.request(
+            "get",
+            url,
+            "get",
+            headers=self.get_request_headers("get"),
+            params=params,
+            stream=True,
+        )
+        try:
+            self.handle_server_errors(response)
+        except BaseException:
+            await response.aclose()
+            raise
+
+        return response
+
+    async def iter_stream(self, response) -> AsyncIterator[bytes]:
+        size = 0
+        try:
+            async for chunk in response.aiter_bytes(chunk_size=self.stream_chunk_size):
+                size += len(chunk)
+                yield chunk
+        finally:
+            await response.aclose()
+            self.record_transfer("get", "received", size, get_wire_size(response, size))
+
+    async def get(self, url: str, **params) -> APIResourceResponse:
+        return await self.read(url, action="get", params=params)
+
+    async def list(self, **params) -> APIResourceResponse:
+        if self.is_rechunked():
+            return await self.list_rechunked(**params)
+
+        return await self.read(
+            self.get_url(), action="list", params=params, paginate=True
+        )
+
+    async def list_rechunked(self, **params) -> APIResourceResponse:
+        pagination = self.get_pagination_class()(context=self.context)
+        steps = pagination.paginate(self.get_url(), params)
+        try:
+            requests = next(steps)
+            while True:
+                pages = await self.fetch_rechunked_pages(pagination, requests)
+                requests = steps.send(pages)
+        except StopIteration as stop:
+            data = stop.value
+        except APIResourcePageException as e:
+            if e.status is None:
+                raise
+            return APIResourceResponse(data=e.data, status=e.status)
+
+        self.buffer_leftovers(pagination)
+        return APIResourceResponse(data=data, status=200)
+
+    async def fetch_rechunked_pages(
+        self, pagination: RechunkedPagination, requests: List[Tuple[str, dict]]
+    ) -> List[RechunkedPagination]:
+        semaphore = asyncio.Semaphore(self.prefetch_concurrency)
+
+        async def fetch(url: str, params: dict) -> RechunkedPagination:
+            async with semaphore:
+                return await self.fetch_rechunked_page(pagination, url, params)
+
+        tasks = [asyncio.ensure_future(fetch(*request)) for request in requests]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fetch_rechunked_page(
+        self, pagination: RechunkedPagination, url: str, params: dict
+    ) -> RechunkedPagination:
+        entry = self.get_pagination_buffer().get(self.get_cache_key(url, params))
+        if entry is not None:
+            data, headers = entry.data
+        else:
+            try:
+                if pagination.uses_headers:
+                    raw = await self.get_raw(url, **params)
+                    response = self.build_response(raw, "list")
+                    headers = self.get_page_headers(raw)
+                else:
+                    response = await self.read(url, action="list", params=params)
+                    headers = {}
+            except APIResourceException:
+                raise
+            except Exception as e:
+                raise APIResourcePageException(url=url, status=None) from e
+            data = self.get_page(response, url).data
+
+        return type(pagination)(data=data, context=self.context, headers=headers)
+
+    async def iter_pages(
+        self, max_pages: int = None, concurrency: int = None, **params
+    ) -> AsyncIterator[BasePagination]:
+        url = self.get_url()
+        pages = 0
+        while url and (max_pages is None or pages < max_pages):
+            response = await self.read(url, action="list", params=params)
+            page = self.get_page(response, url)
+            yield page
+
+            if pages == 0 and concurrency and concurrency > 1:
+                urls = self.get_remaining_page_urls(page, url, max_pages=max_pages)
+                if urls is not None:
+                    async for page in self.prefetch_pages(urls, concurrency):
+                        yield page
+                    return
+
+            pages += 1
+            url = self.get_next_page_url(page, url)
+            params = {}
+
+    async def fetch_page(self, url: str) -> BasePagination:
+        try:
+            response = await self.read(url, action="list", params={})
+        except APIResourceException:
+            raise
+        except Exception as e:
+            raise APIResourcePageException(url=url, status=None) from e
+
+        return self.get_page(response, url)
+
+    async def prefetch_pages(
+        self, urls: List[str], concurrency: int
+    ) -> AsyncIterator[BasePagination]:
+        urls = iter(urls)
+        pending = deque(
+            asyncio.ensure_future(self.fetch_page(url))
+            for url in islice(urls, concurrency)
+        )
+        try:
+            while pending:
+                page = await pending.popleft()
+                for url in islice(urls, 1):
+                    pending.append(asyncio.ensure_future(self.fetch_page(url)))
+
+                yield page
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_all(
+        self,
+        max_items: int = None,
+        max_pages: int = None,
+        concurrency: int = None,
+        **params,
+    ) -> AsyncIterator[Any]:
+        if max_items is not None and max_items <= 0:
+            return
+
+        items = 0
+        pages = self.iter_pages(max_pages=max_pages, concurrency=concurrency, **params)
+        async for page in pages:
+            for item in page.get_results():
+                yield item
+
+                items += 1
+                if max_items is not None and items >= max_items:
+                    return
+
+    async def fetch_all(
+        self,
+        max_items: int = None,
+        max_pages: int = None,
+        concurrency: int = None,
+        **params,
+    ) -> List[Any]:
+        items = self.iter_all(
+            max_items=max_items,
+            max_pages=max_pages,
+            concurrency=concurrency or self.prefetch_concurrency,
+            **params,
+        )
+        return [item async for item in items]
+
+    async def retrieve(self, pk: Any, **params) -> APIResourceResponse:
+        url = self.get_url(pk)
+
+        return await self.get(url, **params)
+
+    async def retrieve_or_error(self, pk: Any, **params) -> APIResourceResponse:
+        try:
+            return await self.retrieve(pk, **params)
+        except Exception as e:
+            return APIResourceResponse(data=None, status=None, error=e)
+
+    async def retrieve_batch(
+        self, pks: List[Any], **params
+    ) -> Dict[Any, APIResourceResponse]:
+        try:
+            items = self.iter_all(**self.get_batch_params(pks, params))
+            items = [item async for item in items]
+        except Exception as e:
+            return self.get_batch_errors(pks, e)
+
+        return self.get_batch_results(pks, items)
+
+    async def retrieve_many(
+        self, pks: Iterable[Any], concurrency: int = None, **params
+    ) -> Dict[Any, APIResourceResponse]:
+        pks = list(dict.fromkeys(pks))
+        if self.batch_retrieve_param:
+            results = {}
+            for chunk in self.get_batch_chunks(pks):
+                results.update(await self.retrieve_batch(chunk, **params))
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency or self.retrieve_concurrency)
+
+        async def retrieve(pk):
+            async with semaphore:
+                return await self.retrieve_or_error(pk, **params)
+
+        responses = await asyncio.gather(*[retrieve(pk) for pk in pks])
+        return dict(zip(pks, responses))
+
+    async def post(self, data: dict, query: dict = None) -> APIResourceResponse:
+        validated_data = self.validate(data, action="create")
+
+        return await self.write("post", "create", validated_data, query=query)
+
+    async def create(self, data: dict, query: dict = None) -> APIResourceResponse:
+        return await self.post(data=data, query=query)
+
+    async def put(self, pk: Any, data: dict, query: dict = None) -> APIResourceResponse:
+        validated_data = self.validate(data, action="update")
+
+        return await self.write("put", "update", validated_data, pk=pk, query=query)
+
+    async def patch(
+        self, pk: Any, data: dict, query: dict = None
+    ) -> APIResourceResponse:
+        validated_data = self.validate(data, action="update")
+
+        return await self.write(
+            "patch", "partial_update", validated_data, pk=pk, query=query
+        )
+
+    async def update(
+        self, pk: Any, data: dict, query: dict = None, partial: bool = False
+    ) -> APIResourceResponse:
+        if partial:
+            return await self.patch(pk=pk, data=data, query=query)
+
+        return await self.put(pk=pk, data=data, query=query)
+
+    async def delete(self, pk: Any, query: dict = None) -> APIResourceResponse:
+        await self.load_token()
+        response = await self.request(
+            "delete",
+            self.get_url(pk),
+            action="delete",
+            headers=self.get_request_headers("delete"),
+            params=query,
+        )
+        await self.call_cache(self.invalidate_cache, pk)
+
+        return self.build_response(response, action="delete")
+
+    async def destroy(self, pk: Any, query: dict = None) -> APIResourceResponse:
+        return await self.delete(pk=pk, query=query)
+
+    async def write(
+        self, method: str, action: str, data, pk: Any = None, query: dict = None
+    ) -> APIResourceResponse:
+        url = self.get_url() if pk is None else self.get_url(pk)
+        await self.load_token()
+        response = await self.request(
+            method,
+            url,
+            action=action,
+            **self.encode_body(data, action),
+            params=query,
+        )
+        await self.call_cache(self.invalidate_cache, pk)
+
+        return self.build_response(response, action=action, data=data)
+
+    async def write_or_error(
+        self, method: str, action: str, data: dict, query: dict = None
+    ) -> APIResourceResponse:
+        error = self.get_missing_key_error(action, data)
+        if error is not None:
+            return error
+
+        pk = None if action == "create" else data[self.bulk_update_key]
+        try:
+            return await self.write(method, action, data, pk=pk, query=query)
+        except Exception as e:
+            return APIResourceResponse(data=None, status=None, error=e)
+
+    async def write_bulk(
+        self, method: str, action: str, url: str, data: List[dict], query: dict = None
+    ) -> List[APIResourceResponse]:
+        try:
+            await self.load_token()
+            response = await self.request(
+                method,
+                url,
+                action=action,
+                **self.encode_body(data, action),
+                params=query,
+            )
+            await self.call_cache(self.invalidate_bulk_cache, action, data)
+            result = self.build_response(response, action=action, data=data)
+        except Exception as e:
+            return [APIResourceResponse(data=None, status=None, error=e) for _ in data]
+
+        return self.get_bulk_results(data, result)
+
+    async def create_many(
+        self,
+        data: Iterable[dict],
+        concurrency: int = None,
+        stop_on_error: bool = False,
+        query: dict = None,
+    ) -> List[Optional[APIResourceResponse]]:
+        return await self.write_many(
+            "post", "create", data, concurrency, stop_on_error, query
+        )
+
+    async def update_many(
+        self,
+        data: Iterable[dict],
+        partial: bool = False,
+        concurrency: int = None,
+        stop_on_error: bool = False,
+        query: dict = None,
+    ) -> List[Optional[APIResourceResponse]]:
+        method, action = ("patch", "partial_update") if partial else ("put", "update")
+        return await self.write_many(
+            method, action, data, concurrency, stop_on_error, query
+        )
+
+    async def write_many(
+        self,
+        method: str,
+        action: str,
+        data: Iterable[dict],
+        concurrency: int = None,
+        stop_on_error: bool = False,
+        query: dict = None,
+    ) -> List[Optional[APIResourceResponse]]:
+        data = list(data)
+        results = self.validate_bulk(data, action)
+        if stop_on_error and any(results):
+            return results
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        url = self.get_bulk_url(action)
+        if url is not None:
+            for chunk in self.get_bulk_chunks(pending):
+                responses = await self.write_bulk(
+                    method, action, url, [data[index] for index in chunk], query
+                )
+                for index, response in zip(chunk, responses):
+                    results[index] = response
+                if stop_on_error and any(map(self.is_failed_write, responses)):
+                    break
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency or self.write_concurrency)
+        failed = asyncio.Event()
+
+        async def write(index: int) -> Optional[APIResourceResponse]:
+            async with semaphore:
+                if failed.is_set():
+                    return None
+
+                result = await self.write_or_error(method, action, data[index], query)
+                if stop_on_error and self.is_failed_write(result):
+                    failed.set()
+                return result
+
+        responses = await asyncio.gather(*[write(index) for index in pending])
+        for index, response in zip(pending, responses):
+            results[index] = response
+
+        return results
@@ -1,4 +1,5 @@
 class APIResourceResponse(object):
-    def __init__(self, data, status):
+    def __init__(self, data, status, error: Exception = None):
         self.data = data
         self.status = status
+        self.error = error
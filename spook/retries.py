@@ -0,0 +1,113 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional, Tuple, Type
+
+import requests
+import urllib3
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+def get_transport_exceptions() -> Tuple[Type[BaseException], ...]:
+    """
+    Returns the exceptions raised when a request could not reach the upstream or
+    timed out waiting for it
+    """
+    exceptions = (
+        ConnectionError,
+        TimeoutError,
+        requests.ConnectionError,
+        requests.Timeout,
+        urllib3.exceptions.NewConnectionError,
+        urllib3.exceptions.ProtocolError,
+        urllib3.exceptions.TimeoutError,
+    )
+    if httpx is not None:
+        exceptions += (httpx.TransportError,)
+
+    return exceptions
+
+
+class Retry(object):
+    """
+    Retry policy with exponential backoff and full jitter. Responses with a
+    retryable status honor their `Retry-After` header, up to `retry_after_max`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        backoff_factor: float = 0.1,
+        backoff_max: float = 10,
+        jitter: bool = True,
+        statuses: Iterable[int] = (429, 502, 503, 504),
+        retry_after_max: float = 30,
+        exceptions: Tuple[Type[BaseException], ...] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.retry_after_max = retry_after_max
+        self.exceptions = (
+            get_transport_exceptions() if exceptions is None else exceptions
+        )
+
+    def should_retry(
+        self, attempt: int, response=None, exception: BaseException = None
+    ) -> bool:
+        """
+        Returns whether the given attempt, starting at 0, has to be retried
+        because of its response status or its exception
+        """
+        if attempt >= self.max_retries:
+            return False
+
+        if exception is not None:
+            return isinstance(exception, self.exceptions)
+
+        return response.status_code in self.statuses
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        Returns the seconds to wait before the retry following the given attempt,
+        starting at 0
+        """
+        backoff = min(self.backoff_max, self.backoff_factor * (2**attempt))
+        if self.jitter:
+            return random.uniform(0, backoff)
+
+        return backoff
+
+    def get_retry_after(self, response) -> Optional[float]:
+        """
+        Returns the seconds requested by the `Retry-After` header of a response,
+        given either as seconds or as an HTTP date
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+
+        return min(max(seconds, 0), self.retry_after_max)
+
+    def get_delay(self, attempt: int, response=None) -> float:
+        if response is not None:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None:
+                return retry_after
+
+        return self.get_backoff(attempt)
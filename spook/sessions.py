@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from typing import Iterable
+from urllib.parse import urlsplit
+
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+
+from spook import settings
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_client_timeout(timeout):
+    """
+    Converts a (connect, read) timeout into an ``httpx.Timeout``
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+
+    return timeout
+
+
+def get_host_key(url: str) -> tuple:
+    """
+    Returns the (scheme, host) pair identifying the upstream of an url
+    """
+    parts = urlsplit(url)
+    return parts.scheme.lower(), parts.netloc.lower()
+
+
+class SessionPool(object):
+    """
+    Keeps one keep-alive ``requests.Session`` per upstream host, shared across
+    threads and resource instances.
+
+    It exposes the same ``get``/``post``/``put``/``patch``/``delete`` surface as
+    the ``requests`` module, so it can be used as the ``http`` object of an
+    ``APIResource``.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = None,
+        pool_maxsize: int = None,
+        pool_block: bool = None,
+    ):
+        self.pool_connections = (
+            settings.POOL_CONNECTIONS if pool_connections is None else pool_connections
+        )
+        self.pool_maxsize = (
+            settings.POOL_MAXSIZE if pool_maxsize is None else pool_maxsize
+        )
+        self.pool_block = settings.POOL_BLOCK if pool_block is None else pool_block
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create_session(self) -> requests.Session:
+        """
+        Returns a new session with a pooled adapter. Cookies set by upstreams are
+        never persisted, as the session is shared between users.
+        """
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+    def get_session(self, url: str) -> requests.Session:
+        key = get_host_key(url)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._sessions[key] = self.create_session()
+
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.get_session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def warm_up(self, url: str, connections: int = None, timeout: float = 5) -> int:
+        """
+        Opens keep-alive connections to the host of the url, so the first requests
+        don't pay the TCP and TLS handshakes. Returns the number of connections
+        that could be opened; failures are logged and never raised.
+        """
+        if connections is None:
+            connections = settings.POOL_WARM_UP_CONNECTIONS
+        connections = min(connections, self.pool_maxsize)
+        if connections < 1:
+            return 0
+
+        def open_connection(_):
+            try:
+                self.head(url, timeout=timeout, allow_redirects=False).close()
+                return True
+            except requests.RequestException as e:
+                logger.warning("Could not warm up connection to %s: %s", url, e)
+                return False
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            return sum(executor.map(open_connection, range(connections)))
+
+    def warm_up_all(self, urls: Iterable[str], connections: int = None) -> int:
+        return sum(self.warm_up(url, connections=connections) for url in urls)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+
+        for session in sessions.values():
+            session.close()
+
+
+class AsyncClientPool(object):
+    """
+    Keeps one keep-alive ``httpx.AsyncClient`` per upstream host and event loop,
+    exposing a coroutine based ``get``/``post``/``put``/``patch``/``delete``
+    surface for ``AsyncAPIResource``.
+    """
+
+    def __init__(self, max_connections: int = None):
+        self.max_connections = (
+            settings.POOL_MAXSIZE if max_connections is None else max_connections
+        )
+        self._clients = weakref.WeakKeyDictionary()
+
+    def create_client(self):
+        if httpx is None:
+            raise ImproperlyConfigured(
+                "httpx is required to perform async requests, install spook[async]"
+            )
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        return httpx.AsyncClient(limits=limits)
+
+    def get_client(self, url: str):
+        clients = self._clients.setdefault(asyncio.get_running_loop(), {})
+        key = get_host_key(url)
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = self.create_client()
+
+        return client
+
+    def get_request_options(self, options: dict) -> dict:
+        """
+        Adapts the arguments of ``requests`` used by the resources to httpx: tuple
+        timeouts, and raw bodies, which httpx takes as ``content``
+        """
+        if "timeout" in options:
+            options["timeout"] = get_client_timeout(options["timeout"])
+        if isinstance(options.get("data"), (bytes, str)):
+            options["content"] = options.pop("data")
+
+        return options
+
+    async def request(self, method: str, url: str, **kwargs):
+        kwargs = self.get_request_options(kwargs)
+
+        return await self.get_client(url).request(method, url, **kwargs)
+
+    async def stream(self, method: str, url: str, **kwargs):
+        """
+        Sends a request without reading its body, which has to be consumed with
+        ``aiter_bytes()`` and closed with ``aclose()``
+        """
+        kwargs = self.get_request_options(kwargs)
+        client = self.get_client(url)
+        request = client.build_request(method, url, **kwargs)
+        return await client.send(request, stream=True)
+
+    async def get(self, url: str, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self):
+        """
+        Closes the clients bound to the running event loop
+        """
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+
+default_pool = SessionPool()
+default_async_pool = AsyncClientPool()
@@ -5,3 +5,60 @@ AUTHORIZATION_HEADER_NAME = getattr(
     settings, "SPOOK_AUTHORIZATION_HEADER_NAME", "Authorization"
 )
 AUTHORIZATION_HEADER = getattr(settings, "SPOOK_AUTHORIZATION_HEADER", "Bearer")
+TOKEN_REFRESH_MARGIN = getattr(settings, "SPOOK_TOKEN_REFRESH_MARGIN", 60)
+
+# Connection pooling
+POOL_CONNECTIONS = getattr(settings, "SPOOK_POOL_CONNECTIONS", 10)
+POOL_MAXSIZE = getattr(settings, "SPOOK_POOL_MAXSIZE", 10)
+POOL_BLOCK = getattr(settings, "SPOOK_POOL_BLOCK", False)
+POOL_WARM_UP_URLS = getattr(settings, "SPOOK_POOL_WARM_UP_URLS", [])
+POOL_WARM_UP_CONNECTIONS = getattr(settings, "SPOOK_POOL_WARM_UP_CONNECTIONS", 1)
+TRANSPORT = getattr(settings, "SPOOK_TRANSPORT", "spook.transports.RequestsTransport")
+
+# Response cache
+CACHE_MAX_ENTRIES = getattr(settings, "SPOOK_CACHE_MAX_ENTRIES", 1000)
+CACHE_MAX_BYTES = getattr(settings, "SPOOK_CACHE_MAX_BYTES", None)
+CACHE_ALIAS = getattr(settings, "SPOOK_CACHE_ALIAS", "default")
+
+# Pagination
+PREFETCH_CONCURRENCY = getattr(settings, "SPOOK_PREFETCH_CONCURRENCY", 4)
+
+# Bulk operations
+RETRIEVE_CONCURRENCY = getattr(settings, "SPOOK_RETRIEVE_CONCURRENCY", 8)
+WRITE_CONCURRENCY = getattr(settings, "SPOOK_WRITE_CONCURRENCY", 8)
+
+# Timeouts, in seconds
+CONNECT_TIMEOUT = getattr(settings, "SPOOK_CONNECT_TIMEOUT", 5)
+READ_TIMEOUT = getattr(settings, "SPOOK_READ_TIMEOUT", 30)
+
+# Retries and circuit breaker
+RETRY_MAX_RETRIES = getattr(settings, "SPOOK_RETRY_MAX_RETRIES", 0)
+RETRY_BACKOFF_FACTOR = getattr(settings, "SPOOK_RETRY_BACKOFF_FACTOR", 0.1)
+RETRY_BACKOFF_MAX = getattr(settings, "SPOOK_RETRY_BACKOFF_MAX", 10)
+CIRCUIT_BREAKER_THRESHOLD = getattr(settings, "SPOOK_CIRCUIT_BREAKER_THRESHOLD", None)
+CIRCUIT_BREAKER_TIMEOUT = getattr(settings, "SPOOK_CIRCUIT_BREAKER_TIMEOUT", 30)
+
+# Rate limiting and bulkheads
+RATE_LIMIT = getattr(settings, "SPOOK_RATE_LIMIT", None)
+RATE_LIMIT_BURST = getattr(settings, "SPOOK_RATE_LIMIT_BURST", None)
+MAX_IN_FLIGHT = getattr(settings, "SPOOK_MAX_IN_FLIGHT", None)
+LIMIT_MAX_WAIT = getattr(settings, "SPOOK_LIMIT_MAX_WAIT", None)
+
+# Compression
+REQUEST_COMPRESSION = getattr(settings, "SPOOK_REQUEST_COMPRESSION", None)
+REQUEST_COMPRESSION_THRESHOLD = getattr(
+    settings, "SPOOK_REQUEST_COMPRESSION_THRESHOLD", 1024
+)
+ACCEPT_ENCODING = getattr(settings, "SPOOK_ACCEPT_ENCODING", None)
+
+# Metrics
+METRICS_EXPORTERS = getattr(
+    settings, "SPOOK_METRICS_EXPORTERS", ["spook.metrics.PrometheusMetricsExporter"]
+)
+
+# Profiling
+SERVER_TIMING = getattr(settings, "SPOOK_SERVER_TIMING", False)
+SLOW_REQUEST_THRESHOLD = getattr(settings, "SPOOK_SLOW_REQUEST_THRESHOLD", None)
+
+# Streaming
+STREAM_CHUNK_SIZE = getattr(settings, "SPOOK_STREAM_CHUNK_SIZE", 64 * 1024)
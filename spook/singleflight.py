@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Hashable
+
+from spook.deadlines import get_remaining_time
+from spook.exceptions import APIResourceDeadlineException
+
+
+class _Call(object):
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces identical concurrent calls across threads: while a call for a key is
+    in flight, other callers of the same key wait for it and share its result
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.event.wait(get_remaining_time()):
+                raise APIResourceDeadlineException()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight(object):
+    """
+    Coalesces identical concurrent coroutines running in the same event loop. The
+    call runs in a task of its own, so cancelling any of its callers, the first
+    one included, doesn't cancel it for the others
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = calls[key] = asyncio.ensure_future(fn())
+
+            def finish(task: asyncio.Future):
+                if calls.get(key) is task:
+                    del calls[key]
+                # Mark the exception as retrieved when nobody was waiting anymore
+                if not task.cancelled():
+                    task.exception()
+
+            task.add_done_callback(finish)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), get_remaining_time())
+        except asyncio.TimeoutError:
+            raise APIResourceDeadlineException() from None
+
+
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
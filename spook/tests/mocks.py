@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from spook.resources import APIResource
+from spook.resources import APIResource, AsyncAPIResource
 from spook.validators import InputValidator
 from spook.tests.utils import MockedResponse
 
@@ -25,6 +25,14 @@ class ProductResource(APIResource):
         return "my-awesome-token"
 
 
+class AsyncProductResource(AsyncAPIResource):
+    api_url = "http://example.com/api/1.0/products/"
+    validator = ProductValidator
+
+    def get_token(self) -> str:
+        return "my-awesome-token"
+
+
 PRODUCTS = {
     "count": 2,
     "next": None,
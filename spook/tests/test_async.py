@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from spook.sessions import AsyncClientPool
+from spook.tests.mocks import (
+    AsyncProductResource,
+    ProductSerializer,
+    get_mocked_products,
+    PRODUCTS,
+    retrieve_product,
+    create_product,
+    CREATED_PRODUCT,
+    update_product,
+    UPDATED_PRODUCT,
+    delete_product,
+)
+from spook.tests.utils import MockedAsyncHttp, MockedResponse
+from spook.views import (
+    AsyncAPIResourceListCreateView,
+    AsyncAPIResourceRetrieveUpdateDestroyView,
+)
+
+
+def mocked_resource(mock):
+    class MockedProductResource(AsyncProductResource):
+        http_mock = MockedAsyncHttp(mock)
+
+        def __init__(self, **kwargs):
+            super().__init__(http=self.http_mock, **kwargs)
+
+    return MockedProductResource
+
+
+class TestAsyncAPIResource(APITestCase):
+    def test_list_products(self):
+        http = MockedAsyncHttp(get_mocked_products)
+        response = asyncio.run(AsyncProductResource(http=http).list(page=2))
+        assert response.status == 200
+        assert response.data == PRODUCTS
+        method, url, kwargs = http.calls[0]
+        assert method == "GET"
+        assert url == AsyncProductResource.api_url
+        assert kwargs["params"] == {"page": 2}
+        assert kwargs["headers"]["Authorization"] == "Bearer my-awesome-token"
+
+    def test_retrieve_product(self):
+        http = MockedAsyncHttp(retrieve_product)
+        response = asyncio.run(AsyncProductResource(http=http).retrieve(1))
+        assert response.status == 200
+        assert response.data == PRODUCTS["results"][0]
+        assert http.calls[0][1] == f"{AsyncProductResource.api_url}/1"
+
+    def test_create_product(self):
+        http = MockedAsyncHttp(create_product)
+        response = asyncio.run(AsyncProductResource(http=http).create(CREATED_PRODUCT))
+        assert response.status == 201
+        assert response.data == CREATED_PRODUCT
+
+    def test_create_invalid_input(self):
+        http = MockedAsyncHttp(create_product)
+        with pytest.raises(ValidationError):
+            asyncio.run(AsyncProductResource(http=http).create({"wrong": "input"}))
+        assert http.calls == []
+
+    def test_update_product(self):
+        http = MockedAsyncHttp(update_product)
+        resource = AsyncProductResource(http=http)
+        response = asyncio.run(resource.update(3, UPDATED_PRODUCT))
+        assert response.data == UPDATED_PRODUCT
+        response = asyncio.run(resource.update(3, UPDATED_PRODUCT, partial=True))
+        assert response.data == UPDATED_PRODUCT
+        assert [call[0] for call in http.calls] == ["PUT", "PATCH"]
+
+    def test_delete_product(self):
+        http = MockedAsyncHttp(delete_product)
+        response = asyncio.run(AsyncProductResource(http=http).destroy(3))
+        assert response.status == 204
+        assert response.data == ""
+
+    def test_concurrent_requests(self):
+        http = MockedAsyncHttp(retrieve_product)
+        resource = AsyncProductResource(http=http)
+
+        async def retrieve_all():
+            return await asyncio.gather(*[resource.retrieve(pk) for pk in range(5)])
+
+        responses = asyncio.run(retrieve_all())
+        assert [response.status for response in responses] == [200] * 5
+        assert len(http.calls) == 5
+
+    def test_client_pool_per_host(self):
+        pool = AsyncClientPool(max_connections=4)
+
+        async def get_clients():
+            clients = (
+                pool.get_client("http://example.com/a"),
+                pool.get_client("http://example.com/b"),
+                pool.get_client("http://example.org/a"),
+            )
+            await pool.aclose()
+            return clients
+
+        first, second, third = asyncio.run(get_clients())
+        assert first is second
+        assert first is not third
+
+
+class TestAsyncAPIResourceViews(APITestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def get_view(self, base, mock):
+        class View(base):
+            resource = mocked_resource(mock)
+            serializer_class = ProductSerializer
+            authentication_classes = []
+            permission_classes = []
+
+            def get_token(self, request):
+                return ""
+
+        return View.as_view()
+
+    def test_views_are_async(self):
+        assert AsyncAPIResourceListCreateView.view_is_async
+        assert AsyncAPIResourceRetrieveUpdateDestroyView.view_is_async
+
+    def test_list_view_products(self):
+        view = self.get_view(AsyncAPIResourceListCreateView, get_mocked_products)
+        response = asyncio.run(view(self.factory.get("/products/")))
+        assert response.status_code == 200
+        assert response.data == PRODUCTS
+
+    def test_retrieve_view_product(self):
+        view = self.get_view(
+            AsyncAPIResourceRetrieveUpdateDestroyView, retrieve_product
+        )
+        response = asyncio.run(view(self.factory.get("/products/1/"), pk=1))
+        assert response.status_code == 200
+        assert response.data == PRODUCTS["results"][0]
+
+    def test_create_view_product(self):
+        view = self.get_view(AsyncAPIResourceListCreateView, create_product)
+        request = self.factory.post(
+            "/products/", {"name": "The Elder Scrolls V"}, format="json"
+        )
+        response = asyncio.run(view(request))
+        assert response.status_code == 201
+        assert response.data == CREATED_PRODUCT
+
+    def test_create_view_invalid_input(self):
+        view = self.get_view(AsyncAPIResourceListCreateView, create_product)
+        request = self.factory.post("/products/", {"wrong": "input"}, format="json")
+        response = asyncio.run(view(request))
+        assert response.status_code == 400
+
+    def test_partial_update_view_product(self):
+        view = self.get_view(AsyncAPIResourceRetrieveUpdateDestroyView, update_product)
+        request = self.factory.patch(
+            "/products/3/", {"name": "The Elder Scrolls V: Skyrim"}, format="json"
+        )
+        response = asyncio.run(view(request, pk=3))
+        assert response.status_code == 200
+        assert response.data == UPDATED_PRODUCT
+
+    def test_delete_view_product(self):
+        view = self.get_view(AsyncAPIResourceRetrieveUpdateDestroyView, delete_product)
+        response = asyncio.run(view(self.factory.delete("/products/3/"), pk=3))
+        assert response.status_code == 204
+
+    def test_retrieve_view_passthrough(self):
+        def raw_product(*args, **kwargs):
+            return MockedResponse(
+                data=b'{"id": 1}', headers={"Content-Type": "application/json"}
+            )
+
+        view = self.get_view(
+            AsyncAPIResourceRetrieveUpdateDestroyView, raw_product
+        ).view_class
+        view.passthrough = True
+        response = asyncio.run(view.as_view()(self.factory.get("/products/1/"), pk=1))
+        assert response.status_code == 200
+        assert response.content == b'{"id": 1}'
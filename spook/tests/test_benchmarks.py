@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from benchmarks.run import build_calls, compare, percentile, run_scenario
+from benchmarks.upstream import Upstream
+
+
+class TestBenchmarks(TestCase):
+    def test_scenarios_run_against_the_upstream(self):
+        with Upstream(payload_items=5) as upstream:
+            calls = build_calls(upstream.url)
+            for mode, actions in calls.items():
+                for action, call in actions.items():
+                    result = run_scenario(
+                        mode, action, call, requests=4, concurrency=2, warm_up=1
+                    )
+                    assert result["errors"] == 0, result["name"]
+                    assert result["rps"] > 0
+                    assert result["peak_memory_kb"] > 0
+
+    def test_upstream_error_rate(self):
+        with Upstream(error_rate=1) as upstream:
+            call = build_calls(upstream.url)["direct"]["retrieve"]
+            result = run_scenario("direct", "retrieve", call, 3, 1, memory_requests=0)
+        assert result["errors"] == 3
+        assert result["peak_memory_kb"] is None
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 99) == 0
+
+    def test_compare(self):
+        baseline = {"results": [{"name": "direct.get.c1", "rps": 100, "p99_ms": 10}]}
+        results = {"results": [{"name": "direct.get.c1", "rps": 95, "p99_ms": 10.5}]}
+        assert compare(results, baseline, tolerance=0.1) == []
+        results = {"results": [{"name": "direct.get.c1", "rps": 80, "p99_ms": 20}]}
+        assert len(compare(results, baseline, tolerance=0.1)) == 2
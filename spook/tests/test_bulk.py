@@ -0,0 +1,295 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from spook.resources import AsyncAPIResource
+from spook.tests.mocks import ProductResource
+from spook.tests.utils import MockedResponse
+
+PRODUCTS_BY_ID = {i: {"id": i, "name": f"Product {i}"} for i in range(1, 11)}
+
+
+class ItemsHttp(object):
+    """
+    Upstream serving the products by id and, filtered by id__in, as a list
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        with self.lock:
+            self.calls.append((url, params))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        try:
+            return self.respond(url, params or {})
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def respond(self, url, params):
+        if "id__in" in params:
+            ids = [int(pk) for pk in params["id__in"].split(",")]
+            results = [PRODUCTS_BY_ID[pk] for pk in ids if pk in PRODUCTS_BY_ID]
+            return MockedResponse(
+                data={"count": len(results), "next": None, "results": results}
+            )
+
+        pk = url.rsplit("/", 1)[-1]
+        if pk == "boom":
+            raise ConnectionError("Connection reset by peer")
+        if int(pk) not in PRODUCTS_BY_ID:
+            return MockedResponse(data={"detail": "Not found."}, status_code=404)
+
+        return MockedResponse(data=PRODUCTS_BY_ID[int(pk)])
+
+
+class BatchProductResource(ProductResource):
+    batch_retrieve_param = "id__in"
+    batch_retrieve_size = 3
+
+
+class TestRetrieveMany(TestCase):
+    def test_retrieve_many(self):
+        http = ItemsHttp(delay=0.01)
+        results = ProductResource(http=http).retrieve_many([1, 2, 3, 4], concurrency=4)
+        assert list(results) == [1, 2, 3, 4]
+        assert all(result.status == 200 for result in results.values())
+        assert results[3].data == PRODUCTS_BY_ID[3]
+        assert http.max_in_flight > 1
+
+    def test_deduplicates_pks(self):
+        http = ItemsHttp()
+        results = ProductResource(http=http).retrieve_many([1, 2, 1, 2, 1])
+        assert list(results) == [1, 2]
+        assert len(http.calls) == 2
+
+    def test_bounded_concurrency(self):
+        http = ItemsHttp(delay=0.01)
+        ProductResource(http=http).retrieve_many(range(1, 11), concurrency=3)
+        assert http.max_in_flight <= 3
+
+    def test_per_item_errors(self):
+        http = ItemsHttp()
+        results = ProductResource(http=http).retrieve_many([1, 99, "boom"])
+        assert results[1].status == 200
+        assert results[1].error is None
+        assert results[99].status == 404
+        assert results["boom"].status is None
+        assert isinstance(results["boom"].error, ConnectionError)
+
+    def test_empty(self):
+        assert ProductResource(http=ItemsHttp()).retrieve_many([]) == {}
+
+    def test_batch_endpoint(self):
+        http = ItemsHttp()
+        results = BatchProductResource(http=http).retrieve_many([1, 2, 3, 4, 99])
+        assert [call[1]["id__in"] for call in http.calls] == ["1,2,3", "4,99"]
+        assert results[4].data == PRODUCTS_BY_ID[4]
+        assert results[99].status == 404
+        assert list(results) == [1, 2, 3, 4, 99]
+
+    def test_async_retrieve_many(self):
+        class AsyncItemsHttp(ItemsHttp):
+            async def get(self, url, params=None, **kwargs):
+                return super().get(url, params=params, **kwargs)
+
+        class AsyncProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+            batch_retrieve_param = None
+
+        class AsyncBatchProductResource(AsyncProductResource):
+            batch_retrieve_param = "id__in"
+
+        results = asyncio.run(
+            AsyncProductResource(http=AsyncItemsHttp()).retrieve_many([1, 1, 99])
+        )
+        assert list(results) == [1, 99]
+        assert results[99].status == 404
+
+        http = AsyncItemsHttp()
+        results = asyncio.run(
+            AsyncBatchProductResource(http=http).retrieve_many([2, 3])
+        )
+        assert results[3].data == PRODUCTS_BY_ID[3]
+        assert len(http.calls) == 1
+
+
+class WritesHttp(object):
+    """
+    Upstream creating and updating products one by one, or many at once on its
+    bulk endpoint. Products named "fail" get a 500 and "boom" a connection error
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, json=None, **kwargs):
+        with self.lock:
+            self.calls.append((method, url, json))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        try:
+            return self.respond(method, url, json)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def respond(self, method, url, data):
+        status = 201 if method == "POST" else 200
+        if isinstance(data, list):
+            if any(item["name"] == "fail" for item in data):
+                return MockedResponse(data={"detail": "Server error"}, status_code=500)
+            return MockedResponse(
+                data=[{"id": 1, **item} for item in data], status_code=status
+            )
+
+        if data["name"] == "boom":
+            raise ConnectionError("Connection reset by peer")
+        if data["name"] == "fail":
+            return MockedResponse(data={"detail": "Server error"}, status_code=500)
+
+        return MockedResponse(data={"id": 1, **data}, status_code=status)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+
+class BulkProductResource(ProductResource):
+    bulk_create_path = "bulk/"
+    bulk_update_path = "bulk/"
+    bulk_size = 2
+
+
+class TestWriteMany(TestCase):
+    def test_create_many(self):
+        http = WritesHttp(delay=0.01)
+        data = [{"name": f"Product {i}"} for i in range(6)]
+        results = ProductResource(http=http).create_many(data, concurrency=3)
+        assert [result.data["name"] for result in results] == [
+            item["name"] for item in data
+        ]
+        assert all(result.status == 201 for result in results)
+        assert 1 < http.max_in_flight <= 3
+
+    def test_validation_errors_are_reported_per_item(self):
+        http = WritesHttp()
+        data = [{"name": "Product"}, {}, {"name": "Other"}]
+        results = ProductResource(http=http).create_many(data)
+        assert results[0].status == 201
+        assert results[1].status == 400
+        assert "name" in results[1].data
+        assert results[1].error is not None
+        assert results[2].status == 201
+        assert len(http.calls) == 2
+
+    def test_failures_are_reported_per_item(self):
+        data = [{"name": "Product"}, {"name": "fail"}, {"name": "boom"}]
+        results = ProductResource(http=WritesHttp()).create_many(data)
+        assert results[0].status == 201
+        assert results[1].status == 500
+        assert results[2].status is None
+        assert isinstance(results[2].error, ConnectionError)
+
+    def test_stop_on_error(self):
+        http = WritesHttp()
+        data = [{"name": "Product"}, {"name": "fail"}, {"name": "Other"}]
+        results = ProductResource(http=http).create_many(
+            data, concurrency=1, stop_on_error=True
+        )
+        assert results[0].status == 201
+        assert results[1].status == 500
+        assert results[2] is None
+        assert len(http.calls) == 2
+
+        results = ProductResource(http=http).create_many(
+            [{"name": "Product"}, {}], stop_on_error=True
+        )
+        assert results[0] is None
+        assert results[1].status == 400
+        assert len(http.calls) == 2
+
+    def test_update_many(self):
+        http = WritesHttp()
+        data = [{"id": 1, "name": "One"}, {"id": 2, "name": "Two"}]
+        results = ProductResource(http=http).update_many(data, partial=True)
+        assert [result.status for result in results] == [200, 200]
+        assert sorted(call[:2] for call in http.calls) == [
+            ("PATCH", "http://example.com/api/1.0/products//1"),
+            ("PATCH", "http://example.com/api/1.0/products//2"),
+        ]
+
+    def test_update_many_without_key(self):
+        http = WritesHttp()
+        data = [{"id": 1, "name": "One"}, {"name": "Two"}]
+        results = ProductResource(http=http).update_many(data, partial=True)
+        assert [result.status for result in results] == [200, 400]
+        assert results[1].data == {"id": ["This field is required."]}
+        assert [call[:2] for call in http.calls] == [
+            ("PATCH", "http://example.com/api/1.0/products//1")
+        ]
+
+    def test_bulk_endpoint(self):
+        http = WritesHttp()
+        data = [{"name": f"Product {i}"} for i in range(5)]
+        results = BulkProductResource(http=http).create_many(data)
+        assert [len(call[2]) for call in http.calls] == [2, 2, 1]
+        assert http.calls[0][1] == "http://example.com/api/1.0/products//bulk/"
+        assert [result.data["name"] for result in results] == [
+            item["name"] for item in data
+        ]
+
+    def test_bulk_endpoint_failures(self):
+        http = WritesHttp()
+        data = [{"name": "One"}, {"name": "fail"}, {"name": "Two"}, {"name": "Three"}]
+        results = BulkProductResource(http=http).update_many(data)
+        assert [result.status for result in results] == [500, 500, 200, 200]
+        assert results[0].data == {"detail": "Server error"}
+
+        results = BulkProductResource(http=http).update_many(data, stop_on_error=True)
+        assert results[2:] == [None, None]
+
+    def test_async_create_many(self):
+        class AsyncWritesHttp(WritesHttp):
+            async def post(self, url, **kwargs):
+                return self.request("POST", url, **kwargs)
+
+        class AsyncProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+            validator = ProductResource.validator
+
+        class AsyncBulkProductResource(AsyncProductResource):
+            bulk_create_path = "bulk/"
+
+        data = [{"name": "Product"}, {}, {"name": "fail"}, {"name": "Other"}]
+        results = asyncio.run(
+            AsyncProductResource(http=AsyncWritesHttp()).create_many(data)
+        )
+        assert [result.status for result in results] == [201, 400, 500, 201]
+
+        http = AsyncWritesHttp()
+        results = asyncio.run(
+            AsyncBulkProductResource(http=http).create_many(
+                [{"name": "Product"}, {"name": "Other"}]
+            )
+        )
+        assert results[1].data == {"id": 1, "name": "Other"}
+        assert len(http.calls) == 1
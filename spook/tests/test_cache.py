@@ -0,0 +1,444 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+import pytest
+import requests
+from django.core.cache import cache as default_cache
+
+from spook.cache import CacheEntry, DjangoResponseCache, LocMemResponseCache
+from spook.resources import AsyncAPIResource
+from spook.tests.mocks import (
+    ProductResource,
+    PRODUCTS,
+    CREATED_PRODUCT,
+    UPDATED_PRODUCT,
+)
+from spook.tests.utils import CountingHttp, MockedAsyncHttp, MockedResponse
+
+
+class CachedProductResource(ProductResource):
+    cache_timeouts = {"list": 60, "get": 60}
+
+
+class TestLocMemResponseCache(TestCase):
+    def test_get_and_set(self):
+        cache = LocMemResponseCache()
+        cache.set("key", "http://example.com/", CacheEntry(data=[1], status=200), 60)
+        assert cache.get("key").data == [1]
+        assert cache.get("missing") is None
+        assert cache.stats["hits"] == 1
+        assert cache.stats["misses"] == 1
+
+    def test_expiration(self):
+        cache = LocMemResponseCache()
+        cache.set("key", "http://example.com/", CacheEntry(data=[1], status=200), 0.01)
+        time.sleep(0.02)
+        assert cache.get("key") is None
+        assert cache.stats["expirations"] == 1
+        assert cache.stats["entries"] == 0
+
+    def test_lru_eviction_by_entries(self):
+        cache = LocMemResponseCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, "http://example.com/", CacheEntry(data=key, status=200), 60)
+        cache.get("a")
+        cache.set("c", "http://example.com/", CacheEntry(data="c", status=200), 60)
+        assert cache.get("b") is None
+        assert cache.get("a").data == "a"
+        assert cache.get("c").data == "c"
+        assert cache.stats["evictions"] == 1
+
+    def test_lru_eviction_by_bytes(self):
+        cache = LocMemResponseCache(max_bytes=100)
+        for key in ("a", "b", "c"):
+            entry = CacheEntry(data=key, status=200, size=40)
+            cache.set(key, "http://example.com/", entry, 60)
+        assert cache.get("a") is None
+        assert cache.stats["bytes"] == 80
+        assert cache.stats["evictions"] == 1
+
+    def test_invalidate_url(self):
+        cache = LocMemResponseCache()
+        cache.set("a", "http://example.com/", CacheEntry(data="a", status=200), 60)
+        cache.set("b", "http://example.com/", CacheEntry(data="b", status=200), 60)
+        cache.set("c", "http://example.com/1", CacheEntry(data="c", status=200), 60)
+        cache.invalidate("http://example.com/")
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+        assert cache.get("c").data == "c"
+
+
+class TestResourceCache(TestCase):
+    def setUp(self):
+        CachedProductResource().get_cache().clear()
+
+    def test_not_cached_by_default(self):
+        http = CountingHttp(PRODUCTS)
+        ProductResource(http=http).list()
+        ProductResource(http=http).list()
+        assert len(http.calls) == 2
+
+    def test_list_is_cached(self):
+        http = CountingHttp(PRODUCTS)
+        first = CachedProductResource(http=http).list(page=1)
+        second = CachedProductResource(http=http).list(page=1)
+        assert first.data == second.data == PRODUCTS
+        assert len(http.calls) == 1
+
+    def test_params_are_normalized(self):
+        http = CountingHttp(PRODUCTS)
+        CachedProductResource(http=http).list(page=1, search="star")
+        CachedProductResource(http=http).list(search="star", page="1")
+        CachedProductResource(http=http).list(page=2, search="star")
+        assert len(http.calls) == 2
+
+    def test_cached_per_identity(self):
+        http = CountingHttp(PRODUCTS)
+        CachedProductResource(http=http).list()
+
+        class OtherUserResource(CachedProductResource):
+            def get_cache(self):
+                return CachedProductResource().get_cache()
+
+            def get_token(self) -> str:
+                return "another-token"
+
+        OtherUserResource(http=http).list()
+        assert len(http.calls) == 2
+
+    def test_errors_are_not_cached(self):
+        http = CountingHttp(data="Internal Server Error", status_code=500)
+        CachedProductResource(http=http).list()
+        response = CachedProductResource(http=http).list()
+        assert response.status == 500
+        assert len(http.calls) == 2
+
+    def test_create_invalidates_list(self):
+        http = CountingHttp(PRODUCTS)
+        resource = CachedProductResource(http=http)
+        resource.list()
+        resource.retrieve(1)
+        resource.create(CREATED_PRODUCT)
+        resource.list()
+        resource.retrieve(1)
+        assert [call[0] for call in http.calls] == ["GET", "GET", "POST", "GET"]
+
+    def test_create_invalidates_every_page(self):
+        http = CountingHttp(PRODUCTS)
+        resource = CachedProductResource(http=http)
+        next_url = f"{resource.get_url()}?page=2"
+        resource.fetch_page(next_url)
+        resource.fetch_page(next_url)
+        resource.create(CREATED_PRODUCT)
+        resource.fetch_page(next_url)
+        assert [call[0] for call in http.calls] == ["GET", "POST", "GET"]
+
+    def test_update_invalidates_item_and_list(self):
+        http = CountingHttp(PRODUCTS)
+        resource = CachedProductResource(http=http)
+        resource.list()
+        resource.retrieve(1)
+        resource.retrieve(2)
+        resource.update(1, UPDATED_PRODUCT, partial=True)
+        resource.list()
+        resource.retrieve(1)
+        resource.retrieve(2)
+        assert [call[0] for call in http.calls] == [
+            "GET",
+            "GET",
+            "GET",
+            "PATCH",
+            "GET",
+            "GET",
+        ]
+
+    def test_delete_invalidates_item(self):
+        http = CountingHttp(PRODUCTS)
+        resource = CachedProductResource(http=http)
+        resource.retrieve(1)
+        resource.destroy(1)
+        resource.retrieve(1)
+        assert [call[0] for call in http.calls] == ["GET", "DELETE", "GET"]
+
+    def test_stats(self):
+        http = CountingHttp(PRODUCTS)
+        resource = CachedProductResource(http=http)
+        initial = resource.get_cache().stats
+        resource.list()
+        resource.list()
+        stats = resource.get_cache().stats
+        assert stats["hits"] - initial["hits"] == 1
+        assert stats["misses"] - initial["misses"] == 1
+        assert stats["entries"] == 1
+
+
+class ConditionalHttp(CountingHttp):
+    """
+    Upstream answering 304 when the request carries the current validators
+    """
+
+    etag = '"v1"'
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+    def request(self, method, url, **kwargs):
+        headers = kwargs.get("headers") or {}
+        self.calls.append((method, url, headers))
+        if headers.get("If-None-Match") == self.etag:
+            return MockedResponse(data="", status_code=304)
+
+        return MockedResponse(
+            data=self.data,
+            headers={"ETag": self.etag, "Last-Modified": self.last_modified},
+        )
+
+
+class RevalidatedProductResource(ProductResource):
+    cache_timeouts = {"list": 0, "get": 0}
+    decoded = 0
+
+    def get_response_data(self, response):
+        RevalidatedProductResource.decoded += 1
+        return super().get_response_data(response)
+
+    def map_response(self, data, action="get", status=200):
+        if action == "list" and status < 400:
+            return {**data, "results": [{"name": "mapped"}]}
+
+        return data
+
+
+class TestConditionalRequests(TestCase):
+    def setUp(self):
+        RevalidatedProductResource().get_cache().clear()
+        RevalidatedProductResource.decoded = 0
+
+    def test_revalidates_stale_entry(self):
+        http = ConditionalHttp(PRODUCTS)
+        first = RevalidatedProductResource(http=http).list()
+        second = RevalidatedProductResource(http=http).list()
+
+        assert len(http.calls) == 2
+        assert "If-None-Match" not in http.calls[0][2]
+        assert http.calls[1][2]["If-None-Match"] == '"v1"'
+        assert http.calls[1][2]["If-Modified-Since"] == ConditionalHttp.last_modified
+        assert http.calls[1][2]["Authorization"] == "Bearer my-awesome-token"
+        assert second.status == 200
+        assert second.data == first.data
+        assert second.data["results"] == [{"name": "mapped"}]
+        assert second.data["count"] == PRODUCTS["count"]
+        assert RevalidatedProductResource.decoded == 1
+        assert RevalidatedProductResource().get_cache().stats["revalidations"] >= 1
+
+    def test_modified_entry_is_replaced(self):
+        http = ConditionalHttp(PRODUCTS["results"][0])
+        RevalidatedProductResource(http=http).retrieve(1)
+        http.etag = '"v2"'
+        http.data = PRODUCTS["results"][1]
+        response = RevalidatedProductResource(http=http).retrieve(1)
+        assert response.data == PRODUCTS["results"][1]
+        assert RevalidatedProductResource.decoded == 2
+
+    def test_no_validators_without_conditional_requests(self):
+        class UnconditionalProductResource(RevalidatedProductResource):
+            conditional_requests = False
+
+        http = ConditionalHttp(PRODUCTS)
+        UnconditionalProductResource(http=http).list()
+        UnconditionalProductResource(http=http).list()
+        assert "If-None-Match" not in http.calls[1][2]
+
+
+class TestDjangoResponseCache(TestCase):
+    def setUp(self):
+        default_cache.clear()
+
+    def test_entries_are_shared(self):
+        entry = CacheEntry(data=[1], status=200, etag='"v1"')
+        DjangoResponseCache().set("key", "http://example.com/", entry, 60)
+        cached = DjangoResponseCache().get("key")
+        assert cached.data == [1]
+        assert cached.etag == '"v1"'
+        assert cached.is_fresh()
+        assert DjangoResponseCache(key_prefix="other").get("key") is None
+
+    def test_expiration(self):
+        cache = DjangoResponseCache()
+        cache.set("a", "http://example.com/", CacheEntry(data="a", status=200), 0.01)
+        entry = CacheEntry(data="b", status=200)
+        cache.set("b", "http://example.com/", entry, 0.01, stale_timeout=60)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+        assert cache.get("b", stale=True).data == "b"
+
+    def test_compression(self):
+        cache = DjangoResponseCache(compress_min_size=0)
+        cache.set("key", "http://example.com/", CacheEntry(data="a", status=200), 60)
+        assert default_cache.get("spook:entry:key")[:1] == b"z"
+        assert cache.get("key").data == "a"
+
+    def test_touch(self):
+        cache = DjangoResponseCache()
+        entry = CacheEntry(data="a", status=200, etag='"v1"')
+        cache.set("key", "http://example.com/", entry, 0.01)
+        time.sleep(0.02)
+        cache.touch("key", 60)
+        assert cache.get("key").data == "a"
+        assert cache.stats["revalidations"] == 1
+
+    def test_invalidate_and_clear(self):
+        cache = DjangoResponseCache()
+        cache.set("a", "http://example.com/", CacheEntry(data="a", status=200), 60)
+        cache.set("b", "http://example.com/1", CacheEntry(data="b", status=200), 60)
+        cache.invalidate("http://example.com/")
+        assert cache.get("a") is None
+        assert cache.get("b").data == "b"
+
+        cache.set("a", "http://example.com/", CacheEntry(data="a", status=200), 60)
+        assert cache.get("a").data == "a"
+        DjangoResponseCache().clear()
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+
+    def test_evicted_versions_are_misses(self):
+        cache = DjangoResponseCache()
+        cache.set("a", "http://example.com/", CacheEntry(data="old", status=200), 60)
+        cache.invalidate("http://example.com/")
+        default_cache.delete("spook:url:http://example.com/")
+        assert cache.get("a") is None
+
+        cache.set("a", "http://example.com/", CacheEntry(data="new", status=200), 60)
+        assert cache.get("a").data == "new"
+        default_cache.delete("spook:generation")
+        assert cache.get("a") is None
+
+    def test_async_resource_cache_runs_in_a_thread(self):
+        threads = []
+
+        class RecordingCache(DjangoResponseCache):
+            def get(self, key, stale=False):
+                threads.append(threading.current_thread())
+                return super().get(key, stale=stale)
+
+        class Resource(AsyncAPIResource):
+            api_url = "http://example.com/api/1.0/products/"
+            cache_timeouts = {"list": 60}
+            cache_class = RecordingCache
+
+        http = MockedAsyncHttp(lambda url, **kwargs: MockedResponse(data=PRODUCTS))
+        assert asyncio.run(Resource(http=http).list()).data == PRODUCTS
+        assert asyncio.run(Resource(http=http).list()).data == PRODUCTS
+        assert len(http.calls) == 1
+        assert threading.current_thread() not in threads
+
+    def test_resource_cache(self):
+        class DjangoCachedProductResource(CachedProductResource):
+            cache_class = DjangoResponseCache
+
+        http = CountingHttp(PRODUCTS)
+        DjangoCachedProductResource(http=http).list()
+        DjangoCachedProductResource(http=http).list()
+        assert len(http.calls) == 1
+
+        DjangoCachedProductResource(http=http).create({"name": "Product"})
+        DjangoCachedProductResource(http=http).list()
+        assert len(http.calls) == 3
+
+
+def wait_for(condition, timeout: float = 2):
+    expires = time.monotonic() + timeout
+    while not condition() and time.monotonic() < expires:
+        time.sleep(0.005)
+
+
+class StaleProductResource(ProductResource):
+    cache_timeouts = {"list": 0.1}
+    cache_stale_while_revalidate = {"list": 60}
+    conditional_requests = False
+
+
+class FallbackProductResource(ProductResource):
+    cache_timeouts = {"list": 0.01}
+    cache_stale_if_error = {"list": 60}
+    conditional_requests = False
+
+
+class TestStaleResponses(TestCase):
+    def setUp(self):
+        StaleProductResource().get_cache().clear()
+        FallbackProductResource().get_cache().clear()
+
+    def test_stale_while_revalidate(self):
+        http = CountingHttp(PRODUCTS)
+        StaleProductResource(http=http).list()
+        time.sleep(0.11)
+        http.data = {**PRODUCTS, "count": 3}
+
+        response = StaleProductResource(http=http).list()
+        assert response.data["count"] == 2
+        wait_for(lambda: len(http.calls) == 2)
+        assert StaleProductResource(http=http).list().data["count"] == 3
+        assert len(http.calls) == 2
+
+    def test_refreshes_are_not_duplicated(self):
+        class SlowHttp(CountingHttp):
+            def request(self, *args, **kwargs):
+                time.sleep(0.05)
+                return super().request(*args, **kwargs)
+
+        http = SlowHttp(PRODUCTS)
+        StaleProductResource(http=http).list()
+        time.sleep(0.11)
+        for _ in range(5):
+            assert StaleProductResource(http=http).list().status == 200
+        wait_for(lambda: len(http.calls) == 2)
+        time.sleep(0.06)
+        assert len(http.calls) == 2
+
+    def test_stale_if_error(self):
+        FallbackProductResource(http=CountingHttp(PRODUCTS)).list()
+        time.sleep(0.02)
+
+        response = FallbackProductResource(http=CountingHttp(status_code=503)).list()
+        assert response.status == 200
+        assert response.data["count"] == 2
+
+        class FailingHttp(CountingHttp):
+            def request(self, *args, **kwargs):
+                raise requests.ConnectionError("Connection refused")
+
+        response = FallbackProductResource(http=FailingHttp()).list()
+        assert response.data["count"] == 2
+
+    def test_errors_without_stale_entry(self):
+        class Resource(FallbackProductResource):
+            cache_stale_if_error = {}
+
+        Resource(http=CountingHttp(PRODUCTS)).list()
+        time.sleep(0.02)
+        assert Resource(http=CountingHttp({}, status_code=503)).list().status == 503
+
+    def test_async_stale_while_revalidate(self):
+        class AsyncStaleProductResource(AsyncAPIResource):
+            api_url = StaleProductResource.api_url
+            cache_timeouts = StaleProductResource.cache_timeouts
+            cache_stale_while_revalidate = {"list": 60}
+
+        data = {"count": 1}
+        http = MockedAsyncHttp(lambda *args, **kwargs: MockedResponse(data=dict(data)))
+
+        async def main():
+            resource = AsyncStaleProductResource(http=http)
+            await resource.list()
+            await asyncio.sleep(0.11)
+            data["count"] = 2
+            stale = await resource.list()
+            await asyncio.sleep(0.01)
+            return stale, await resource.list()
+
+        stale, fresh = asyncio.run(main())
+        assert stale.data["count"] == 1
+        assert fresh.data["count"] == 2
+        assert len(http.calls) == 2
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+from unittest import TestCase
+
+import pytest
+
+from rest_framework.test import APIRequestFactory
+
+from spook.composition import Relation
+from spook.resources import APIResource, AsyncAPIResource
+from spook.tests.mocks import ProductSerializer
+from spook.tests.utils import MockedResponse
+from spook.views import ComposedListView
+
+ORDERS = {
+    "count": 3,
+    "next": None,
+    "previous": None,
+    "results": [
+        {"id": 1, "customer_id": 10, "product_ids": [100, 101]},
+        {"id": 2, "customer_id": 11, "product_ids": [100]},
+        {"id": 3, "customer_id": 10, "product_ids": []},
+    ],
+}
+
+
+class RoutingHttp(object):
+    """
+    Http object answering each url with its data, 404 for unknown urls
+    """
+
+    def __init__(self, routes: dict):
+        self.routes = routes
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls.append((url, kwargs.get("params")))
+        if url not in self.routes:
+            return MockedResponse(data={"detail": "Not found."}, status_code=404)
+        return MockedResponse(data=self.routes[url])
+
+
+HTTP = RoutingHttp({})
+
+
+class RoutedResource(APIResource):
+    def __init__(self, **kwargs):
+        super().__init__(http=HTTP, **kwargs)
+
+
+class CustomerResource(RoutedResource):
+    api_url = "http://customers.example.com/customers"
+
+
+class ProductResource(RoutedResource):
+    api_url = "http://products.example.com/products"
+
+
+class OrderResource(RoutedResource):
+    api_url = "http://orders.example.com/orders"
+    relations = {
+        "customer": Relation(CustomerResource, key="customer_id"),
+        "products": Relation(ProductResource, key="product_ids", many=True),
+    }
+
+
+class TestComposition(TestCase):
+    def setUp(self):
+        HTTP.calls = []
+        HTTP.routes = {
+            "http://orders.example.com/orders": ORDERS,
+            "http://customers.example.com/customers/10": {"id": 10, "name": "Ann"},
+            "http://customers.example.com/customers/11": {"id": 11, "name": "Bob"},
+            "http://products.example.com/products/100": {"id": 100},
+        }
+
+    def get_urls(self) -> list:
+        return sorted(url for url, params in HTTP.calls)
+
+    def test_related_items_are_embedded(self):
+        data = OrderResource().compose(ORDERS)
+        assert data["count"] == 3
+        assert [order["customer"]["name"] for order in data["results"]] == [
+            "Ann",
+            "Bob",
+            "Ann",
+        ]
+        assert data["results"][0]["products"] == [{"id": 100}]
+        assert data["results"][2]["products"] == []
+        assert "customer" not in ORDERS["results"][0]
+
+    def test_references_are_loaded_once(self):
+        OrderResource().compose(ORDERS)
+        assert self.get_urls() == [
+            "http://customers.example.com/customers/10",
+            "http://customers.example.com/customers/11",
+            "http://products.example.com/products/100",
+            "http://products.example.com/products/101",
+        ]
+
+    def test_single_item(self):
+        order = OrderResource().compose(ORDERS["results"][1])
+        assert order["customer"] == {"id": 11, "name": "Bob"}
+
+    def test_missing_items_are_none(self):
+        del HTTP.routes["http://customers.example.com/customers/11"]
+        data = OrderResource().compose(ORDERS["results"])
+        assert data[1]["customer"] is None
+
+    def test_batch_relation(self):
+        class BatchCustomerResource(CustomerResource):
+            batch_retrieve_param = "id__in"
+
+        class Resource(OrderResource):
+            relations = {"customer": Relation(BatchCustomerResource, "customer_id")}
+
+        HTTP.routes["http://customers.example.com/customers"] = {
+            "count": 2,
+            "next": None,
+            "previous": None,
+            "results": [{"id": 10, "name": "Ann"}, {"id": 11, "name": "Bob"}],
+        }
+        data = Resource().compose(ORDERS["results"])
+        assert data[1]["customer"]["name"] == "Bob"
+        assert HTTP.calls == [
+            ("http://customers.example.com/customers", {"id__in": "10,11"})
+        ]
+
+    def test_nested_relations(self):
+        class AddressResource(RoutedResource):
+            api_url = "http://customers.example.com/addresses"
+
+        class NestedCustomerResource(CustomerResource):
+            relations = {"address": Relation(AddressResource, key="address_id")}
+
+        class Resource(OrderResource):
+            relations = {"customer": Relation(NestedCustomerResource, "customer_id")}
+
+        HTTP.routes["http://customers.example.com/customers/10"]["address_id"] = 5
+        HTTP.routes["http://customers.example.com/addresses/5"] = {"city": "Madrid"}
+        data = Resource().compose(ORDERS["results"])
+        assert data[0]["customer"]["address"] == {"city": "Madrid"}
+        assert data[1]["customer"]["address"] is None
+
+    def test_composed_list_view(self):
+        class View(ComposedListView):
+            resource = OrderResource
+            serializer_class = ProductSerializer
+            authentication_classes = []
+            permission_classes = []
+
+            def get_token(self, request):
+                return ""
+
+        response = View.as_view()(APIRequestFactory().get("/orders/"))
+        assert response.status_code == 200
+        assert response.data["results"][0]["customer"]["name"] == "Ann"
+
+
+class AsyncRoutingHttp(object):
+    async def get(self, url, **kwargs):
+        return HTTP.get(url, **kwargs)
+
+
+class AsyncRoutedResource(AsyncAPIResource):
+    def __init__(self, **kwargs):
+        super().__init__(http=AsyncRoutingHttp(), **kwargs)
+
+
+class AsyncCustomerResource(AsyncRoutedResource):
+    api_url = CustomerResource.api_url
+
+
+class AsyncOrderResource(AsyncRoutedResource):
+    api_url = OrderResource.api_url
+    relations = {
+        "customer": Relation(AsyncCustomerResource, key="customer_id"),
+        "products": Relation(ProductResource, key="product_ids", many=True),
+    }
+
+
+class TestAsyncComposition(TestCase):
+    def setUp(self):
+        TestComposition.setUp(self)
+
+    def test_related_items_are_embedded(self):
+        data = asyncio.run(AsyncOrderResource().compose(ORDERS))
+        assert data == OrderResource().compose(ORDERS)
+        assert data["results"][0]["customer"] == {"id": 10, "name": "Ann"}
+        assert data["results"][0]["products"] == [{"id": 100}]
+
+    def test_async_relations_of_sync_resources_are_rejected(self):
+        class Resource(OrderResource):
+            relations = {"customer": Relation(AsyncCustomerResource, key="customer_id")}
+
+        with pytest.raises(TypeError):
+            Resource().compose(ORDERS)
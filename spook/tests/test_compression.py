@@ -0,0 +1,179 @@
+import asyncio
+import gzip
+import json
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+import pytest
+
+from spook.compression import compress, get_accept_encoding, get_wire_size
+from spook.metrics import InMemoryMetricsExporter
+from spook.resources import APIResource, AsyncAPIResource
+from spook.sessions import AsyncClientPool
+from spook.tests.mocks import ProductResource
+from spook.tests.utils import MockedResponse
+
+NAME = "Product " * 50
+
+
+class RecordingHttp(object):
+    """
+    Http object answering every request with the created item, recording the
+    arguments of the calls
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(kwargs)
+        return MockedResponse(data={"id": 1, "name": NAME}, status_code=201)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = json.dumps([{"id": pk, "name": NAME} for pk in range(20)]).encode()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        body = gzip.compress(self.body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestCompression(TestCase):
+    def test_compress(self):
+        assert gzip.decompress(compress(b"spook" * 10, "gzip")) == b"spook" * 10
+        with pytest.raises(ValueError):
+            compress(b"spook", "unknown")
+
+    def test_accept_encoding_skips_unsupported_encodings(self):
+        assert get_accept_encoding(("gzip", "compress", "identity")) == "gzip, identity"
+        assert get_accept_encoding(()) == "identity"
+
+    def test_wire_size(self):
+        assert get_wire_size(MockedResponse(data="abc"), 3) == 3
+        response = MockedResponse(
+            data="abc", headers={"Content-Encoding": "gzip", "Content-Length": "20"}
+        )
+        assert get_wire_size(response, 3) == 20
+
+    def test_request_bodies_are_not_compressed_by_default(self):
+        http = RecordingHttp()
+        ProductResource(http=http).create({"name": NAME})
+        assert http.calls[0]["json"] == {"name": NAME}
+        assert "Content-Encoding" not in http.calls[0]["headers"]
+
+    def test_large_request_bodies_are_compressed(self):
+        exporter = InMemoryMetricsExporter()
+
+        class Resource(ProductResource):
+            request_compression = "gzip"
+            request_compression_threshold = 100
+            metrics_exporters = [exporter]
+
+        http = RecordingHttp()
+        Resource(http=http).update(1, {"name": NAME})
+        Resource(http=http).create({"name": "Small"})
+
+        large, small = http.calls
+        assert json.loads(gzip.decompress(large["data"])) == {"name": NAME}
+        assert large["headers"]["Content-Encoding"] == "gzip"
+        assert large["headers"]["Content-Type"] == "application/json"
+        assert large["headers"]["Authorization"] == "Bearer my-awesome-token"
+        assert json.loads(small["data"]) == {"name": "Small"}
+        assert "Content-Encoding" not in small["headers"]
+
+        labels = ("Resource", "update", "sent")
+        assert exporter.body_bytes.get(labels) == len(json.dumps({"name": NAME}))
+        assert exporter.wire_bytes.get(labels) == len(large["data"])
+
+    def test_accept_encoding_header(self):
+        class Resource(ProductResource):
+            accept_encoding = ("gzip",)
+
+        resource = Resource(http=RecordingHttp())
+        assert resource.get_request_headers()["Accept-Encoding"] == "gzip"
+        assert "Accept-Encoding" not in resource.headers
+        assert "Accept-Encoding" not in ProductResource().get_request_headers()
+
+    def test_compressed_responses_are_measured(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        exporter = InMemoryMetricsExporter()
+        host, port = server.server_address
+
+        class Resource(APIResource):
+            api_url = f"http://{host}:{port}/products"
+            accept_encoding = ("gzip",)
+            metrics_exporters = [exporter]
+
+        try:
+            resource = Resource()
+            assert len(resource.get(resource.get_url()).data) == 20
+            chunks = list(resource.iter_stream(resource.get_stream(resource.get_url())))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        size = len(GzipHandler.body)
+        wire_size = len(gzip.compress(GzipHandler.body))
+        assert b"".join(chunks) == GzipHandler.body
+        assert exporter.body_bytes.get(("Resource", "get", "received")) == size * 2
+        assert exporter.wire_bytes.get(("Resource", "get", "received")) == wire_size * 2
+
+    def test_async_compressed_write(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+        class Resource(AsyncAPIResource):
+            api_url = f"http://{host}:{port}/products"
+            request_compression = "gzip"
+            request_compression_threshold = 100
+            validator = ProductResource.validator
+
+        async def create():
+            pool = AsyncClientPool()
+            try:
+                return await Resource(http=pool).create({"name": NAME})
+            finally:
+                await pool.aclose()
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", DeprecationWarning)
+                response = asyncio.run(create())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert response.status == 201
+        assert response.data == {"name": NAME}
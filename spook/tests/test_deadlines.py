@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+import pytest
+import requests
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from spook.deadlines import deadline, get_remaining_time
+from spook.exceptions import APIResourceDeadlineException
+from spook.resources import APIResource, AsyncAPIResource
+from spook.tests.mocks import ProductSerializer
+from spook.tests.utils import MockedResponse
+from spook.views import APIResourceListView, AsyncAPIResourceListView
+
+
+class RecordingHttp(object):
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.timeouts = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.timeouts.append(kwargs.get("timeout"))
+        time.sleep(self.delay)
+        return MockedResponse(data={"id": 1})
+
+
+class AsyncRecordingHttp(RecordingHttp):
+    async def get(self, url, **kwargs):
+        self.timeouts.append(kwargs.get("timeout"))
+        await asyncio.sleep(self.delay)
+        return MockedResponse(data={"id": 1})
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request after a second
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(1)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"[]")
+        except OSError:
+            pass
+
+
+class TimedResource(APIResource):
+    api_url = "http://deadlines.example.com/products/"
+    pagination_class = None
+    connect_timeout = 2
+    read_timeout = 10
+    timeouts = {"list": (1, 60), "delete": 3}
+
+
+class TestTimeouts(TestCase):
+    def test_timeouts_per_action(self):
+        resource = TimedResource()
+        assert resource.get_timeout("get") == (2, 10)
+        assert resource.get_timeout("list") == (1, 60)
+        assert resource.get_timeout("delete") == (3, 3)
+
+    def test_timeouts_are_sent(self):
+        http = RecordingHttp()
+        TimedResource(http=http).retrieve(1)
+        TimedResource(http=http).list()
+        assert http.timeouts == [(2, 10), (1, 60)]
+
+    def test_no_timeouts(self):
+        class Resource(TimedResource):
+            connect_timeout = None
+            read_timeout = None
+
+        http = RecordingHttp()
+        Resource(http=http).retrieve(1)
+        assert http.timeouts == [None]
+
+
+class TestDeadlines(TestCase):
+    def test_nested_deadlines_only_shorten(self):
+        assert get_remaining_time() is None
+        with deadline(1):
+            with deadline(60):
+                assert get_remaining_time() <= 1
+            with deadline(0.5):
+                assert get_remaining_time() <= 0.5
+        assert get_remaining_time() is None
+
+    def test_timeouts_are_bounded_by_the_deadline(self):
+        http = RecordingHttp()
+        with deadline(0.5):
+            TimedResource(http=http).retrieve(1)
+        connect, read = http.timeouts[0]
+        assert 0 < connect <= 0.5
+        assert 0 < read <= 0.5
+
+    def test_exceeded_deadline_fails_fast(self):
+        http = RecordingHttp()
+        with deadline(0):
+            with pytest.raises(APIResourceDeadlineException):
+                TimedResource(http=http).retrieve(1)
+        assert http.timeouts == []
+
+    def test_deadline_is_propagated_to_thread_pools(self):
+        http = RecordingHttp()
+        with deadline(0.5):
+            TimedResource(http=http).retrieve_many([1, 2, 3], concurrency=3)
+        assert len(http.timeouts) == 3
+        assert all(read <= 0.5 for connect, read in http.timeouts)
+
+    @patch("spook.resources.time.sleep")
+    def test_retries_stop_at_the_deadline(self, sleep):
+        class Resource(TimedResource):
+            max_retries = 3
+            retry_backoff_factor = 10
+
+        class FailingHttp(object):
+            calls = 0
+
+            def get(self, url, **kwargs):
+                FailingHttp.calls += 1
+                raise requests.ConnectionError()
+
+        with deadline(1):
+            with pytest.raises(requests.ConnectionError):
+                Resource(http=FailingHttp()).retrieve(1)
+        assert FailingHttp.calls <= 2
+
+    def test_async_requests_are_cancelled(self):
+        class Resource(AsyncAPIResource):
+            api_url = TimedResource.api_url
+
+        http = AsyncRecordingHttp(delay=1)
+
+        async def run():
+            with deadline(0.05):
+                await Resource(http=http).retrieve(1)
+
+        started = time.monotonic()
+        with pytest.raises(APIResourceDeadlineException):
+            asyncio.run(run())
+        assert time.monotonic() - started < 0.5
+
+
+class TestViewDeadlines(APITestCase):
+    def get_view(self, base, resource):
+        class View(base):
+            serializer_class = ProductSerializer
+            authentication_classes = []
+            permission_classes = []
+            deadline = 0
+
+            def get_token(self, request):
+                return ""
+
+        View.resource = resource
+        return View.as_view()
+
+    def test_exceeded_deadline_is_a_gateway_timeout(self):
+        view = self.get_view(APIResourceListView, TimedResource)
+        response = view(APIRequestFactory().get("/products/"))
+        assert response.status_code == 504
+
+    def test_async_exceeded_deadline_is_a_gateway_timeout(self):
+        class Resource(AsyncAPIResource):
+            api_url = TimedResource.api_url
+            pagination_class = None
+
+        view = self.get_view(AsyncAPIResourceListView, Resource)
+        response = asyncio.run(view(APIRequestFactory().get("/products/")))
+        assert response.status_code == 504
+
+    def test_deadline_expiring_during_the_request_is_a_gateway_timeout(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+        class Resource(APIResource):
+            api_url = f"http://{host}:{port}/products/"
+            pagination_class = None
+
+        view = self.get_view(APIResourceListView, Resource)
+        view.view_class.deadline = 0.2
+        try:
+            started = time.monotonic()
+            response = view(APIRequestFactory().get("/products/"))
+            assert time.monotonic() - started < 1
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert response.status_code == 504
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+import pytest
+
+from spook.deadlines import deadline
+from spook.exceptions import APIResourceLimitException
+from spook.limiters import UpstreamLimiter, get_limiters
+from spook.profiling import profile_request
+from spook.resources import APIResource, AsyncAPIResource
+from spook.tests.utils import CountingHttp, MockedResponse
+
+
+class BlockingHttp(CountingHttp):
+    """
+    Http object holding every request until it is released
+    """
+
+    def __init__(self, data=None):
+        super().__init__(data=data)
+        self.started = threading.Semaphore(0)
+        self.released = threading.Event()
+
+    def request(self, method, url, **kwargs):
+        self.started.release()
+        self.released.wait(5)
+        return super().request(method, url, **kwargs)
+
+
+class TestUpstreamLimiter(TestCase):
+    def test_token_bucket(self):
+        limiter = UpstreamLimiter(rate=10, burst=2)
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == 0
+        assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+        with pytest.raises(APIResourceLimitException):
+            limiter.reserve(timeout=0)
+        assert limiter.stats["rejected"] == 1
+
+    def test_rate_is_enforced(self):
+        limiter = UpstreamLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(4):
+            with limiter.limit():
+                pass
+        assert time.monotonic() - started >= 0.05
+        assert limiter.stats["acquired"] == 4
+        assert limiter.stats["max_wait_seconds"] > 0
+
+    def test_max_in_flight_fails_fast(self):
+        limiter = UpstreamLimiter(max_in_flight=1)
+        with limiter.limit(timeout=0):
+            assert limiter.stats["in_flight"] == 1
+            with pytest.raises(APIResourceLimitException):
+                with limiter.limit(timeout=0):
+                    pass
+        assert limiter.stats["in_flight"] == 0
+
+    def test_rejected_callers_give_back_their_token(self):
+        limiter = UpstreamLimiter(rate=0.01, burst=2, max_in_flight=1)
+        with limiter.limit(timeout=0):
+            for _ in range(3):
+                with pytest.raises(APIResourceLimitException):
+                    with limiter.limit(timeout=0):
+                        pass
+        with limiter.limit(timeout=0):
+            pass
+        assert limiter.stats["rejected"] == 3
+
+    def test_waiters_get_the_released_slot(self):
+        limiter = UpstreamLimiter(max_in_flight=1)
+        order = []
+
+        def worker(name):
+            with limiter.limit(timeout=5):
+                order.append(name)
+
+        with limiter.limit():
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+            for queued, thread in enumerate(threads, 1):
+                thread.start()
+                while limiter.stats["queued"] < queued:
+                    time.sleep(0.001)
+            assert limiter.stats["queued"] == 3
+        for thread in threads:
+            thread.join()
+
+        assert order == [0, 1, 2]
+        assert limiter.stats["in_flight"] == 0
+        assert limiter.stats["queued"] == 0
+
+    def test_bounded_wait(self):
+        limiter = UpstreamLimiter(max_in_flight=1)
+        with limiter.limit():
+            started = time.monotonic()
+            with pytest.raises(APIResourceLimitException):
+                with limiter.limit(timeout=0.05):
+                    pass
+            assert time.monotonic() - started >= 0.05
+        with limiter.limit(timeout=0):
+            pass
+
+    def test_async_waiters(self):
+        limiter = UpstreamLimiter(max_in_flight=2)
+        running = []
+        peak = []
+
+        async def worker():
+            async with limiter.limit_async(timeout=5):
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        async def main():
+            await asyncio.gather(*(worker() for _ in range(6)))
+
+        asyncio.run(main())
+        assert max(peak) == 2
+        assert limiter.stats["acquired"] == 6
+        assert limiter.stats["in_flight"] == 0
+
+    def test_thread_releases_async_waiter(self):
+        limiter = UpstreamLimiter(max_in_flight=1)
+        limiter.acquire_slot()
+        threading.Timer(0.02, limiter.release).start()
+
+        async def main():
+            async with limiter.limit_async(timeout=5) as waited:
+                return waited
+
+        assert asyncio.run(main()) >= 0.02
+        assert limiter.stats["in_flight"] == 0
+
+
+class TestResourceLimits(TestCase):
+    def test_limiter_is_shared_per_host(self):
+        class ProductResource(APIResource):
+            api_url = "http://limited-host.example.com/products"
+            max_in_flight = 4
+
+        class ShopResource(APIResource):
+            api_url = "http://limited-host.example.com/shops"
+            max_in_flight = 4
+
+        limiter = ProductResource().get_limiter()
+        assert ShopResource().get_limiter() is limiter
+        assert get_limiters()["limited-host.example.com"] is limiter
+
+    def test_no_limiter_by_default(self):
+        class Resource(APIResource):
+            api_url = "http://unlimited.example.com/products"
+
+        assert Resource().get_limiter() is None
+
+    def test_max_in_flight_fails_fast(self):
+        http = BlockingHttp(data={"id": 1})
+
+        class Resource(APIResource):
+            api_url = "http://bulkhead.example.com/products"
+            max_in_flight = 1
+            limit_max_wait = 0
+
+        thread = threading.Thread(target=Resource(http=http).retrieve, args=(1,))
+        thread.start()
+        http.started.acquire(timeout=5)
+        try:
+            with pytest.raises(APIResourceLimitException):
+                Resource(http=http).retrieve(1)
+        finally:
+            http.released.set()
+            thread.join()
+
+        assert len(http.calls) == 1
+        assert Resource(http=http).retrieve(1).status == 200
+
+    def test_wait_is_bounded_by_the_deadline(self):
+        class Resource(APIResource):
+            api_url = "http://deadline-limited.example.com/products"
+            rate_limit = 1
+
+        resource = Resource(http=CountingHttp(data={"id": 1}))
+        resource.retrieve(1)
+        with deadline(0.1):
+            with pytest.raises(APIResourceLimitException):
+                resource.retrieve(1)
+
+    def test_queue_stage_is_recorded(self):
+        class Resource(APIResource):
+            api_url = "http://queue-stage.example.com/products"
+            rate_limit = 100
+
+        with profile_request() as profile:
+            Resource(http=CountingHttp(data={"id": 1})).retrieve(1)
+        assert "queue" in profile.stages
+
+    def test_network_stage_excludes_the_queue(self):
+        class Resource(APIResource):
+            api_url = "http://network-stage.example.com/products"
+            rate_limit = 10
+            rate_limit_burst = 1
+
+        resource = Resource(http=CountingHttp(data={"id": 1}))
+        resource.retrieve(1)
+        with profile_request() as profile:
+            resource.retrieve(1)
+        assert profile.stages["queue"] >= 0.05
+        assert profile.stages["network"] < 0.05
+
+    def test_async_resource(self):
+        class MockedAsyncHttp(object):
+            def __init__(self):
+                self.running = 0
+                self.peak = 0
+
+            async def get(self, url, **kwargs):
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+                await asyncio.sleep(0.01)
+                self.running -= 1
+                return MockedResponse(data={"id": 1})
+
+        class Resource(AsyncAPIResource):
+            api_url = "http://async-bulkhead.example.com/products"
+            max_in_flight = 2
+
+        http = MockedAsyncHttp()
+
+        async def main():
+            resource = Resource(http=http)
+            return await asyncio.gather(*(resource.retrieve(pk) for pk in range(5)))
+
+        responses = asyncio.run(main())
+        assert [response.status for response in responses] == [200] * 5
+        assert http.peak == 2
@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+import pytest
+import requests
+from rest_framework.test import APIRequestFactory
+
+from spook.metrics import (
+    Counter,
+    Histogram,
+    InMemoryMetricsExporter,
+    PrometheusMetricsExporter,
+)
+from spook.tests.mocks import ProductResource, PRODUCTS
+from spook.tests.utils import CountingHttp
+from spook.views import metrics_view
+
+
+class FailingHttp(object):
+    def get(self, url, **kwargs):
+        raise requests.ConnectionError()
+
+
+class TestMetrics(TestCase):
+    def test_counter(self):
+        counter = Counter("requests_total", "Requests.", ("status",))
+        counter.inc(("200",))
+        counter.inc(("200",))
+        counter.inc(("500",))
+        assert counter.collect() == {("200",): 2, ("500",): 1}
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Latency.", ("action",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(("get",), value)
+        counts, total, count = histogram.collect()[("get",)]
+        assert counts == [2, 3, 4]
+        assert total == pytest.approx(2.65)
+        assert count == 4
+
+    def test_resource_requests_are_recorded(self):
+        exporter = InMemoryMetricsExporter()
+
+        class Resource(ProductResource):
+            metrics_exporters = [exporter]
+
+        Resource(http=CountingHttp(data=PRODUCTS)).list()
+        Resource(http=CountingHttp(status_code=404)).retrieve(1)
+        assert exporter.requests.collect() == {
+            ("Resource", "list", "200"): 1,
+            ("Resource", "get", "404"): 1,
+        }
+        assert exporter.request_seconds.get_count(("Resource", "list", "200")) == 1
+        stages = exporter.stage_seconds.collect()
+        assert ("Resource", "list", "network") in stages
+        assert ("Resource", "list", "decode") in stages
+        assert ("Resource", "list", "map") in stages
+        assert ("Resource", "list", "paginate") in stages
+
+    def test_errors_are_recorded(self):
+        exporter = InMemoryMetricsExporter()
+
+        class Resource(ProductResource):
+            metrics_exporters = [exporter]
+
+        with pytest.raises(requests.ConnectionError):
+            Resource(http=FailingHttp()).retrieve(1)
+        assert exporter.requests.get(("Resource", "get", "error")) == 1
+
+    def test_prometheus_format(self):
+        exporter = PrometheusMetricsExporter()
+        exporter.record_request("ProductResource", "get", "200", 0.2)
+        exporter.record_response_size("ProductResource", "get", 512)
+        text = exporter.render()
+        assert "# TYPE spook_upstream_requests_total counter" in text
+        assert (
+            'spook_upstream_requests_total{resource="ProductResource",action="get",'
+            'status="200"} 1'
+        ) in text
+        assert (
+            'spook_upstream_request_duration_seconds_bucket{resource="ProductResource",'
+            'action="get",status="200",le="0.25"} 1'
+        ) in text
+        assert (
+            'spook_upstream_response_size_bytes_count{resource="ProductResource",'
+            'action="get"} 1'
+        ) in text
+
+    def test_metrics_view(self):
+        response = metrics_view(APIRequestFactory().get("/metrics"))
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert b"# TYPE spook_upstream_requests_total counter" in response.content
@@ -0,0 +1,475 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from urllib.parse import parse_qs, parse_qsl, urlsplit
+
+import pytest
+
+from spook.exceptions import APIResourcePageException
+from spook.pagination import (
+    BasePagination,
+    CursorPagination,
+    DefaultPagination,
+    LinkHeaderPagination,
+    OffsetLimitPagination,
+    PageNumberPagination,
+)
+from spook.resources import AsyncAPIResource
+from spook.tests.mocks import ProductResource
+from spook.tests.utils import PagedHttp, MockedResponse
+
+ITEMS = [{"id": i, "name": f"Product {i}"} for i in range(1, 24)]
+
+
+class ItemsPagination(BasePagination):
+    def get_next(self) -> str:
+        return self.data["meta"]["next"]
+
+    def get_previous(self) -> str:
+        return None
+
+    def get_count(self) -> int:
+        return len(self.data["items"])
+
+    def get_results(self) -> list:
+        return self.data["items"]
+
+
+class CursorHttp(object):
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append(url)
+        if url.endswith("cursor=b"):
+            return MockedResponse(data={"items": [3], "meta": {"next": None}})
+
+        return MockedResponse(data={"items": [1, 2], "meta": {"next": "?cursor=b"}})
+
+
+class OffsetHttp(object):
+    """
+    Http object serving a list of items by offset and limit, as Django Rest
+    Framework's LimitOffsetPagination does
+    """
+
+    def __init__(self, items: list, count: bool = True):
+        self.items = items
+        self.count = count
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append(params)
+        offset, limit = int(params["offset"]), int(params["limit"])
+        end = offset + limit
+        data = {
+            "next": (
+                f"{url}?limit={limit}&offset={end}" if end < len(self.items) else None
+            ),
+            "previous": None,
+            "results": self.items[offset:end],
+        }
+        if self.count:
+            data["count"] = len(self.items)
+        return MockedResponse(data=data)
+
+
+class CursorPagesHttp(object):
+    """
+    Http object serving a list of items in pages linked by cursors, in the body
+    or in the Link header
+    """
+
+    def __init__(self, items: list, page_size: int, link_header: bool = False):
+        self.items = items
+        self.page_size = page_size
+        self.link_header = link_header
+        self.calls = []
+
+    def get_link(self, url: str, page: int) -> str:
+        return f"{url.split('?')[0]}?cursor={page}"
+
+    def get(self, url, params=None, **kwargs):
+        self.calls.append((url, params))
+        page = int(dict(parse_qsl(urlsplit(url).query)).get("cursor", 0))
+        start = page * self.page_size
+        end = start + self.page_size
+        results = self.items[start:end]
+        next_url = self.get_link(url, page + 1) if end < len(self.items) else None
+        previous_url = self.get_link(url, page - 1) if page else None
+        if not self.link_header:
+            data = {"next": next_url, "previous": previous_url, "results": results}
+            return MockedResponse(data=data)
+
+        links = [f'<{next_url}>; rel="next"'] if next_url else []
+        links += [f'<{previous_url}>; rel="prev"'] if previous_url else []
+        headers = {"Link": ", ".join(links), "X-Total-Count": str(len(self.items))}
+        return MockedResponse(data=results, headers=headers)
+
+
+class TestIterPages(TestCase):
+    def test_iter_all(self):
+        http = PagedHttp(ITEMS, page_size=10)
+        items = ProductResource(http=http).iter_all()
+        assert http.calls == []
+        assert list(items) == ITEMS
+        assert [call.get("page") for call in http.calls] == [None, "2", "3"]
+
+    def test_iter_pages(self):
+        http = PagedHttp(ITEMS, page_size=10)
+        pages = list(ProductResource(http=http).iter_pages(search="product"))
+        assert [len(page.get_results()) for page in pages] == [10, 10, 3]
+        assert pages[0].get_count() == len(ITEMS)
+        assert http.calls[0] == {"search": "product"}
+
+    def test_max_pages(self):
+        http = PagedHttp(ITEMS, page_size=10)
+        items = list(ProductResource(http=http).iter_all(max_pages=2))
+        assert items == ITEMS[:20]
+        assert len(http.calls) == 2
+
+    def test_max_items_stops_fetching(self):
+        http = PagedHttp(ITEMS, page_size=10)
+        items = list(ProductResource(http=http).iter_all(max_items=10))
+        assert items == ITEMS[:10]
+        assert len(http.calls) == 1
+
+    def test_items_are_yielded_lazily(self):
+        http = PagedHttp(ITEMS, page_size=10)
+        items = ProductResource(http=http).iter_all()
+        assert next(items) == ITEMS[0]
+        assert len(http.calls) == 1
+        items.close()
+
+    def test_custom_pagination(self):
+        class CursorResource(ProductResource):
+            pagination_class = ItemsPagination
+
+        http = CursorHttp()
+        assert list(CursorResource(http=http).iter_all()) == [1, 2, 3]
+        assert http.calls[1] == "http://example.com/api/1.0/products/?cursor=b"
+
+    def test_failing_page(self):
+        http = PagedHttp(ITEMS, page_size=10, failing_pages=(2,))
+        with pytest.raises(APIResourcePageException) as e:
+            list(ProductResource(http=http).iter_all())
+        assert e.value.status == 500
+        assert e.value.url.endswith("?page=2")
+
+    def test_async_iter_all(self):
+        class AsyncPagedHttp(PagedHttp):
+            async def get(self, url, params=None, **kwargs):
+                return super().get(url, params=params, **kwargs)
+
+        class AsyncProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+
+        async def collect():
+            resource = AsyncProductResource(http=AsyncPagedHttp(ITEMS, page_size=10))
+            return [item async for item in resource.iter_all(max_items=15)]
+
+        assert asyncio.run(collect()) == ITEMS[:15]
+
+
+class SlowPagedHttp(PagedHttp):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        try:
+            return super().get(url, params=params, **kwargs)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestPrefetchPages(TestCase):
+    def test_remaining_page_urls(self):
+        page = DefaultPagination(
+            data={
+                "count": 23,
+                "next": "http://example.com/products/?page=2&search=a",
+                "results": list(range(10)),
+            }
+        )
+        assert page.get_remaining_page_urls() == [
+            "http://example.com/products/?page=2&search=a",
+            "http://example.com/products/?page=3&search=a",
+        ]
+
+    def test_remaining_page_urls_keep_repeated_params(self):
+        page = DefaultPagination(
+            data={
+                "count": 23,
+                "next": "http://example.com/products/?tag=a&page=2&tag=b",
+                "results": list(range(10)),
+            }
+        )
+        assert page.get_remaining_page_urls() == [
+            "http://example.com/products/?tag=a&page=2&tag=b",
+            "http://example.com/products/?tag=a&page=3&tag=b",
+        ]
+
+    def test_remaining_limit_offset_urls(self):
+        page = DefaultPagination(
+            data={
+                "count": 25,
+                "next": "http://example.com/products/?limit=10&offset=10",
+                "results": list(range(10)),
+            }
+        )
+        assert page.get_remaining_page_urls() == [
+            "http://example.com/products/?limit=10&offset=10",
+            "http://example.com/products/?limit=10&offset=20",
+        ]
+
+    def test_unknown_remaining_urls(self):
+        page = DefaultPagination(
+            data={"next": "http://example.com/products/?cursor=abc", "results": [1]}
+        )
+        assert page.get_remaining_page_urls() is None
+        assert DefaultPagination(data={"next": None}).get_remaining_page_urls() == []
+
+    def test_fetch_all_in_order(self):
+        http = SlowPagedHttp(ITEMS, page_size=2)
+        items = ProductResource(http=http).fetch_all(concurrency=4)
+        assert items == ITEMS
+        assert len(http.calls) == 12
+        assert 1 < http.max_in_flight <= 4
+
+    def test_fetch_all_max_pages(self):
+        http = PagedHttp(ITEMS, page_size=5)
+        items = ProductResource(http=http).fetch_all(max_pages=3)
+        assert items == ITEMS[:15]
+        assert len(http.calls) == 3
+
+    def test_fetch_all_failing_page(self):
+        http = PagedHttp(ITEMS, page_size=2, failing_pages=(5,))
+        with pytest.raises(APIResourcePageException) as e:
+            ProductResource(http=http).fetch_all(concurrency=3)
+        assert e.value.status == 500
+        assert e.value.url.endswith("?page=5")
+
+    def test_fetch_all_network_error(self):
+        class BrokenPagedHttp(PagedHttp):
+            def get(self, url, params=None, **kwargs):
+                if "page=3" in url:
+                    raise ConnectionError("Connection reset by peer")
+                return super().get(url, params=params, **kwargs)
+
+        http = BrokenPagedHttp(ITEMS, page_size=5)
+        with pytest.raises(APIResourcePageException) as e:
+            ProductResource(http=http).fetch_all()
+        assert e.value.status is None
+        assert isinstance(e.value.__cause__, ConnectionError)
+
+    def test_fetch_all_sequential_fallback(self):
+        class CursorResource(ProductResource):
+            pagination_class = ItemsPagination
+
+        assert CursorResource(http=CursorHttp()).fetch_all() == [1, 2, 3]
+
+    def test_async_fetch_all(self):
+        class AsyncPagedHttp(PagedHttp):
+            async def get(self, url, params=None, **kwargs):
+                await asyncio.sleep(0.01)
+                return super().get(url, params=params, **kwargs)
+
+        class AsyncProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+
+        http = AsyncPagedHttp(ITEMS, page_size=3)
+        items = asyncio.run(AsyncProductResource(http=http).fetch_all(concurrency=3))
+        assert items == ITEMS
+        assert len(http.calls) == 8
+
+
+def get_query(link: str) -> dict:
+    return {key: values[0] for key, values in parse_qs(urlsplit(link).query).items()}
+
+
+class TestRechunkedPagination(TestCase):
+    def test_page_number(self):
+        class Pagination(PageNumberPagination):
+            upstream_page_size = 10
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        http = PagedHttp(ITEMS, page_size=10)
+        data = Resource(http=http).list(page_size="15", search="product").data
+        assert data["results"] == ITEMS[:15]
+        assert data["count"] == len(ITEMS)
+        assert data["previous"] is None
+        assert get_query(data["next"]) == {
+            "page": "2",
+            "page_size": "15",
+            "search": "product",
+        }
+        assert http.calls == [
+            {"page": 1, "search": "product"},
+            {"page": 2, "search": "product"},
+        ]
+
+        http.calls = []
+        data = Resource(http=http).list(**get_query(data["next"])).data
+        assert data["results"] == ITEMS[15:]
+        assert data["next"] is None
+        assert get_query(data["previous"])["page"] == "1"
+        assert http.calls == [{"page": 3, "search": "product"}]
+
+    def test_smaller_client_pages(self):
+        class Pagination(PageNumberPagination):
+            upstream_page_size = 10
+            upstream_page_size_query_param = "page_size"
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        http = PagedHttp(ITEMS, page_size=10)
+        data = Resource(http=http).list(page="3", page_size="4").data
+        assert data["results"] == ITEMS[8:12]
+        assert http.calls == [
+            {"page": 1, "page_size": 10},
+            {"page": 2, "page_size": 10},
+        ]
+
+    def test_page_out_of_range(self):
+        class Pagination(PageNumberPagination):
+            upstream_page_size = 10
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        resource = Resource(http=PagedHttp(ITEMS, page_size=10))
+        assert resource.list(page="4", page_size="10").status == 404
+        assert resource.list(page="0").status == 400
+        assert resource.list(page_size="many").status == 400
+
+    def test_offset_limit(self):
+        class Pagination(OffsetLimitPagination):
+            upstream_page_size = 5
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        http = OffsetHttp(ITEMS)
+        data = Resource(http=http).list(offset="5", limit="12").data
+        assert data["results"] == ITEMS[5:17]
+        assert get_query(data["next"]) == {"offset": "17", "limit": "12"}
+        assert get_query(data["previous"]) == {"offset": "0", "limit": "12"}
+        assert http.calls == [
+            {"offset": 5, "limit": 5},
+            {"offset": 10, "limit": 5},
+            {"offset": 15, "limit": 2},
+        ]
+
+        data = Resource(http=http).list(offset="20", limit="12").data
+        assert data["results"] == ITEMS[20:]
+        assert data["next"] is None
+
+    def test_offset_limit_without_count(self):
+        class Pagination(OffsetLimitPagination):
+            upstream_page_size = 5
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        http = OffsetHttp(ITEMS, count=False)
+        data = Resource(http=http).list(offset="5", limit="12").data
+        assert data["results"] == ITEMS[5:17]
+        assert data["count"] is None
+        assert get_query(data["next"]) == {"offset": "17", "limit": "12"}
+        assert len(http.calls) == 3
+
+        http.calls = []
+        data = Resource(http=http).list(offset="15", limit="12").data
+        assert data["results"] == ITEMS[15:]
+        assert data["next"] is None
+        assert http.calls == [
+            {"offset": 15, "limit": 5},
+            {"offset": 20, "limit": 5},
+        ]
+
+    def test_cursor(self):
+        class Pagination(CursorPagination):
+            pass
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        http = CursorPagesHttp(ITEMS, page_size=10)
+        data = Resource(http=http).list(page_size="15").data
+        assert data["results"] == ITEMS[:15]
+        assert data["count"] is None
+        assert data["previous"] is None
+        assert len(http.calls) == 2
+
+        http.calls = []
+        data = Resource(http=http).list(**get_query(data["next"])).data
+        assert data["results"] == ITEMS[15:]
+        assert data["next"] is None
+        assert [url for url, params in http.calls] == [
+            "http://example.com/api/1.0/products/?cursor=2"
+        ]
+
+        data = Resource(http=http).list(**get_query(data["previous"])).data
+        assert data["results"] == ITEMS[:15]
+        assert data["previous"] is None
+        assert Resource(http=http).list(**get_query(data["next"])).data["results"] == (
+            ITEMS[15:]
+        )
+
+    def test_cursor_keeps_the_upstream_host(self):
+        class Resource(ProductResource):
+            pagination_class = CursorPagination
+
+        cursor = CursorPagination().encode_cursor("http://evil.com/?cursor=1", 0, False)
+        http = CursorPagesHttp(ITEMS, page_size=10)
+        Resource(http=http).list(cursor=cursor)
+        assert http.calls[0][0] == "http://example.com/?cursor=1"
+        assert Resource(http=http).list(cursor="invalid").status == 400
+
+    def test_link_header(self):
+        class Pagination(LinkHeaderPagination):
+            pass
+
+        class Resource(ProductResource):
+            pagination_class = Pagination
+
+        http = CursorPagesHttp(ITEMS, page_size=5, link_header=True)
+        data = Resource(http=http).list(page_size="12").data
+        assert data["results"] == ITEMS[:12]
+        assert data["count"] == len(ITEMS)
+        assert len(http.calls) == 3
+
+        data = Resource(http=http).list(**get_query(data["next"])).data
+        assert data["results"] == ITEMS[12:]
+        assert len(http.calls) == 5
+
+    def test_async_page_number(self):
+        class AsyncPagedHttp(PagedHttp):
+            async def get(self, url, params=None, **kwargs):
+                return super().get(url, params=params, **kwargs)
+
+        class Pagination(PageNumberPagination):
+            upstream_page_size = 5
+
+        class AsyncProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+            pagination_class = Pagination
+
+        http = AsyncPagedHttp(ITEMS, page_size=5)
+        resource = AsyncProductResource(http=http)
+        data = asyncio.run(resource.list(page="2", page_size="12")).data
+        assert data["results"] == ITEMS[12:]
+        assert len(http.calls) == 3
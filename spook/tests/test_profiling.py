@@ -0,0 +1,108 @@
+import asyncio
+from unittest import TestCase
+
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from spook.profiling import get_current_profile, profile_request
+from spook.tests.mocks import (
+    AsyncProductResource,
+    ProductResource,
+    ProductSerializer,
+    PRODUCTS,
+)
+from spook.tests.utils import CountingHttp, MockedAsyncHttp, MockedResponse
+from spook.views import APIResourceListView, AsyncAPIResourceListView
+
+
+def http_resource(base, http):
+    class Resource(base):
+        def __init__(self, **kwargs):
+            super().__init__(http=http, **kwargs)
+
+    return Resource
+
+
+class TestProfiling(TestCase):
+    def test_resource_stages_are_profiled(self):
+        resource = ProductResource(http=CountingHttp(data=PRODUCTS))
+        with profile_request() as profile:
+            assert get_current_profile() is profile
+            resource.list()
+
+        assert get_current_profile() is None
+        assert {"headers", "network", "decode", "map", "paginate"} <= set(
+            profile.stages
+        )
+        assert profile.get_server_timing().endswith(
+            f"total;dur={profile.duration * 1000:.1f}"
+        )
+
+    def test_slow_callback(self):
+        slow = []
+        with profile_request(threshold=0, callback=slow.append) as profile:
+            pass
+        with profile_request(threshold=60, callback=slow.append):
+            pass
+        assert slow == [profile]
+
+
+class TestServerTiming(APITestCase):
+    def get_view(self, base, resource, **attrs):
+        class View(base):
+            serializer_class = ProductSerializer
+            authentication_classes = []
+            permission_classes = []
+
+            def get_token(self, request):
+                return ""
+
+        View.resource = resource
+        for name, value in attrs.items():
+            setattr(View, name, value)
+        return View.as_view()
+
+    def test_server_timing_header(self):
+        resource = http_resource(ProductResource, CountingHttp(data=PRODUCTS))
+        view = self.get_view(APIResourceListView, resource, server_timing=True)
+        response = view(APIRequestFactory().get("/products/"))
+        assert response.status_code == 200
+        stages = [
+            metric.split(";")[0] for metric in response["Server-Timing"].split(", ")
+        ]
+        assert stages == [
+            "headers",
+            "network",
+            "decode",
+            "map",
+            "paginate",
+            "render",
+            "total",
+        ]
+
+    def test_no_server_timing_by_default(self):
+        resource = http_resource(ProductResource, CountingHttp(data=PRODUCTS))
+        response = self.get_view(APIResourceListView, resource)(
+            APIRequestFactory().get("/products/")
+        )
+        assert not response.has_header("Server-Timing")
+
+    def test_slow_request_hook(self):
+        slow = []
+        resource = http_resource(ProductResource, CountingHttp(data=PRODUCTS))
+        view = self.get_view(
+            APIResourceListView,
+            resource,
+            slow_request_threshold=0,
+            on_slow_request=lambda self, request, profile: slow.append(profile),
+        )
+        view(APIRequestFactory().get("/products/"))
+        assert len(slow) == 1
+        assert "render" in slow[0].stages
+
+    def test_async_server_timing_header(self):
+        http = MockedAsyncHttp(lambda *args, **kwargs: MockedResponse(data=PRODUCTS))
+        resource = http_resource(AsyncProductResource, http)
+        view = self.get_view(AsyncAPIResourceListView, resource, server_timing=True)
+        response = asyncio.run(view(APIRequestFactory().get("/products/")))
+        assert response.status_code == 200
+        assert "network;dur=" in response["Server-Timing"]
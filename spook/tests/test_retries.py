@@ -0,0 +1,233 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from spook.breakers import CircuitBreaker, get_circuit_breakers
+from spook.deadlines import deadline
+from spook.exceptions import (
+    APIResourceCircuitOpenException,
+    APIResourceDeadlineException,
+)
+from spook.resources import APIResource, AsyncAPIResource
+from spook.retries import Retry
+from spook.tests.mocks import ProductValidator
+from spook.tests.utils import MockedResponse
+
+
+class SequenceHttp(object):
+    """
+    Http object answering the requests with the given responses or exceptions,
+    in order
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append(method)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+
+class AsyncSequenceHttp(SequenceHttp):
+    async def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+def unavailable(headers: dict = None):
+    return MockedResponse(data="", status_code=503, headers=headers)
+
+
+def ok():
+    return MockedResponse(data={"id": 1})
+
+
+class RetriedResource(APIResource):
+    api_url = "http://retries.example.com/products/"
+    validator = ProductValidator
+    max_retries = 2
+
+
+class TestRetry(TestCase):
+    def test_backoff_is_exponential_and_bounded(self):
+        retry = Retry(backoff_factor=0.5, backoff_max=3, jitter=False)
+        assert [retry.get_backoff(attempt) for attempt in range(4)] == [
+            0.5,
+            1,
+            2,
+            3,
+        ]
+
+    def test_backoff_jitter(self):
+        retry = Retry(backoff_factor=1)
+        assert all(0 <= retry.get_backoff(2) <= 4 for _ in range(20))
+
+    def test_retry_after(self):
+        retry = Retry(retry_after_max=10)
+        assert retry.get_delay(0, unavailable({"Retry-After": "3"})) == 3
+        assert retry.get_delay(0, unavailable({"Retry-After": "120"})) == 10
+        date = "Wed, 21 Oct 2015 07:28:00 GMT"
+        assert retry.get_delay(0, unavailable({"Retry-After": date})) == 0
+
+    def test_should_retry(self):
+        retry = Retry(max_retries=1)
+        assert retry.should_retry(0, response=unavailable())
+        assert not retry.should_retry(1, response=unavailable())
+        assert not retry.should_retry(0, response=MockedResponse("", 500))
+        assert retry.should_retry(0, exception=requests.ConnectionError())
+        assert not retry.should_retry(0, exception=ValueError())
+
+
+@patch("spook.resources.time.sleep")
+class TestRetriedResource(TestCase):
+    def test_idempotent_reads_are_retried(self, sleep):
+        http = SequenceHttp(unavailable({"Retry-After": "1"}), ok())
+        response = RetriedResource(http=http).retrieve(1)
+        assert response.status == 200
+        assert len(http.calls) == 2
+        sleep.assert_called_once_with(1)
+
+    def test_connection_errors_are_retried(self, sleep):
+        http = SequenceHttp(requests.ConnectionError(), requests.Timeout(), ok())
+        assert RetriedResource(http=http).list().status == 200
+        assert len(http.calls) == 3
+
+    def test_retries_are_bounded(self, sleep):
+        http = SequenceHttp(unavailable())
+        assert RetriedResource(http=http).retrieve(1).status == 503
+        assert len(http.calls) == 3
+
+    def test_non_idempotent_actions_are_not_retried(self, sleep):
+        http = SequenceHttp(unavailable(), ok())
+        assert RetriedResource(http=http).create({"name": "Star Wars"}).status == 503
+        assert http.calls == ["POST"]
+
+    def test_put_is_retried(self, sleep):
+        http = SequenceHttp(unavailable(), ok())
+        assert RetriedResource(http=http).update(1, {"name": "Star Wars"}).status == 200
+        assert http.calls == ["PUT", "PUT"]
+
+    def test_retries_disabled_by_default(self, sleep):
+        class Resource(APIResource):
+            api_url = "http://retries.example.com/products/"
+
+        http = SequenceHttp(unavailable(), ok())
+        assert Resource(http=http).retrieve(1).status == 503
+        assert len(http.calls) == 1
+
+    def test_async_reads_are_retried(self, sleep):
+        class Resource(AsyncAPIResource):
+            api_url = "http://retries.example.com/products/"
+            max_retries = 1
+            retry_backoff_factor = 0
+
+        http = AsyncSequenceHttp(requests.ConnectionError(), ok())
+        response = asyncio.run(Resource(http=http).retrieve(1))
+        assert response.status == 200
+        assert len(http.calls) == 2
+
+
+class TestCircuitBreaker(TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(APIResourceCircuitOpenException):
+            breaker.before_call()
+        assert breaker.stats["rejected"] == 1
+        assert breaker.stats["opened"] == 1
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()
+        with pytest.raises(APIResourceCircuitOpenException):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+        breaker.record_failure()
+        breaker.recovery_timeout = 0
+        breaker.before_call()
+        breaker.recovery_timeout = 60
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats["opened"] == 2
+
+    def test_released_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.release()
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    def test_async_probe_cancelled_by_the_deadline(self):
+        class SlowHttp(object):
+            def __init__(self):
+                self.delay = 1
+
+            async def get(self, url, **kwargs):
+                await asyncio.sleep(self.delay)
+                return MockedResponse(data={"id": 1})
+
+        class Resource(AsyncAPIResource):
+            api_url = "http://async-probe.example.com/products/"
+            circuit_breaker_threshold = 1
+            circuit_breaker_timeout = 60
+
+        breaker = Resource().get_circuit_breaker()
+        breaker.record_failure()
+        breaker.recovery_timeout = 0
+        http = SlowHttp()
+
+        async def retrieve():
+            with deadline(0.05):
+                return await Resource(http=http).retrieve(1)
+
+        with pytest.raises(APIResourceDeadlineException):
+            asyncio.run(retrieve())
+        assert breaker.stats["failures"] == 2
+
+        http.delay = 0
+        assert asyncio.run(retrieve()).status == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_resources_share_the_breaker(self):
+        class Resource(APIResource):
+            api_url = "http://breaker.example.com/products/"
+            circuit_breaker_threshold = 2
+            circuit_breaker_timeout = 60
+
+        http = SequenceHttp(unavailable())
+        assert Resource(http=http).retrieve(1).status == 503
+        assert Resource(http=http).retrieve(2).status == 503
+        with pytest.raises(APIResourceCircuitOpenException):
+            Resource(http=http).retrieve(3)
+        assert len(http.calls) == 2
+
+        breaker = get_circuit_breakers()["http://breaker.example.com/products/"]
+        assert breaker is Resource().get_circuit_breaker()
+        assert breaker.stats["failures"] == 2
@@ -0,0 +1,93 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from spook.sessions import SessionPool
+from spook.tests.mocks import ProductResource, PRODUCTS, get_mocked_products
+
+
+class HeadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class MockedHttp(object):
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(url)
+        return get_mocked_products()
+
+
+class TestSessionPool(TestCase):
+    def setUp(self):
+        self.pool = SessionPool(pool_connections=2, pool_maxsize=4, pool_block=True)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_same_host_shares_session(self):
+        first = self.pool.get_session("http://example.com/api/products/")
+        second = self.pool.get_session("http://EXAMPLE.com/api/orders/1")
+        assert first is second
+
+    def test_different_hosts_use_different_sessions(self):
+        first = self.pool.get_session("http://example.com/api/")
+        second = self.pool.get_session("https://example.com/api/")
+        third = self.pool.get_session("http://example.org/api/")
+        assert len({id(first), id(second), id(third)}) == 3
+
+    def test_session_shared_across_threads(self):
+        sessions = []
+
+        def get_session():
+            sessions.append(self.pool.get_session("http://example.com/"))
+
+        threads = [threading.Thread(target=get_session) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(session) for session in sessions}) == 1
+
+    def test_adapter_configuration(self):
+        adapter = self.pool.get_session("https://example.com/").get_adapter(
+            "https://example.com/"
+        )
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 4
+        assert adapter._pool_block is True
+
+    def test_upstream_cookies_are_not_persisted(self):
+        session = self.pool.get_session("http://example.com/")
+        policy = session.cookies._policy
+        assert policy.allowed_domains() == ()
+
+    def test_warm_up(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), HeadHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/"
+            assert self.pool.warm_up(url, connections=2) == 2
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_warm_up_unreachable_host(self):
+        assert self.pool.warm_up("http://127.0.0.1:1/", timeout=1) == 0
+
+    def test_http_injection(self):
+        http = MockedHttp()
+        response = ProductResource(http=http).list()
+        assert response.data == PRODUCTS
+        assert http.calls == [ProductResource.api_url]
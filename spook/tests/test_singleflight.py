@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+import pytest
+
+from spook.resources import AsyncAPIResource
+from spook.singleflight import SingleFlight, AsyncSingleFlight
+from spook.tests.mocks import ProductResource, PRODUCTS
+from spook.tests.utils import MockedResponse
+
+
+class SlowHttp(object):
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return MockedResponse(data=PRODUCTS["results"][0])
+
+
+class AsyncSlowHttp(SlowHttp):
+    async def get(self, url, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return MockedResponse(data=PRODUCTS["results"][0])
+
+
+class CoalescedProductResource(ProductResource):
+    coalesced_actions = ("get", "list")
+
+
+def run_in_threads(fn, count: int = 10) -> list:
+    results = []
+    barrier = threading.Barrier(count)
+
+    def run():
+        barrier.wait()
+        results.append(fn())
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+class TestSingleFlight(TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return "result"
+
+        results = run_in_threads(lambda: flight.do("key", slow))
+        assert results == ["result"] * 10
+        assert len(calls) == 1
+        assert flight.coalesced == 9
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.05)
+            raise ValueError("upstream failed")
+
+        def call():
+            try:
+                flight.do("key", failing)
+            except ValueError as e:
+                return e
+
+        errors = run_in_threads(call, count=4)
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        assert flight.do("key", lambda: 1) == 1
+        assert flight.do("key", lambda: 2) == 2
+
+    def test_async_calls_are_coalesced(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(*[flight.do("key", slow) for _ in range(5)])
+
+        assert asyncio.run(run()) == ["result"] * 5
+        assert len(calls) == 1
+
+    def test_async_errors_are_shared(self):
+        flight = AsyncSingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        async def run():
+            return await asyncio.gather(
+                *[flight.do("key", failing) for _ in range(3)], return_exceptions=True
+            )
+
+        errors = asyncio.run(run())
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_async_leader_cancellation_is_not_shared(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            leader = asyncio.ensure_future(flight.do("key", slow))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do("key", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(run()) == "result"
+        assert len(calls) == 1
+
+
+class TestCoalescedResource(TestCase):
+    def test_identical_reads_are_coalesced(self):
+        http = SlowHttp()
+        results = run_in_threads(
+            lambda: CoalescedProductResource(http=http).retrieve(1)
+        )
+        assert http.calls == 1
+        assert all(result.data == PRODUCTS["results"][0] for result in results)
+
+    def test_not_coalesced_by_default(self):
+        http = SlowHttp(delay=0.01)
+        run_in_threads(lambda: ProductResource(http=http).retrieve(1), count=4)
+        assert http.calls == 4
+
+    def test_different_identities_are_not_coalesced(self):
+        class TokenResource(CoalescedProductResource):
+            def get_token(self) -> str:
+                return self.token
+
+        http = SlowHttp()
+        tokens = iter(["first", "second", "third", "fourth"])
+        lock = threading.Lock()
+
+        def retrieve():
+            with lock:
+                token = next(tokens)
+            return TokenResource(http=http, token=token).retrieve(1)
+
+        run_in_threads(retrieve, count=4)
+        assert http.calls == 4
+
+    def test_async_identical_reads_are_coalesced(self):
+        class AsyncCoalescedProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+            coalesced_actions = ("get",)
+
+        http = AsyncSlowHttp(delay=0.01)
+
+        async def run():
+            resource = AsyncCoalescedProductResource(http=http)
+            return await asyncio.gather(*[resource.retrieve(1) for _ in range(5)])
+
+        results = asyncio.run(run())
+        assert http.calls == 1
+        assert [result.status for result in results] == [200] * 5
+
+    def test_async_errors_propagate(self):
+        class FailingHttp(object):
+            async def get(self, url, **kwargs):
+                await asyncio.sleep(0.01)
+                raise ConnectionError("Connection refused")
+
+        class AsyncCoalescedProductResource(AsyncAPIResource):
+            api_url = ProductResource.api_url
+            coalesced_actions = ("get",)
+
+        async def run():
+            resource = AsyncCoalescedProductResource(http=FailingHttp())
+            return await asyncio.gather(
+                resource.retrieve(1), resource.retrieve(1), return_exceptions=True
+            )
+
+        errors = asyncio.run(run())
+        assert all(isinstance(error, ConnectionError) for error in errors)
+        with pytest.raises(ConnectionError):
+            asyncio.run(AsyncCoalescedProductResource(http=FailingHttp()).retrieve(1))
@@ -47,7 +47,7 @@ class TestAPIResource(APITestCase):
             MyResource().list()
         assert e is not None
 
-    @patch("spook.resources.requests.get", get_mocked_products)
+    @patch("spook.sessions.requests.Session.request", get_mocked_products)
     def test_raises_resource_token_not_provided(self):
         class MyResource(APIResource):
             api_url = "http://example.com/api/1.0/products/"
@@ -57,68 +57,68 @@ class TestAPIResource(APITestCase):
         data = response.data
         assert data["results"][0]["name"] == PRODUCTS["results"][0].get("name")
 
-    @patch("spook.resources.requests.get", get_mocked_products)
+    @patch("spook.sessions.requests.Session.request", get_mocked_products)
     def test_list_products(self):
         response = self.product_service.list()
         assert response.status == 200
         data = response.data
         assert data["results"][0]["name"] == PRODUCTS["results"][0].get("name")
 
-    @patch("spook.resources.requests.get", retrieve_product)
+    @patch("spook.sessions.requests.Session.request", retrieve_product)
     def test_retrieve_product(self):
         response = self.product_service.retrieve("1")
         assert response.status == 200
         data = response.data
         assert data["name"] == PRODUCTS["results"][0].get("name")
 
-    @patch("spook.resources.requests.post", create_product)
+    @patch("spook.sessions.requests.Session.request", create_product)
     def test_create_product(self):
         response = self.product_service.create(CREATED_PRODUCT)
         assert response.status == 201
         data = response.data
         assert data["name"] == CREATED_PRODUCT.get("name")
 
-    @patch("spook.resources.requests.put", update_product)
+    @patch("spook.sessions.requests.Session.request", update_product)
     def test_update_product(self):
         response = self.product_service.update("3", UPDATED_PRODUCT)
         assert response.status == 200
         data = response.data
         assert data["name"] == UPDATED_PRODUCT.get("name")
 
-    @patch("spook.resources.requests.patch", update_product)
+    @patch("spook.sessions.requests.Session.request", update_product)
     def test_partial_update_product(self):
         response = self.product_service.update("3", UPDATED_PRODUCT, partial=True)
         assert response.status == 200
         data = response.data
         assert data["name"] == UPDATED_PRODUCT.get("name")
 
-    @patch("spook.resources.requests.delete", delete_product)
+    @patch("spook.sessions.requests.Session.request", delete_product)
     def test_delete_product(self):
         response = self.product_service.destroy("3")
         assert response.status == 204
         assert response.data == ""
 
-    @patch("spook.resources.requests.post", create_product)
+    @patch("spook.sessions.requests.Session.request", create_product)
     def test_create_invalid_input(self):
         e = None
         with pytest.raises(ValidationError) as e:
             self.product_service.create({"wrong": "input"})
         assert e is not None
 
-    @patch("spook.resources.requests.put", update_product)
+    @patch("spook.sessions.requests.Session.request", update_product)
     def test_update_invalid_input(self):
         e = None
         with pytest.raises(ValidationError) as e:
             self.product_service.update(3, {"wrong": "input"})
         assert e is not None
 
-    @patch("spook.resources.requests.get", server_error)
+    @patch("spook.sessions.requests.Session.request", server_error)
     def test_server_error(self):
         response = self.product_service.list()
         assert response.status == 500
         assert response.data == "Internal Server Error"
 
-    @patch("spook.resources.requests.post", server_validation_error)
+    @patch("spook.sessions.requests.Session.request", server_validation_error)
     def test_server_validation_error(self):
         response = self.product_service.create(
             {"name": "The Elder Scrolls V: Skyrim", "price": -2}
@@ -126,7 +126,7 @@ class TestAPIResource(APITestCase):
         assert response.status == 400
         assert response.data.get("price")[0] == "Invalid field name."
 
-    @patch("spook.resources.requests.post", server_permission_error)
+    @patch("spook.sessions.requests.Session.request", server_permission_error)
     def test_server_permissions_error(self):
         response = self.product_service.create({"name": "The Elder Scrolls V: Skyrim"})
         assert response.status == 403
@@ -0,0 +1,137 @@
+import asyncio
+from unittest import TestCase
+
+from django.http import StreamingHttpResponse
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from spook.tests.mocks import AsyncProductResource, ProductResource, ProductSerializer
+from spook.tests.utils import MockedRequest
+from spook.views import APIResourceListView, AsyncAPIResourceListView
+
+CHUNKS = [b'[{"id": 1}', b', {"id": 2}', b"]"]
+
+
+class StreamedResponse(object):
+    def __init__(self, chunks, status_code=200):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.headers = {"Content-Type": "application/json", "ETag": '"v1"'}
+        self.chunk_sizes = []
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        self.chunk_sizes.append(chunk_size)
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    async def aiter_bytes(self, chunk_size=None):
+        self.chunk_sizes.append(chunk_size)
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+class StreamingHttp(object):
+    def __init__(self):
+        self.response = StreamedResponse(CHUNKS)
+        self.kwargs = None
+
+    def get(self, url, **kwargs):
+        self.kwargs = kwargs
+        return self.response
+
+
+class AsyncStreamingHttp(StreamingHttp):
+    async def stream(self, method, url, **kwargs):
+        return self.get(url, **kwargs)
+
+
+class StreamingProductResource(ProductResource):
+    pagination_class = None
+    stream_chunk_size = 1024
+    http_mock = None
+
+    def __init__(self, **kwargs):
+        super().__init__(http=self.http_mock, **kwargs)
+
+
+class StreamingProductView(APIResourceListView):
+    resource = StreamingProductResource
+    serializer_class = ProductSerializer
+    streaming = True
+
+    def get_token(self, request):
+        return ""
+
+
+class TestStreaming(TestCase):
+    def setUp(self):
+        self.http = StreamingProductResource.http_mock = StreamingHttp()
+
+    def test_iter_stream_closes_upstream(self):
+        resource = StreamingProductResource()
+        response = resource.get_stream(resource.get_url())
+        assert self.http.kwargs["stream"] is True
+        assert list(resource.iter_stream(response)) == CHUNKS
+        assert response.chunk_sizes == [1024]
+        assert response.closed
+
+    def test_streaming_view(self):
+        response = StreamingProductView().list(MockedRequest())
+        assert isinstance(response, StreamingHttpResponse)
+        assert response["ETag"] == '"v1"'
+        assert self.http.response.read == 0
+        assert b"".join(response.streaming_content) == b"".join(CHUNKS)
+        assert self.http.response.closed
+
+    def test_disconnect_aborts_upstream(self):
+        response = StreamingProductView().list(MockedRequest())
+        next(iter(response.streaming_content))
+        response.close()
+        assert self.http.response.read == 1
+        assert self.http.response.closed
+
+    def test_failed_upstream_is_closed(self):
+        class FailingResource(StreamingProductResource):
+            def handle_server_errors(self, response, data: dict = None):
+                raise ValueError("Upstream error")
+
+        with self.assertRaises(ValueError):
+            FailingResource().get_stream("http://example.com/")
+        assert self.http.response.closed
+
+
+class TestAsyncStreaming(APITestCase):
+    def test_async_streaming_view(self):
+        http = AsyncStreamingHttp()
+
+        class Resource(AsyncProductResource):
+            pagination_class = None
+
+            def __init__(self, **kwargs):
+                super().__init__(http=http, **kwargs)
+
+        class View(AsyncAPIResourceListView):
+            resource = Resource
+            serializer_class = ProductSerializer
+            streaming = True
+            authentication_classes = []
+            permission_classes = []
+
+            def get_token(self, request):
+                return ""
+
+        async def run():
+            response = await View.as_view()(APIRequestFactory().get("/products/"))
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        assert asyncio.run(run()) == b"".join(CHUNKS)
+        assert http.response.closed
@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+import pytest
+
+from spook.exceptions import APIResourceTokenException
+from spook.resources import APIResource, AsyncAPIResource
+from spook.tests.utils import MockedAsyncHttp, MockedResponse
+from spook.tokens import (
+    BaseTokenProvider,
+    ClientCredentialsTokenProvider,
+    TokenExchangeProvider,
+)
+
+
+class TokenHttp(object):
+    """
+    Http object of a token endpoint, issuing a new token on every request
+    """
+
+    def __init__(self, expires_in: float = 3600, delay: float = 0, status_code=200):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.status_code = status_code
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def post(self, url, data=None, **kwargs):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append(data)
+            token = f"token-{len(self.calls)}"
+        return MockedResponse(
+            data={"access_token": token, "expires_in": self.expires_in},
+            status_code=self.status_code,
+        )
+
+
+class AuthenticatedHttp(object):
+    """
+    Http object answering 401 to the requests without the valid token
+    """
+
+    def __init__(self, valid_token: str):
+        self.valid_token = valid_token
+        self.calls = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.calls.append(headers["Authorization"])
+        if headers["Authorization"] != f"Bearer {self.valid_token}":
+            return MockedResponse(data={"detail": "Unauthorized"}, status_code=401)
+        return MockedResponse(data={"id": 1})
+
+
+def get_provider(http: TokenHttp, **options) -> ClientCredentialsTokenProvider:
+    return ClientCredentialsTokenProvider(
+        "http://auth.example.com/token",
+        "client",
+        "secret",
+        scope="products",
+        http=http,
+        **options,
+    )
+
+
+class TestTokenProviders(TestCase):
+    def test_tokens_are_cached(self):
+        http = TokenHttp()
+        provider = get_provider(http)
+        assert provider.get_token() == "token-1"
+        assert provider.get_token("user-token") == "token-1"
+        assert http.calls == [{"grant_type": "client_credentials", "scope": "products"}]
+        assert provider.stats["hits"] == 1
+
+    def test_concurrent_refreshes_are_deduplicated(self):
+        http = TokenHttp(delay=0.05)
+        provider = get_provider(http)
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(provider.get_token()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert tokens == ["token-1"] * 8
+        assert len(http.calls) == 1
+
+    def test_expired_tokens_are_refreshed(self):
+        http = TokenHttp(expires_in=0.05)
+        provider = get_provider(http, refresh_margin=0)
+        assert provider.get_token() == "token-1"
+        time.sleep(0.06)
+        assert provider.get_token() == "token-2"
+
+    def test_proactive_refresh(self):
+        http = TokenHttp(expires_in=0.5)
+        provider = get_provider(http, refresh_margin=0.45)
+        assert provider.get_token() == "token-1"
+        time.sleep(0.06)
+        assert provider.get_token() == "token-1"
+        for _ in range(100):
+            if len(http.calls) == 2:
+                break
+            time.sleep(0.01)
+        assert provider.get_token() == "token-2"
+
+    def test_renew(self):
+        http = TokenHttp()
+        provider = get_provider(http)
+        provider.get_token()
+        assert provider.renew(rejected="token-1") == "token-2"
+        assert provider.renew(rejected="token-1") == "token-2"
+        assert len(http.calls) == 2
+
+    def test_token_endpoint_errors(self):
+        provider = get_provider(TokenHttp(status_code=401))
+        with pytest.raises(APIResourceTokenException):
+            provider.get_token()
+        assert provider.stats["failures"] == 1
+
+    def test_token_exchange(self):
+        http = TokenHttp()
+        provider = TokenExchangeProvider(
+            "http://auth.example.com/token",
+            "client",
+            "secret",
+            audience="products",
+            http=http,
+        )
+        assert provider.get_token("ann") == "token-1"
+        assert provider.get_token("bob") == "token-2"
+        assert provider.get_token("ann") == "token-1"
+        assert http.calls[0]["subject_token"] == "ann"
+        assert http.calls[0]["audience"] == "products"
+        assert provider.get_identity("ann") != provider.get_identity("bob")
+
+
+class TestResourceTokens(TestCase):
+    def test_token_is_given_by_the_provider(self):
+        class Resource(APIResource):
+            api_url = "http://example.com/products"
+            token_provider = get_provider(TokenHttp())
+
+        http = AuthenticatedHttp(valid_token="token-1")
+        assert Resource(http=http).retrieve(1).status == 200
+        assert Resource(http=http).retrieve(2).status == 200
+        assert Resource.token_provider.stats["fetches"] == 1
+
+    def test_rejected_token_is_renewed_once(self):
+        class Resource(APIResource):
+            api_url = "http://example.com/products"
+            token_provider = get_provider(TokenHttp())
+
+        http = AuthenticatedHttp(valid_token="token-2")
+        assert Resource(http=http).retrieve(1).status == 200
+        assert http.calls == ["Bearer token-1", "Bearer token-2"]
+
+        http = AuthenticatedHttp(valid_token="token-9")
+        assert Resource(http=http).retrieve(1).status == 401
+        assert http.calls == ["Bearer token-2", "Bearer token-3"]
+
+    def test_static_tokens_are_not_retried(self):
+        class StaticTokenProvider(BaseTokenProvider):
+            def fetch_token(self, subject):
+                return subject, None
+
+        class Resource(APIResource):
+            api_url = "http://example.com/products"
+            token_provider = StaticTokenProvider()
+
+        http = AuthenticatedHttp(valid_token="valid")
+        assert Resource(token="invalid", http=http).retrieve(1).status == 401
+        assert Resource(token="valid", http=http).retrieve(1).status == 200
+        assert http.calls == ["Bearer invalid", "Bearer valid"]
+
+    def test_cache_identity_survives_refreshes(self):
+        class Resource(APIResource):
+            api_url = "http://example.com/products"
+            token_provider = get_provider(TokenHttp())
+
+        resource = Resource()
+        identity = resource.get_cache_identity()
+        Resource.token_provider.renew(rejected=resource.get_token())
+        assert resource.get_cache_identity() == identity
+
+    def test_async_resource(self):
+        def mock(url, headers=None, **kwargs):
+            if headers["Authorization"] != "Bearer token-2":
+                return MockedResponse(data={"detail": "Unauthorized"}, status_code=401)
+            return MockedResponse(data={"id": 1})
+
+        class Resource(AsyncAPIResource):
+            api_url = "http://example.com/products"
+            token_provider = get_provider(TokenHttp())
+
+        http = MockedAsyncHttp(mock)
+        response = asyncio.run(Resource(http=http).retrieve(1))
+        assert response.status == 200
+        assert len(http.calls) == 2
+
+    def test_async_resource_fetches_tokens_in_the_executor(self):
+        class ThreadTokenHttp(TokenHttp):
+            def post(self, url, data=None, **kwargs):
+                self.threads.append(threading.current_thread())
+                return super().post(url, data=data, **kwargs)
+
+        token_http = ThreadTokenHttp()
+        token_http.threads = []
+
+        class Resource(AsyncAPIResource):
+            api_url = "http://example.com/products"
+            token_provider = get_provider(token_http)
+
+        http = MockedAsyncHttp(lambda url, **kwargs: MockedResponse(data={"id": 1}))
+        assert asyncio.run(Resource(http=http).retrieve(1)).status == 200
+        assert asyncio.run(Resource(http=http).delete(1)).status == 200
+        assert token_http.threads != [threading.current_thread()]
+        assert len(token_http.threads) == 1
+        assert http.calls[0][2]["headers"]["Authorization"] == "Bearer token-1"
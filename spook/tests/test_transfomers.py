@@ -35,3 +35,87 @@ class TestTransformers(TestCase):
         assert result[0]["name"] == data[0]["NAME"]
         assert result[0]["first_name"] == data[0]["FIRST_NAME"]
         assert result[0]["vat_id"] == parse_vat_id(data[0]["VAT_ID"]) == "11111111-H"
+
+
+class LineTransformer(Transformer):
+    mappings = {"SKU": "sku", "QTY": "quantity"}
+    value_mappings_functions = {"QTY": int}
+
+
+class OrderTransformer(Transformer):
+    mappings = {
+        "ID": "id",
+        "CUSTOMER.NAME": "customer_name",
+        "CUSTOMER.ADDRESS.CITY": "city",
+        "STATUS": "status",
+        "LINES": "lines",
+    }
+    defaults = {"STATUS": "pending", "CUSTOMER.ADDRESS.CITY": None}
+    nested_transformers = {"LINES": LineTransformer}
+
+
+ORDER = {
+    "ID": 1,
+    "CUSTOMER": {"NAME": "John Doe", "ADDRESS": {"CITY": "Madrid"}},
+    "LINES": [{"SKU": "A1", "QTY": "2", "IGNORED": True}, {"SKU": "B2", "QTY": "1"}],
+    "UNMAPPED": "value",
+}
+
+
+class TestCompiledTransformers(TestCase):
+    def test_plan_is_compiled_once_per_class(self):
+        plan = CustomTransformer.get_plan()
+        assert CustomTransformer.get_plan() is plan
+        assert LineTransformer.get_plan() is not plan
+        assert len(plan) == len(CustomTransformer.mappings)
+
+    def test_dotted_paths(self):
+        result = OrderTransformer(initial_data=ORDER).transform()
+        assert result["customer_name"] == "John Doe"
+        assert result["city"] == "Madrid"
+        assert "UNMAPPED" not in result
+
+    def test_flat_keys_with_dots(self):
+        class DottedTransformer(Transformer):
+            mappings = {"customer.name": "name"}
+
+        result = DottedTransformer(initial_data={"customer.name": "Jane"}).transform()
+        assert result == {"name": "Jane"}
+
+    def test_defaults(self):
+        result = OrderTransformer(
+            initial_data={"ID": 2, "CUSTOMER": "unknown"}
+        ).transform()
+        assert result == {"id": 2, "status": "pending", "city": None}
+
+    def test_list_of_dict_columns(self):
+        result = OrderTransformer(initial_data=ORDER).transform()
+        assert result["lines"] == [
+            {"sku": "A1", "quantity": 2},
+            {"sku": "B2", "quantity": 1},
+        ]
+
+    def test_transform_iter(self):
+        rows = iter([ORDER, {"ID": 3}])
+        results = OrderTransformer(initial_data=rows).transform_iter()
+        assert next(results)["id"] == 1
+        assert next(results) == {"id": 3, "status": "pending", "city": None}
+        assert next(results, None) is None
+
+    def test_transform_iter_dict(self):
+        data = {"NAME": "John", "VAT_ID": "11111111H"}
+        results = list(CustomTransformer(initial_data=data).transform_iter())
+        assert results == [{"name": "John", "vat_id": "11111111-H"}]
+
+    def test_output_keeps_the_input_order(self):
+        data = {"VAT_ID": "11111111H", "NAME": "John", "FIRST_NAME": "Doe"}
+        result = CustomTransformer(initial_data=data).transform()
+        assert list(result) == ["vat_id", "name", "first_name"]
+
+    def test_instance_mappings(self):
+        transformer = CustomTransformer(initial_data={"NAME": "John", "AGE": 30})
+        transformer.mappings = {"AGE": "age"}
+        assert transformer.transform() == {"age": 30}
+        assert CustomTransformer(initial_data={"NAME": "John"}).transform() == {
+            "name": "John"
+        }
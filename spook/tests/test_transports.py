@@ -0,0 +1,163 @@
+import base64
+import gzip
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import urllib3
+
+from spook.resources import APIResource
+from spook.retries import get_transport_exceptions
+from spook.sessions import default_pool
+from spook.transports import RequestsTransport, Urllib3Transport, get_default_transport
+from spook.validators import NoopValidator
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request with its method, path, query, headers and body
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200, compressed=False):
+        body = json.dumps(data).encode()
+        if compressed:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        parts = urlsplit(self.path)
+        if parts.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/products")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode()
+        self.send_json(
+            {
+                "method": self.command,
+                "path": parts.path,
+                "query": dict(parse_qsl(parts.query)),
+                "headers": dict(self.headers),
+                "body": body,
+            },
+            status=201 if self.command == "POST" else 200,
+            compressed=parts.path == "/gzip",
+        )
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+
+class TestUrllib3Transport(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.url = f"http://{host}:{port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.transport = Urllib3Transport()
+
+    def tearDown(self):
+        self.transport.close()
+
+    def test_get(self):
+        response = self.transport.get(
+            f"{self.url}/products?a=1", params={"b": 2}, headers={"X-Spook": "yes"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        data = response.json()
+        assert data["query"] == {"a": "1", "b": "2"}
+        assert data["headers"]["X-Spook"] == "yes"
+
+    def test_json_body(self):
+        response = self.transport.post(f"{self.url}/products", json={"name": "Spook"})
+        data = response.json()
+        assert response.status_code == 201
+        assert json.loads(data["body"]) == {"name": "Spook"}
+        assert data["headers"]["Content-Type"] == "application/json"
+
+    def test_form_body_and_basic_auth(self):
+        response = self.transport.post(
+            f"{self.url}/token", data={"grant_type": "client"}, auth=("id", "secret")
+        )
+        data = response.json()
+        assert data["body"] == "grant_type=client"
+        credentials = base64.b64encode(b"id:secret").decode()
+        assert data["headers"]["Authorization"] == f"Basic {credentials}"
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.transport.get(f"{self.url}/products").close()
+        pool = self.transport.pool_manager.connection_from_url(self.url)
+        assert pool.num_connections == 1
+
+    def test_compressed_stream(self):
+        response = self.transport.get(f"{self.url}/gzip", stream=True)
+        body = b"".join(response.iter_content(chunk_size=16))
+        response.close()
+        assert json.loads(body)["path"] == "/gzip"
+        assert response.raw.tell() < len(body)
+
+    def test_redirects(self):
+        assert self.transport.get(f"{self.url}/redirect").json()["path"] == "/products"
+        response = self.transport.get(f"{self.url}/redirect", allow_redirects=False)
+        assert response.status_code == 302
+
+    def test_connection_errors_are_retryable(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        with pytest.raises(get_transport_exceptions()):
+            self.transport.get(f"http://127.0.0.1:{port}/", timeout=(1, 1))
+
+    def test_resource(self):
+        transport = self.transport
+
+        class Resource(APIResource):
+            api_url = f"{self.url}/products"
+            validator = NoopValidator
+
+            def get_token(self):
+                return "token"
+
+        resource = Resource(http=transport)
+        data = resource.retrieve(1).data
+        assert data["path"] == "/products/1"
+        assert data["headers"]["Authorization"] == "Bearer token"
+        assert resource.create({"name": "Spook"}).status == 201
+        assert resource.delete(1).status == 200
+
+
+class TestDefaultTransport(TestCase):
+    def test_requests_is_the_default(self):
+        transport = get_default_transport()
+        assert isinstance(transport, RequestsTransport)
+        assert transport.pool is default_pool
+        assert APIResource().http is transport
+        assert isinstance(Urllib3Transport().pool_manager, urllib3.PoolManager)
@@ -1,6 +1,8 @@
 import pytest
 
 from unittest.mock import patch
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
 
 from spook.tests.mocks import (
@@ -15,7 +17,8 @@ from spook.tests.mocks import (
     UPDATED_PRODUCT,
     delete_product,
 )
-from spook.tests.utils import MockedRequest
+from spook.tests.utils import MockedRequest, MockedResponse
+from spook.validators import FieldsValidator, NoopValidator, get_validator_class
 from spook.views import APIResourceListCreateView, APIResourceRetrieveUpdateDestroyView
 
 
@@ -40,7 +43,7 @@ class RetrieveUpdateDestroyProductResourceView(APIResourceRetrieveUpdateDestroyV
 
 
 class TestAPIResourceViews(APITestCase):
-    @patch("spook.resources.requests.get", get_mocked_products)
+    @patch("spook.sessions.requests.Session.request", get_mocked_products)
     def test_no_resource_view(self):
         e = None
         with pytest.raises(Exception) as e:
@@ -48,28 +51,28 @@ class TestAPIResourceViews(APITestCase):
             view.list(MockedRequest())
         assert e is not None
 
-    @patch("spook.resources.requests.get", get_mocked_products)
+    @patch("spook.sessions.requests.Session.request", get_mocked_products)
     def test_list_view_products(self):
         view = ListCreateProductResourceView()
         response = view.list(MockedRequest())
         assert response.status_code == 200
         assert response.data == PRODUCTS
 
-    @patch("spook.resources.requests.get", retrieve_product)
+    @patch("spook.sessions.requests.Session.request", retrieve_product)
     def test_retrieve_view_products(self):
         view = RetrieveUpdateDestroyProductResourceView()
         response = view.get(MockedRequest(), pk=1)
         assert response.status_code == 200
         assert response.data == PRODUCTS["results"][0]
 
-    @patch("spook.resources.requests.post", create_product)
+    @patch("spook.sessions.requests.Session.request", create_product)
     def test_create_view_product(self):
         view = ListCreateProductResourceView()
         response = view.create(MockedRequest(data={"name": "The Elder Scrolls V"}))
         assert response.status_code == 201
         assert response.data == CREATED_PRODUCT
 
-    @patch("spook.resources.requests.put", update_product)
+    @patch("spook.sessions.requests.Session.request", update_product)
     def test_update_view_product(self):
         view = RetrieveUpdateDestroyProductResourceView()
         response = view.update(
@@ -78,7 +81,7 @@ class TestAPIResourceViews(APITestCase):
         assert response.status_code == 200
         assert response.data == UPDATED_PRODUCT
 
-    @patch("spook.resources.requests.patch", update_product)
+    @patch("spook.sessions.requests.Session.request", update_product)
     def test_partial_update_view_product(self):
         view = RetrieveUpdateDestroyProductResourceView()
         response = view.update(
@@ -89,8 +92,135 @@ class TestAPIResourceViews(APITestCase):
         assert response.status_code == 200
         assert response.data == UPDATED_PRODUCT
 
-    @patch("spook.resources.requests.delete", delete_product)
+    @patch("spook.sessions.requests.Session.request", delete_product)
     def test_delete_view_product(self):
         view = RetrieveUpdateDestroyProductResourceView()
         response = view.destroy(MockedRequest(), pk=3)
         assert response.status_code == 204
+
+
+class TrustedProductResourceView(ListCreateProductResourceView):
+    trusted_validator = NoopValidator
+
+    def is_trusted_request(self, request):
+        return request.META.get("HTTP_X_INTERNAL") == "1"
+
+
+class TestValidators(APITestCase):
+    def test_validator_class_is_cached(self):
+        first = ListCreateProductResourceView().get_validator()
+        second = RetrieveUpdateDestroyProductResourceView().get_validator()
+        assert first is second
+        assert first.serializer_class is ProductSerializer
+
+    @patch("spook.sessions.requests.Session.request", create_product)
+    def test_trusted_request_skips_validation(self):
+        view = TrustedProductResourceView()
+        request = MockedRequest(data={"unknown": "field"})
+        request.META["HTTP_X_INTERNAL"] = "1"
+        view.request = request
+        response = view.create(request)
+        assert response.status_code == 201
+
+    @patch("spook.sessions.requests.Session.request", create_product)
+    def test_untrusted_request_is_validated(self):
+        view = TrustedProductResourceView()
+        view.request = MockedRequest(data={"unknown": "field"})
+        with pytest.raises(ValidationError):
+            view.create(view.request)
+
+    @patch("spook.sessions.requests.Session.request", create_product)
+    def test_get_validator_can_be_overridden(self):
+        class View(ListCreateProductResourceView):
+            def get_validator(self):
+                return NoopValidator
+
+        response = View().create(MockedRequest(data={"unknown": "field"}))
+        assert response.status_code == 201
+
+    def test_validate_many(self):
+        validator = get_validator_class(ProductSerializer)()
+        data = [{"name": "Star Wars"}, {"name": "The Lord Of The Rings"}]
+        assert validator.validate_many(data) == data
+        with pytest.raises(ValidationError) as e:
+            validator.validate_many([{"name": "Star Wars"}, {}])
+        assert "name" in e.value.detail[1]
+
+    def test_fields_validator(self):
+        class ProductFieldsValidator(FieldsValidator):
+            required_fields = ("name",)
+            allowed_fields = ("id", "name")
+
+        validator = ProductFieldsValidator()
+        assert validator.validate({"name": "Star Wars"}) == {"name": "Star Wars"}
+        with pytest.raises(ValidationError) as e:
+            validator.validate({"price": 2})
+        assert set(e.value.detail) == {"name", "price"}
+        with pytest.raises(ValidationError) as e:
+            validator.validate_many([{"name": "Star Wars"}, {"id": 1}])
+        assert e.value.detail[0] == {}
+        assert "name" in e.value.detail[1]
+
+
+def get_raw_product(*args, **kwargs):
+    return MockedResponse(
+        data=b'{"id": 1, "name": "Star Wars Collection"}',
+        headers={"Content-Type": "application/json", "ETag": '"v1"', "Server": "x"},
+    )
+
+
+class UnpaginatedProductResource(ProductResource):
+    pagination_class = None
+
+
+class PassthroughProductView(APIResourceListCreateView):
+    resource = UnpaginatedProductResource
+    serializer_class = ProductSerializer
+    passthrough = True
+
+    def get_token(self, request):
+        return ""
+
+
+class PassthroughRetrieveProductView(RetrieveUpdateDestroyProductResourceView):
+    passthrough = True
+
+
+class TestPassthrough(APITestCase):
+    @patch("spook.sessions.requests.Session.request", get_raw_product)
+    def test_retrieve_forwards_raw_response(self):
+        response = PassthroughRetrieveProductView().retrieve(MockedRequest(), pk=1)
+        assert isinstance(response, HttpResponse)
+        assert response.content == b'{"id": 1, "name": "Star Wars Collection"}'
+        assert response["Content-Type"] == "application/json"
+        assert response["ETag"] == '"v1"'
+        assert not response.has_header("Server")
+
+    @patch("spook.sessions.requests.Session.request", get_raw_product)
+    def test_list_forwards_raw_response(self):
+        response = PassthroughProductView().list(MockedRequest())
+        assert isinstance(response, HttpResponse)
+        assert response.status_code == 200
+
+    @patch("spook.sessions.requests.Session.request", get_mocked_products)
+    def test_paginated_list_is_decoded(self):
+        class View(PassthroughProductView):
+            resource = ProductResource
+
+        response = View().list(MockedRequest())
+        assert response.data == PRODUCTS
+
+    def test_can_passthrough(self):
+        class MappedResource(UnpaginatedProductResource):
+            def map_response(self, data):
+                return data
+
+        class CachedResource(UnpaginatedProductResource):
+            cache_timeouts = {"get": 60}
+
+        assert UnpaginatedProductResource().can_passthrough("list")
+        assert not ProductResource().can_passthrough("list")
+        assert ProductResource().can_passthrough("get")
+        assert not MappedResource().can_passthrough("get")
+        assert not CachedResource().can_passthrough("get")
+        assert CachedResource().can_passthrough("list")
@@ -1,11 +1,13 @@
 from json import JSONDecodeError
+from urllib.parse import parse_qsl, urlsplit
 
 
 class MockedResponse(object):
-    def __init__(self, data, status_code=200):
+    def __init__(self, data, status_code=200, headers: dict = None):
         self.data = data
         self.status_code = status_code
         self.content = data
+        self.headers = headers or {}
 
     def json(self):
         if isinstance(self.data, str):
@@ -13,9 +15,112 @@ class MockedResponse(object):
 
         return self.data
 
+    def close(self):
+        pass
+
+    async def aclose(self):
+        pass
+
 
 class MockedRequest(object):
     def __init__(self, data: dict = {}, query_params: dict = {}):
         self.META = dict()
         self.data = data
         self.query_params = query_params
+
+
+class MockedAsyncHttp(object):
+    """
+    Async http object answering every request with the given mock function
+    """
+
+    def __init__(self, mock):
+        self.mock = mock
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return self.mock(url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+
+class CountingHttp(object):
+    """
+    Http object answering every request with the same data, recording the calls
+    """
+
+    def __init__(self, data=None, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs.get("params")))
+        return MockedResponse(data=self.data, status_code=self.status_code)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+class PagedHttp(object):
+    """
+    Http object serving a list of items in pages, as Django Rest Framework's
+    PageNumberPagination does
+    """
+
+    def __init__(self, items: list, page_size: int, failing_pages: tuple = ()):
+        self.items = items
+        self.page_size = page_size
+        self.failing_pages = failing_pages
+        self.calls = []
+
+    def get(self, url, params=None, **kwargs):
+        query = dict(parse_qsl(urlsplit(url).query))
+        query.update(params or {})
+        base_url = url.split("?")[0]
+        self.calls.append(query)
+
+        page = int(query.get("page", 1))
+        if page in self.failing_pages:
+            return MockedResponse(data="Internal Server Error", status_code=500)
+
+        start, end = (page - 1) * self.page_size, page * self.page_size
+        results = self.items[start:end]
+        if not results and page != 1:
+            return MockedResponse(data={"detail": "Invalid page."}, status_code=404)
+
+        has_next = end < len(self.items)
+        return MockedResponse(
+            data={
+                "count": len(self.items),
+                "next": f"{base_url}?page={page + 1}" if has_next else None,
+                "previous": f"{base_url}?page={page - 1}" if page > 1 else None,
+                "results": results,
+            }
+        )
@@ -0,0 +1,288 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from spook import settings
+from spook.exceptions import APIResourceTokenException
+from spook.transports import get_default_transport
+
+logger = logging.getLogger(__name__)
+
+
+class CachedToken(object):
+    """
+    Token kept in the cache of a token provider
+    """
+
+    __slots__ = ("value", "expires")
+
+    def __init__(self, value: str, expires: float = None):
+        self.value = value
+        self.expires = expires
+
+    def is_valid(self, now: float = None) -> bool:
+        if self.expires is None:
+            return True
+
+        return (time.monotonic() if now is None else now) < self.expires
+
+    def needs_refresh(self, margin: float, now: float = None) -> bool:
+        """
+        Returns whether the token expires in less than the given seconds
+        """
+        if self.expires is None:
+            return False
+
+        return (time.monotonic() if now is None else now) >= self.expires - margin
+
+
+class BaseTokenProvider(object):
+    """
+    Thread safe provider of the tokens sent upstream. Tokens are cached in memory
+    by the key of their credentials, refreshed in the background `refresh_margin`
+    seconds before they expire, and concurrent refreshes of the same token are
+    deduplicated. The subject is the token of the user of the request, if any.
+    """
+
+    lock_stripes = 32
+
+    def __init__(self, refresh_margin: float = None, max_entries: int = 1000):
+        self.refresh_margin = (
+            settings.TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        )
+        self.max_entries = max_entries
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh_locks = [threading.Lock() for _ in range(self.lock_stripes)]
+        self._refreshing = set()
+        self._hits = 0
+        self._fetches = 0
+        self._failures = 0
+
+    def get_key(self, subject: Optional[str]) -> Hashable:
+        """
+        Returns the key tokens are cached by
+        """
+        return subject
+
+    def get_identity(self, subject: Optional[str]) -> str:
+        """
+        Returns a stable identity of the credentials, which doesn't change when
+        the token is refreshed, to cache responses by
+        """
+        key = repr(self.get_key(subject))
+
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def fetch_token(self, subject: Optional[str]) -> Tuple[str, Optional[float]]:
+        """
+            Obtains a new token
+        :param subject: The token of the user, if any
+        :return: The token and the seconds it is valid for, None if it doesn't expire
+        """
+        raise NotImplementedError
+
+    def get_token(self, subject: str = None) -> str:
+        key = self.get_key(subject)
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is not None:
+                self._tokens.move_to_end(key)
+
+        now = time.monotonic()
+        if token is None or not token.is_valid(now):
+            return self.refresh(key, subject).value
+
+        with self._lock:
+            self._hits += 1
+        if token.needs_refresh(self.refresh_margin, now):
+            self.refresh_in_background(key, subject, token.value)
+
+        return token.value
+
+    def get_cached_token(self, subject: str = None) -> Optional[str]:
+        """
+        Returns the cached token while it is valid, without fetching a new one
+        """
+        with self._lock:
+            token = self._tokens.get(self.get_key(subject))
+
+        if token is None or not token.is_valid():
+            return None
+
+        return token.value
+
+    def renew(self, subject: str = None, rejected: str = None) -> Optional[str]:
+        """
+        Replaces a token the upstream rejected
+        :return: The new token, None when the provider could only give the same one
+        """
+        token = self.refresh(self.get_key(subject), subject, rejected=rejected)
+
+        return token.value if token.value != rejected else None
+
+    def refresh(
+        self, key: Hashable, subject: Optional[str], rejected: str = None
+    ) -> CachedToken:
+        """
+        Fetches a new token, unless another caller did while waiting for the lock
+        of the key and it isn't the rejected one
+        """
+        with self._refresh_locks[hash(key) % self.lock_stripes]:
+            with self._lock:
+                token = self._tokens.get(key)
+            if token is not None and token.is_valid() and token.value != rejected:
+                return token
+
+            try:
+                value, expires_in = self.fetch_token(subject)
+            except Exception:
+                with self._lock:
+                    self._failures += 1
+                raise
+
+            expires = None if expires_in is None else time.monotonic() + expires_in
+            token = CachedToken(value, expires)
+            with self._lock:
+                self._fetches += 1
+                self._tokens[key] = token
+                self._tokens.move_to_end(key)
+                while len(self._tokens) > self.max_entries:
+                    self._tokens.popitem(last=False)
+
+        return token
+
+    def refresh_in_background(self, key: Hashable, subject: Optional[str], value: str):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.refresh(key, subject, rejected=value)
+            except Exception:
+                logger.warning("Could not refresh the token", exc_info=True)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "fetches": self._fetches,
+                "failures": self._failures,
+                "entries": len(self._tokens),
+            }
+
+
+class OAuthTokenProvider(BaseTokenProvider):
+    """
+    Obtains tokens from an OAuth 2.0 token endpoint, authenticating with the
+    client credentials
+    """
+
+    def __init__(
+        self,
+        token_url: str,
+        client_id: str,
+        client_secret: str,
+        scope: str = None,
+        http=None,
+        timeout: Tuple[float, float] = None,
+        **options,
+    ):
+        super().__init__(**options)
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.http = http
+        self.timeout = timeout or (settings.CONNECT_TIMEOUT, settings.READ_TIMEOUT)
+
+    def get_http(self):
+        return self.http if self.http is not None else get_default_transport()
+
+    def get_grant(self, subject: Optional[str]) -> dict:
+        """
+        Returns the form sent to the token endpoint
+        """
+        raise NotImplementedError
+
+    def fetch_token(self, subject: Optional[str]) -> Tuple[str, Optional[float]]:
+        data = self.get_grant(subject)
+        if self.scope:
+            data["scope"] = self.scope
+
+        response = self.get_http().post(
+            self.token_url,
+            data=data,
+            auth=(self.client_id, self.client_secret),
+            headers={"Accept": "application/json"},
+            timeout=self.timeout,
+        )
+        try:
+            body = response.json()
+        except Exception:
+            body = None
+        failed = response.status_code >= 400 or not isinstance(body, dict)
+        if failed or "access_token" not in body:
+            raise APIResourceTokenException(self.token_url, response.status_code)
+
+        expires_in = body.get("expires_in")
+        return body["access_token"], None if expires_in is None else float(expires_in)
+
+
+class ClientCredentialsTokenProvider(OAuthTokenProvider):
+    """
+    Service level token of the client credentials grant, shared by all the users
+    """
+
+    def get_key(self, subject: Optional[str]) -> Hashable:
+        return self.token_url, self.client_id, self.scope
+
+    def get_grant(self, subject: Optional[str]) -> dict:
+        return {"grant_type": "client_credentials"}
+
+
+class TokenExchangeProvider(OAuthTokenProvider):
+    """
+    Per user token, obtained exchanging the token of the user for one accepted
+    by the upstream (RFC 8693)
+    """
+
+    subject_token_type = "urn:ietf:params:oauth:token-type:access_token"
+
+    def __init__(self, *args, audience: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.audience = audience
+
+    def get_key(self, subject: Optional[str]) -> Hashable:
+        digest = hashlib.sha256((subject or "").encode()).hexdigest()
+
+        return self.token_url, self.client_id, self.scope, self.audience, digest
+
+    def get_grant(self, subject: Optional[str]) -> dict:
+        if not subject:
+            raise APIResourceTokenException(self.token_url, None)
+
+        grant = {
+            "grant_type": "urn:ietf:params:oauth:grant-type:token-exchange",
+            "subject_token": subject,
+            "subject_token_type": self.subject_token_type,
+        }
+        if self.audience:
+            grant["audience"] = self.audience
+
+        return grant
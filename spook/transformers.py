@@ -1,22 +1,154 @@
+from typing import Any, Iterator, List, Tuple
+
+_missing = object()
+
+
 class Transformer(object):
+    """
+    Maps the keys of the input dicts (`mappings`), transforming their values
+    (`value_mappings_functions`).
+
+    Source keys can be dotted paths to nested values ("customer.name"), missing
+    keys can have `defaults`, and `nested_transformers` transform dicts or lists
+    of dicts with another Transformer. The mappings are compiled once per class,
+    or per instance when it sets its own, into a plan that only visits the
+    mapped keys. The plan is ordered by the keys of the first row transformed,
+    so the output keys keep the order of the input.
+    """
+
     mappings = {}
     value_mappings_functions = {}
+    defaults = {}
+    nested_transformers = {}
+
+    plan_attributes = (
+        "mappings",
+        "value_mappings_functions",
+        "defaults",
+        "nested_transformers",
+    )
 
     def __init__(self, initial_data):
         self.initial_data = initial_data
 
-    def transform_dict(self, obj: dict):
+    @classmethod
+    def get_plan(cls) -> List[Tuple]:
+        """
+        Returns the compiled transform plan of the class, as a list of
+        (source, path, target, nested, function, default) steps
+        """
+        plan = cls.__dict__.get("_plan")
+        if plan is None:
+            plan = cls._plan = cls.compile_plan(cls)
+
+        return plan
+
+    @staticmethod
+    def compile_plan(owner) -> List[Tuple]:
+        """
+        Compiles the mappings of a transformer class or instance
+        """
+        plan = []
+        for source, target in owner.mappings.items():
+            path = tuple(source.split(".")) if "." in source else None
+            plan.append(
+                (
+                    source,
+                    path,
+                    target,
+                    owner.nested_transformers.get(source),
+                    owner.value_mappings_functions.get(source),
+                    owner.defaults.get(source, _missing),
+                )
+            )
+
+        return plan
+
+    def get_transform_plan(self, row: Any = None) -> List[Tuple]:
+        """
+        Returns the plan of the mappings of the instance, or of its class when it
+        doesn't set its own, ordered by the keys of a sample row
+        """
+        if any(name in vars(self) for name in self.plan_attributes):
+            plan = vars(self).get("_plan")
+            if plan is None:
+                plan = self._plan = self.compile_plan(self)
+        else:
+            plan = type(self).get_plan()
+
+        if not isinstance(row, dict):
+            return plan
+
+        positions = {key: position for position, key in enumerate(row)}
+        last = len(positions)
+
+        def get_position(step: Tuple) -> int:
+            source, path = step[0], step[1]
+            if source in positions or path is None:
+                return positions.get(source, last)
+
+            return positions.get(path[0], last)
+
+        return sorted(plan, key=get_position)
+
+    @staticmethod
+    def get_path_value(obj: dict, path: Tuple[str, ...]) -> Any:
+        value = obj
+        for key in path:
+            if not isinstance(value, dict):
+                return _missing
+            value = value.get(key, _missing)
+            if value is _missing:
+                return _missing
+
+        return value
+
+    def transform_dict(self, obj: dict, plan: List[Tuple] = None):
+        if plan is None:
+            plan = self.get_transform_plan(obj)
+
         result = {}
-        for k, v in obj.items():
-            if k in self.mappings.keys():
-                if k in self.value_mappings_functions.keys():
-                    result[self.mappings.get(k)] = self.value_mappings_functions[k](v)
-                else:
-                    result[self.mappings.get(k)] = v
+        for source, path, target, nested, function, default in plan:
+            value = obj.get(source, _missing)
+            if value is _missing and path is not None:
+                value = self.get_path_value(obj, path)
+
+            if value is _missing:
+                if default is not _missing:
+                    result[target] = default
+                continue
+
+            if nested is not None and value is not None:
+                value = nested(initial_data=value).transform()
+            if function is not None:
+                value = function(value)
+
+            result[target] = value
 
         return result
 
     def transform(self):
-        if type(self.initial_data) == list:
-            return [self.transform_dict(i) for i in self.initial_data]
+        if isinstance(self.initial_data, list):
+            if not self.initial_data:
+                return []
+
+            plan = self.get_transform_plan(self.initial_data[0])
+            transform_dict = self.transform_dict
+            return [transform_dict(i, plan) for i in self.initial_data]
         return self.transform_dict(self.initial_data)
+
+    def transform_iter(self) -> Iterator[dict]:
+        """
+        Transforms the rows of the initial data lazily, one at a time. The initial
+        data can be a dict, a list or any iterable of dicts
+        """
+        data = self.initial_data
+        if isinstance(data, dict):
+            data = (data,)
+
+        transform_dict = self.transform_dict
+        plan = None
+        for obj in data:
+            if plan is None:
+                plan = self.get_transform_plan(obj)
+            yield transform_dict(obj, plan)
@@ -0,0 +1,282 @@
+import json
+import logging
+import threading
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urlencode
+
+import urllib3
+from django.utils.module_loading import import_string
+
+from spook import settings
+from spook.sessions import SessionPool, default_pool
+
+logger = logging.getLogger(__name__)
+
+
+class BaseTransport(object):
+    """
+    Sends the requests of the resources. A transport implements ``request``, which
+    takes the keyword arguments of ``requests.request`` used by spook (``params``,
+    ``json``, ``data``, ``headers``, ``timeout``, ``stream``, ``auth`` and
+    ``allow_redirects``) and returns a response exposing ``status_code``,
+    ``headers``, ``content``, ``json()``, ``iter_content()`` and ``close()``.
+    """
+
+    def request(self, method: str, url: str, **kwargs):
+        raise NotImplementedError
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def warm_up(self, url: str, connections: int = None, timeout: float = 5) -> int:
+        """
+        Opens keep-alive connections to the host of the url. Returns the number of
+        connections that could be opened; failures are logged and never raised.
+        """
+        if connections is None:
+            connections = settings.POOL_WARM_UP_CONNECTIONS
+        if connections < 1:
+            return 0
+
+        def open_connection(_):
+            try:
+                self.head(url, timeout=timeout, allow_redirects=False).close()
+                return True
+            except Exception as e:
+                logger.warning("Could not warm up connection to %s: %s", url, e)
+                return False
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            return sum(executor.map(open_connection, range(connections)))
+
+    def warm_up_all(self, urls: Iterable[str], connections: int = None) -> int:
+        return sum(self.warm_up(url, connections=connections) for url in urls)
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(BaseTransport):
+    """
+    Sends the requests through a pool of ``requests`` sessions, the shared one
+    by default
+    """
+
+    def __init__(self, pool: SessionPool = None):
+        self.pool = pool if pool is not None else default_pool
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.pool.request(method, url, **kwargs)
+
+    def warm_up(self, url: str, connections: int = None, timeout: float = 5) -> int:
+        return self.pool.warm_up(url, connections=connections, timeout=timeout)
+
+    def close(self):
+        self.pool.close()
+
+
+class Urllib3Response(object):
+    """
+    Response of the urllib3 transport, with the subset of the ``requests``
+    response surface spook relies on
+    """
+
+    def __init__(self, raw: urllib3.HTTPResponse, url: str):
+        self.raw = raw
+        self.url = url
+        self.status_code = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self._content = None
+        self._consumed = False
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = self.raw.data or b""
+            self._consumed = True
+
+        return self._content
+
+    @property
+    def text(self) -> str:
+        content_type = self.headers.get("Content-Type", "")
+        encoding = "utf-8"
+        for parameter in content_type.split(";")[1:]:
+            name, _, value = parameter.strip().partition("=")
+            if name.lower() == "charset" and value:
+                encoding = value.strip('"')
+
+        return self.content.decode(encoding, errors="replace")
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        if self._content is not None:
+            for start in range(0, len(self._content), chunk_size):
+                end = start + chunk_size
+                yield self._content[start:end]
+            return
+
+        yield from self.raw.stream(chunk_size, decode_content=True)
+        self._consumed = True
+
+    def close(self):
+        if not self._consumed:
+            self.raw.close()
+        self.raw.release_conn()
+
+
+class Urllib3Transport(BaseTransport):
+    """
+    Sends the requests straight through a urllib3 ``PoolManager``, keeping one
+    keep-alive connection pool per upstream host. It skips the per request work
+    of ``requests`` (sessions, hooks, cookies, settings merging and prepared
+    requests), which adds up when proxying many small requests.
+    """
+
+    max_redirects = 30
+
+    def __init__(
+        self,
+        pool_manager: urllib3.PoolManager = None,
+        num_pools: int = None,
+        maxsize: int = None,
+        block: bool = None,
+    ):
+        if pool_manager is None:
+            pool_manager = urllib3.PoolManager(
+                num_pools=settings.POOL_CONNECTIONS if num_pools is None else num_pools,
+                maxsize=settings.POOL_MAXSIZE if maxsize is None else maxsize,
+                block=settings.POOL_BLOCK if block is None else block,
+            )
+        self.pool_manager = pool_manager
+        self.retries = urllib3.Retry(
+            total=None,
+            connect=0,
+            read=0,
+            status=0,
+            redirect=self.max_redirects,
+            raise_on_redirect=False,
+        )
+
+    def get_url(self, url: str, params: Optional[dict]) -> str:
+        if not params:
+            return url
+
+        separator = "&" if "?" in url else "?"
+        return f"{url}{separator}{urlencode(params, doseq=True)}"
+
+    def get_body(self, headers: dict, data=None, json_data=None) -> Optional[bytes]:
+        """
+        Encodes the body of a request, setting its content type if missing
+        """
+        if json_data is not None:
+            content_type = "application/json"
+            body = json.dumps(json_data).encode("utf-8")
+        elif isinstance(data, dict):
+            content_type = "application/x-www-form-urlencoded"
+            body = urlencode(data, doseq=True).encode("utf-8")
+        elif isinstance(data, str):
+            return data.encode("utf-8")
+        else:
+            return data
+
+        if not any(name.lower() == "content-type" for name in headers):
+            headers["Content-Type"] = content_type
+
+        return body
+
+    def get_timeout(self, timeout) -> urllib3.Timeout:
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return urllib3.Timeout(connect=connect, read=read)
+
+        return urllib3.Timeout(connect=timeout, read=timeout)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data=None,
+        json: dict = None,
+        headers: dict = None,
+        timeout=None,
+        stream: bool = False,
+        auth: tuple = None,
+        allow_redirects: bool = True,
+    ) -> Urllib3Response:
+        url = self.get_url(url, params)
+        headers = dict(headers or {})
+        body = self.get_body(headers, data=data, json_data=json)
+        if auth is not None:
+            credentials = b64encode(":".join(auth).encode("utf-8")).decode("ascii")
+            headers["Authorization"] = f"Basic {credentials}"
+
+        options = {}
+        if timeout is not None:
+            options["timeout"] = self.get_timeout(timeout)
+
+        try:
+            raw = self.pool_manager.urlopen(
+                method.upper(),
+                url,
+                body=body,
+                headers=headers,
+                retries=self.retries,
+                redirect=allow_redirects,
+                preload_content=not stream,
+                decode_content=True,
+                **options,
+            )
+        except urllib3.exceptions.MaxRetryError as e:
+            if isinstance(e.reason, Exception):
+                raise e.reason from None
+            raise
+
+        return Urllib3Response(raw, url)
+
+    def close(self):
+        self.pool_manager.clear()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> BaseTransport:
+    """
+    Returns the transport declared in SPOOK_TRANSPORT, built once and shared by
+    the resources not given their own ``http`` object
+    """
+    global _default_transport
+
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = import_string(settings.TRANSPORT)()
+
+    return _default_transport
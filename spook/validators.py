@@ -1,5 +1,7 @@
-from typing import Type
+from functools import lru_cache
+from typing import Type, Iterable, List
 
+from rest_framework.exceptions import ValidationError
 from rest_framework.serializers import Serializer
 
 
@@ -11,3 +13,84 @@ class InputValidator(object):
         serializer.is_valid(raise_exception=True)
 
         return data
+
+    def validate_many(self, data: List[dict]) -> List[dict]:
+        """
+        Validates a list of payloads with a single serializer
+        """
+        serializer = self.serializer_class(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        return data
+
+
+class NoopValidator(InputValidator):
+    """
+    Skips the validation, for payloads coming from trusted callers
+    """
+
+    def validate(self, data):
+        return data
+
+    def validate_many(self, data: List[dict]) -> List[dict]:
+        return data
+
+
+class FieldsValidator(InputValidator):
+    """
+    Lightweight schema check that only verifies the payload keys, without
+    building a serializer
+    """
+
+    required_fields: Iterable[str] = ()
+    allowed_fields: Iterable[str] = None
+
+    def validate(self, data):
+        if not isinstance(data, dict):
+            raise ValidationError({"non_field_errors": ["Expected a dictionary."]})
+
+        errors = {
+            field: ["This field is required."]
+            for field in self.required_fields
+            if field not in data
+        }
+        if self.allowed_fields is not None:
+            allowed_fields = set(self.allowed_fields)
+            errors.update(
+                {
+                    field: ["This field is not allowed."]
+                    for field in data
+                    if field not in allowed_fields
+                }
+            )
+
+        if errors:
+            raise ValidationError(errors)
+
+        return data
+
+    def validate_many(self, data: List[dict]) -> List[dict]:
+        errors = []
+        for item in data:
+            try:
+                self.validate(item)
+                errors.append({})
+            except ValidationError as e:
+                errors.append(e.detail)
+
+        if any(errors):
+            raise ValidationError(errors)
+
+        return data
+
+
+@lru_cache(maxsize=None)
+def get_validator_class(serializer_class: Type[Serializer]) -> Type[InputValidator]:
+    """
+    Returns the validator class of a serializer, built once and reused
+    """
+    return type(
+        f"{serializer_class.__name__}Validator",
+        (InputValidator,),
+        {"serializer_class": serializer_class},
+    )
@@ -1,23 +1,114 @@
-from typing import Type
+import asyncio
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional, Type, Tuple
 
 from rest_framework.generics import (
+    GenericAPIView,
     ListAPIView,
     RetrieveAPIView,
     CreateAPIView,
     UpdateAPIView,
     DestroyAPIView,
 )
+from django.http import HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.template.response import SimpleTemplateResponse
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
-from .resources import APIResource
-from .validators import InputValidator
+from .deadlines import deadline
+from . import settings
+from .exceptions import APIResourceDeadlineException
+from .metrics import PrometheusMetricsExporter, get_metrics_exporter
+from .profiling import RequestProfile, log_slow_request, profile_request
+from .resources import APIResource, AsyncAPIResource
+from .validators import InputValidator, get_validator_class
+
+
+class GatewayTimeout(APIException):
+    status_code = 504
+    default_detail = "The upstream service did not answer in time."
+    default_code = "gateway_timeout"
 
 
 class APIResourceMixin(object):
     resource: Type[APIResource] = None
+    deadline: float = None
+    server_timing: bool = settings.SERVER_TIMING
+    slow_request_threshold: float = settings.SLOW_REQUEST_THRESHOLD
+    trusted_validator: Type[InputValidator] = None
+    passthrough: bool = False
+    streaming: bool = False
+    passthrough_headers: Tuple[str, ...] = (
+        "Cache-Control",
+        "Content-Language",
+        "ETag",
+        "Expires",
+        "Last-Modified",
+        "Link",
+    )
 
     def get_token(self, request):
         raise NotImplementedError
 
+    def get_deadline(self, request) -> Optional[float]:
+        """
+        Returns the seconds every upstream request made to serve the request has
+        to fit in, None for no deadline
+        """
+        return self.deadline
+
+    def is_profiled(self, request) -> bool:
+        return self.server_timing or self.slow_request_threshold is not None
+
+    def on_slow_request(self, request, profile: RequestProfile):
+        """
+        Called with the stage breakdown of the requests that took
+        slow_request_threshold seconds or more
+        """
+        log_slow_request(profile)
+
+    @contextmanager
+    def dispatch_context(self, request):
+        """
+        Applies the deadline of the request and profiles it when needed
+        """
+        with deadline(self.get_deadline(request)):
+            if not self.is_profiled(request):
+                yield None
+                return
+
+            callback = partial(self.on_slow_request, request)
+            with profile_request(self.slow_request_threshold, callback) as profile:
+                yield profile
+
+    def profile_response(self, response, profile: Optional[RequestProfile]):
+        """
+        Renders the response measuring its rendering time, and adds the
+        Server-Timing header when enabled
+        """
+        if profile is None:
+            return response
+
+        if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+            with profile.measure("render"):
+                response.render()
+        if self.server_timing:
+            response["Server-Timing"] = profile.get_server_timing()
+
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        with self.dispatch_context(request) as profile:
+            response = super().dispatch(request, *args, **kwargs)
+            return self.profile_response(response, profile)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, APIResourceDeadlineException):
+            exc = GatewayTimeout()
+
+        return super().handle_exception(exc)
+
     def get_resource(self):
         if not self.resource:
             raise Exception(
@@ -26,16 +117,68 @@ class APIResourceMixin(object):
 
         return self.resource
 
-    def get_validator(self):
-        serializer = self.get_serializer_class()
+    def is_trusted_request(self, request) -> bool:
+        """
+        Returns whether the request comes from a trusted caller, whose payloads
+        are checked with trusted_validator instead of the serializer
+        """
+        return False
 
-        class Validator(InputValidator):
-            serializer_class = serializer
+    def get_validator(self) -> Type[InputValidator]:
+        request = getattr(self, "request", None)
+        if self.trusted_validator is not None and request is not None:
+            if self.is_trusted_request(request):
+                return self.trusted_validator
 
-        return Validator
+        return get_validator_class(self.get_serializer_class())
 
+    def is_passthrough(self, resource: APIResource, action: str) -> bool:
+        """
+        Returns whether the upstream response is forwarded without decoding it
+        """
+        passthrough = self.passthrough or self.streaming
+        return passthrough and resource.can_passthrough(action)
 
-class APIResourceListView(ListAPIView, APIResourceMixin):
+    def relay(self, resource: APIResource, url: str, params) -> HttpResponseBase:
+        """
+        Forwards the upstream response of a GET request, streaming its body when
+        the view is a streaming one
+        """
+        if self.streaming:
+            upstream = resource.get_stream(url, **params)
+            return self.get_passthrough_response(
+                upstream, resource.iter_stream(upstream)
+            )
+
+        return self.get_passthrough_response(resource.get_raw(url, **params))
+
+    def get_passthrough_response(
+        self, upstream, streaming_content=None
+    ) -> HttpResponseBase:
+        """
+        Returns the raw upstream body, status and passthrough headers
+        """
+        content_type = upstream.headers.get("Content-Type", "application/json")
+        if streaming_content is not None:
+            response = StreamingHttpResponse(
+                streaming_content,
+                status=upstream.status_code,
+                content_type=content_type,
+            )
+        else:
+            response = HttpResponse(
+                content=upstream.content,
+                status=upstream.status_code,
+                content_type=content_type,
+            )
+        for header in self.passthrough_headers:
+            if header in upstream.headers:
+                response[header] = upstream.headers[header]
+
+        return response
+
+
+class APIResourceListView(APIResourceMixin, ListAPIView):
     def list(self, request, *args, **kwargs):
         resource = self.get_resource()
         token = self.get_token(request)
@@ -43,14 +186,41 @@ class APIResourceListView(ListAPIView, APIResourceMixin):
         context = {
             "request": request,
         }
-        response = resource(
+        api_resource = resource(
             token=token, validator=self.get_validator(), context=context
-        ).list(**params)
+        )
+        if self.is_passthrough(api_resource, "list"):
+            return self.relay(api_resource, api_resource.get_url(), params)
+
+        response = api_resource.list(**params)
 
         return Response(data=response.data, status=response.status)
 
 
-class APIResourceRetrieveView(RetrieveAPIView, APIResourceMixin):
+class ComposedListView(APIResourceListView):
+    """
+    Lists the items of the resource, embedding the items of its relations
+    """
+
+    def list(self, request, *args, **kwargs):
+        resource = self.get_resource()
+        token = self.get_token(request)
+        params = request.query_params
+        context = {
+            "request": request,
+        }
+        api_resource = resource(
+            token=token, validator=self.get_validator(), context=context
+        )
+        response = api_resource.list(**params)
+        data = response.data
+        if response.status < 400:
+            data = api_resource.compose(data)
+
+        return Response(data=data, status=response.status)
+
+
+class APIResourceRetrieveView(APIResourceMixin, RetrieveAPIView):
     def retrieve(self, request, *args, **kwargs):
         pk = kwargs.get(self.lookup_field)
         resource = self.get_resource()
@@ -59,14 +229,18 @@ class APIResourceRetrieveView(RetrieveAPIView, APIResourceMixin):
         context = {
             "request": request,
         }
-        response = resource(
+        api_resource = resource(
             token=token, validator=self.get_validator(), context=context
-        ).retrieve(pk, **params)
+        )
+        if self.is_passthrough(api_resource, "get"):
+            return self.relay(api_resource, api_resource.get_url(pk), params)
+
+        response = api_resource.retrieve(pk, **params)
 
         return Response(data=response.data, status=response.status)
 
 
-class APIResourceCreateView(CreateAPIView, APIResourceMixin):
+class APIResourceCreateView(APIResourceMixin, CreateAPIView):
     def create(self, request, *args, **kwargs):
         resource = self.get_resource()
         token = self.get_token(request)
@@ -80,7 +254,7 @@ class APIResourceCreateView(CreateAPIView, APIResourceMixin):
         return Response(data=response.data, status=response.status)
 
 
-class APIResourcePutView(UpdateAPIView, APIResourceMixin):
+class APIResourcePutView(APIResourceMixin, UpdateAPIView):
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop("partial", False)
         pk = kwargs.get(self.lookup_field)
@@ -96,7 +270,7 @@ class APIResourcePutView(UpdateAPIView, APIResourceMixin):
         return Response(data=response.data, status=response.status)
 
 
-class APIResourceDestroyView(DestroyAPIView, APIResourceMixin):
+class APIResourceDestroyView(APIResourceMixin, DestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         pk = kwargs.get(self.lookup_field)
         resource = self.get_resource()
@@ -123,3 +297,191 @@ class APIResourceRetrieveUpdateDestroyView(
 
 class APIResourceListCreateView(APIResourceListView, APIResourceCreateView):
     pass
+
+
+class AsyncAPIResourceMixin(APIResourceMixin):
+    """
+    Dispatches requests asynchronously, so views can await an AsyncAPIResource
+    without holding a worker thread. Requires Django >= 4.1.
+    """
+
+    resource: Type[AsyncAPIResource] = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Imported here, as asgiref only ships with Django >= 3.0
+        from asgiref.sync import sync_to_async
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        with self.dispatch_context(request) as profile:
+            try:
+                await sync_to_async(self.initial)(request, *args, **kwargs)
+
+                if request.method.lower() in self.http_method_names:
+                    handler = getattr(
+                        self, request.method.lower(), self.http_method_not_allowed
+                    )
+                else:
+                    handler = self.http_method_not_allowed
+
+                response = handler(request, *args, **kwargs)
+                if asyncio.iscoroutine(response):
+                    response = await response
+            except Exception as exc:
+                response = self.handle_exception(exc)
+
+            response = self.finalize_response(request, response, *args, **kwargs)
+            self.response = self.profile_response(response, profile)
+            return self.response
+
+    async def relay(
+        self, resource: AsyncAPIResource, url: str, params
+    ) -> HttpResponseBase:
+        if self.streaming:
+            upstream = await resource.get_stream(url, **params)
+            return self.get_passthrough_response(
+                upstream, resource.iter_stream(upstream)
+            )
+
+        return self.get_passthrough_response(await resource.get_raw(url, **params))
+
+
+class AsyncAPIResourceListView(AsyncAPIResourceMixin, GenericAPIView):
+    async def get(self, request, *args, **kwargs):
+        return await self.list(request, *args, **kwargs)
+
+    async def list(self, request, *args, **kwargs):
+        resource = self.get_resource()
+        token = self.get_token(request)
+        params = request.query_params
+        context = {
+            "request": request,
+        }
+        api_resource = resource(
+            token=token, validator=self.get_validator(), context=context
+        )
+        if self.is_passthrough(api_resource, "list"):
+            return await self.relay(api_resource, api_resource.get_url(), params)
+
+        response = await api_resource.list(**params)
+
+        return Response(data=response.data, status=response.status)
+
+
+class AsyncAPIResourceRetrieveView(AsyncAPIResourceMixin, GenericAPIView):
+    async def get(self, request, *args, **kwargs):
+        return await self.retrieve(request, *args, **kwargs)
+
+    async def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_field)
+        resource = self.get_resource()
+        token = self.get_token(request)
+        params = request.query_params
+        context = {
+            "request": request,
+        }
+        api_resource = resource(
+            token=token, validator=self.get_validator(), context=context
+        )
+        if self.is_passthrough(api_resource, "get"):
+            return await self.relay(api_resource, api_resource.get_url(pk), params)
+
+        response = await api_resource.retrieve(pk, **params)
+
+        return Response(data=response.data, status=response.status)
+
+
+class AsyncAPIResourceCreateView(AsyncAPIResourceMixin, GenericAPIView):
+    async def post(self, request, *args, **kwargs):
+        return await self.create(request, *args, **kwargs)
+
+    async def create(self, request, *args, **kwargs):
+        resource = self.get_resource()
+        token = self.get_token(request)
+        context = {
+            "request": request,
+        }
+        response = await resource(
+            token=token, validator=self.get_validator(), context=context
+        ).create(data=request.data, query=request.query_params)
+
+        return Response(data=response.data, status=response.status)
+
+
+class AsyncAPIResourcePutView(AsyncAPIResourceMixin, GenericAPIView):
+    async def put(self, request, *args, **kwargs):
+        return await self.update(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.partial_update(request, *args, **kwargs)
+
+    async def partial_update(self, request, *args, **kwargs):
+        kwargs["partial"] = True
+        return await self.update(request, *args, **kwargs)
+
+    async def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        pk = kwargs.get(self.lookup_field)
+        resource = self.get_resource()
+        token = self.get_token(request)
+        context = {
+            "request": request,
+        }
+        response = await resource(
+            token=token, validator=self.get_validator(), context=context
+        ).update(pk=pk, data=request.data, query=request.query_params, partial=partial)
+
+        return Response(data=response.data, status=response.status)
+
+
+class AsyncAPIResourceDestroyView(AsyncAPIResourceMixin, GenericAPIView):
+    async def delete(self, request, *args, **kwargs):
+        return await self.destroy(request, *args, **kwargs)
+
+    async def destroy(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_field)
+        resource = self.get_resource()
+        token = self.get_token(request)
+        context = {
+            "request": request,
+        }
+        response = await resource(
+            token=token, validator=self.get_validator(), context=context
+        ).delete(pk=pk, query=request.query_params)
+
+        return Response(data=response.data, status=response.status)
+
+
+class AsyncAPIResourceRetrieveUpdateView(
+    AsyncAPIResourceRetrieveView, AsyncAPIResourcePutView
+):
+    pass
+
+
+class AsyncAPIResourceRetrieveUpdateDestroyView(
+    AsyncAPIResourceRetrieveUpdateView, AsyncAPIResourceDestroyView
+):
+    pass
+
+
+class AsyncAPIResourceListCreateView(
+    AsyncAPIResourceListView, AsyncAPIResourceCreateView
+):
+    pass
+
+
+def metrics_view(request):
+    """
+    Renders the measures of the PrometheusMetricsExporter in the Prometheus text
+    format. Protect its url, it is not authenticated.
+    """
+    exporter = get_metrics_exporter(PrometheusMetricsExporter)
+    content = exporter.render() if exporter is not None else ""
+
+    return HttpResponse(
+        content, content_type="text/plain; version=0.0.4; charset=utf-8"
+    )